@@ -0,0 +1,251 @@
+"""
+Measures end-to-end download throughput against a local MangaDex stub server
+
+Run from the repository root with the package installed (or with PYTHONPATH=src):
+
+    python benchmarks/bench_download.py --chapters 10 --pages 20 --workers 4
+    python benchmarks/bench_download.py --latency 0.1 --bandwidth 10 --error-rate 0.02 --json
+
+The stub server (see stub_server.py) runs in its own process so it doesn't compete with the downloader for the
+event loop. The benchmark goes through the same api_access_service, DownloadPipeline and file_access_service
+paths as the scripts, retrieving the manga and its feed and then downloading every chapter to PDF files, or the
+--output-format, in a temporary directory. It reports pages/s, MB/s, the p50 and p99 latency of page requests
+and the peak resident set size of the downloader and of its conversion processes. Requires the resource module,
+which is not available on Windows.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from mangadex_downloader.services import api_access_service, metrics_service
+from mangadex_downloader.services.api_access_service import (
+    retrieve_chapters,
+    retrieve_manga,
+)
+from mangadex_downloader.services.data_processing_service import (
+    image_quality_modes,
+    process_chapter_data,
+    process_manga_data,
+)
+from mangadex_downloader.services.device_profile import DeviceProfile
+from mangadex_downloader.services.download_pipeline import (
+    DownloadPipeline,
+    create_executor,
+    output_groups,
+)
+from mangadex_downloader.services.file_access_service import output_backends
+from mangadex_downloader.services.metrics_service import MetricsRegistry
+from mangadex_downloader.services.page_store import PageStore
+from mangadex_downloader.services.session_manager import SessionManager
+from stub_server import add_arguments
+
+# Finer latency buckets than the defaults so the percentiles are precise enough to compare runs, growing by
+# 10% from 1 ms to about 2 minutes
+latency_buckets: tuple[float, ...] = tuple(0.001 * 1.1**i for i in range(124))
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+
+        return sock.getsockname()[1]
+
+
+def get_peak_rss_mb(who: int) -> float:
+    peak: int = resource.getrusage(who).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def start_stub_server(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    """
+    Starts the stub server in a child process and waits until it accepts connections
+    """
+
+    stub_arguments: list[str] = [
+        "--chapters",
+        str(args.chapters),
+        "--pages",
+        str(args.pages),
+        "--format",
+        args.format,
+        "--latency",
+        str(args.latency),
+        "--bandwidth",
+        str(args.bandwidth),
+        "--error-rate",
+        str(args.error_rate),
+        "--seed",
+        str(args.seed),
+    ]
+    server: subprocess.Popen = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "stub_server.py"),
+            "--port",
+            str(port),
+            *stub_arguments,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline: float = time.monotonic() + 30
+
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The stub server exited before accepting connections")
+
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+
+    server.kill()
+    raise RuntimeError("The stub server didn't start accepting connections")
+
+
+async def download(args: argparse.Namespace, base_url: str, output_path: str) -> dict:
+    """
+    Downloads every chapter of the stub manga and collects the results of the run
+    """
+
+    api_access_service.mangadex_root_url = f"{base_url}/manga"
+    api_access_service.mangadex_resource_links_url = f"{base_url}/at-home/server"
+    api_access_service.mangadex_report_url = f"{base_url}/report"
+    metrics_service.metrics = MetricsRegistry(latency_buckets)
+
+    if args.stream:
+        api_access_service.page_store = PageStore(os.path.join(output_path, "pages"))
+
+    session = SessionManager.create_session()
+    image_session = SessionManager.create_session("images")
+    executor = create_executor(args.executor, args.conversion_workers)
+
+    try:
+        manga: dict = await retrieve_manga(session, "stub-manga")
+        manga_title: str = process_manga_data({"data": [manga["data"]]})[0]["title"]
+        chapters: list[dict] = process_chapter_data(
+            await retrieve_chapters(session, "stub-manga")
+        )
+
+        start: float = time.perf_counter()
+        results: list[bool] = await DownloadPipeline(
+            session,
+            manga_title,
+            chapters,
+            args.workers,
+            output_path,
+            executor=executor,
+            conversion_workers=args.conversion_workers,
+            image_session=image_session,
+            quality=args.quality,
+            profile=args.profile,
+            output_format=args.output_format,
+            group=args.group,
+        ).run()
+        elapsed: float = time.perf_counter() - start
+    finally:
+        await SessionManager.close_session()
+        executor.shutdown()
+
+    summary: dict = metrics_service.metrics.to_dict()
+    counters: dict[str, float] = {}
+    for counter in summary["counters"]:
+        counters[counter["name"]] = counters.get(counter["name"], 0) + counter["value"]
+
+    requests: list[dict] = [
+        histogram
+        for histogram in summary["histograms"]
+        if histogram["name"] == "image_request_duration_seconds"
+    ]
+    pages: float = counters.get("image_requests_total", 0) - counters.get(
+        "image_request_errors_total", 0
+    )
+
+    return {
+        "chapters": results.count(True),
+        "failed_chapters": results.count(False),
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_second": pages / elapsed,
+        "mb_per_second": counters.get("image_bytes_total", 0) / elapsed / 1024 / 1024,
+        # The stub is a single host, so there is a single histogram of page requests
+        "p50_ms": requests[0]["p50"] * 1000 if requests else None,
+        "p99_ms": requests[0]["p99"] * 1000 if requests else None,
+        "retries": counters.get("retries_total", 0),
+        "peak_rss_mb": get_peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_child_rss_mb": get_peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--conversion-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--quality", choices=image_quality_modes, default="data")
+    parser.add_argument(
+        "--stream", action="store_true", help="stream pages into a page store"
+    )
+    parser.add_argument(
+        "--profile", type=DeviceProfile.parse, help="transform pages for a device"
+    )
+    parser.add_argument("--output-format", choices=output_backends, default="pdf")
+    parser.add_argument("--group", choices=output_groups, default="chapter")
+    parser.add_argument(
+        "--json", action="store_true", help="print the results as one JSON object"
+    )
+    args = parser.parse_args()
+
+    port: int = get_free_port()
+    server: subprocess.Popen = start_stub_server(args, port)
+
+    try:
+        with tempfile.TemporaryDirectory() as output_path:
+            results: dict = asyncio.run(
+                download(args, f"http://127.0.0.1:{port}", output_path)
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        options: dict = {
+            **vars(args),
+            "profile": args.profile.name if args.profile else None,
+        }
+        print(json.dumps({"options": options, "results": results}))
+        return
+
+    print(
+        f"{args.chapters} chapters of {args.pages} {args.format} pages, {args.workers} download workers, "
+        f"{args.conversion_workers} {args.executor} conversion workers, {os.cpu_count()} cores"
+    )
+    print(
+        f"latency {args.latency * 1000:.0f} ms, bandwidth "
+        f"{f'{args.bandwidth:g} MB/s' if args.bandwidth else 'unlimited'}, error rate {args.error_rate:g}"
+    )
+    print(
+        f"{results['chapters']} chapters ({results['failed_chapters']} failed) in {results['seconds']:.2f} s, "
+        f"{results['retries']:.0f} retries"
+    )
+    print(f"{'pages/s':>10} {'MB/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'RSS MB':>10}")
+    print(
+        f"{results['pages_per_second']:>10.1f} {results['mb_per_second']:>10.2f} "
+        f"{results['p50_ms'] or 0:>10.1f} {results['p99_ms'] or 0:>10.1f} "
+        f"{results['peak_rss_mb']:>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compares generating a chapter PDF through a temporary directory against decoding and re-encoding the pages in
+memory and against embedding the JPEG pages as they are
+
+Run from the repository root with the package installed (or with PYTHONPATH=src):
+
+    python benchmarks/bench_pdf_generation.py --pages 40 --repeat 3
+
+Filesystem calls are counted with an audit hook (open, os.listdir, os.mkdir, os.remove, ...), which tracks the
+syscalls each path makes without needing strace.
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from mangadex_downloader.services.file_access_service import (
+    convert_images_to_pdf,
+    generate_PDF,
+    get_file_list,
+    save_image_list,
+)
+from mangadex_downloader.services.pdf_writer import PDFWriter
+from PIL import Image
+from pages import create_page
+
+filesystem_calls: list[int] = [0]
+
+
+def count_filesystem_calls(event: str, args: tuple) -> None:
+    if event == "open" or event.startswith("os.") or event.startswith("shutil."):
+        filesystem_calls[0] += 1
+
+
+def generate_PDF_through_temporary_directory(
+    image_data_list: list[bytes], output_name: str, output_path: str
+) -> None:
+    """
+    The previous implementation of generate_PDF, kept here as the baseline
+    """
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        save_image_list(image_data_list, temp_dir)
+        file_list: list[str] = get_file_list(temp_dir)
+        file_list.sort(key=lambda x: int(x.split(os.path.sep)[-1].split(".")[0]))
+
+        convert_images_to_pdf(file_list, output_path, output_name)
+
+
+def generate_PDF_reencoding(
+    image_data_list: list[bytes], output_name: str, output_path: str
+) -> None:
+    """
+    Decodes and re-encodes every page in memory the way generate_PDF did before JPEG passthrough
+    """
+
+    with PDFWriter(os.path.join(output_path, output_name + ".pdf")) as writer:
+        for image_data in image_data_list:
+            with Image.open(io.BytesIO(image_data)) as image:
+                writer.add_page(image.convert("RGB"))
+
+
+def measure(function, image_data_list: list[bytes], output_path: str, repeat: int):
+    best_time: float = None
+    best_cpu_time: float = None
+    calls: int = 0
+
+    for i in range(repeat):
+        filesystem_calls[0] = 0
+        start: float = time.perf_counter()
+        cpu_start: float = time.process_time()
+        function(image_data_list, f"benchmark {i}", output_path)
+        elapsed: float = time.perf_counter() - start
+        cpu_elapsed: float = time.process_time() - cpu_start
+        calls = filesystem_calls[0]
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+        best_cpu_time = (
+            cpu_elapsed if best_cpu_time is None else min(best_cpu_time, cpu_elapsed)
+        )
+
+    return best_time, best_cpu_time, calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--width", type=int, default=1100)
+    parser.add_argument("--height", type=int, default=1600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image_data_list: list[bytes] = [
+        create_page(args.width, args.height, i) for i in range(args.pages)
+    ]
+    size: float = sum(len(data) for data in image_data_list) / 1024 / 1024
+    print(
+        f"{args.pages} pages of {args.width}x{args.height}, {size:.1f} MB of JPEG data"
+    )
+
+    sys.addaudithook(count_filesystem_calls)
+
+    with tempfile.TemporaryDirectory() as output_path:
+        for label, function in [
+            ("temporary directory", generate_PDF_through_temporary_directory),
+            ("in memory re-encoded", generate_PDF_reencoding),
+            (
+                "JPEG passthrough",
+                lambda data, name, path: generate_PDF(data, name, path),
+            ),
+        ]:
+            best_time, best_cpu_time, calls = measure(
+                function, image_data_list, output_path, args.repeat
+            )
+            print(
+                f"{label:>20}: {best_time * 1000:8.1f} ms wall, "
+                f"{best_cpu_time * 1000:8.1f} ms CPU, {calls:5d} filesystem calls"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Measures the peak memory used to convert chapters of increasing length to PDF files, comparing Pillow's save_all,
+which decodes every page before writing the file, against the incremental PDFWriter used by generate_PDF
+
+Run from the repository root with the package installed (or with PYTHONPATH=src):
+
+    python benchmarks/bench_pdf_memory.py --pages 10 30 60 --formats JPEG PNG
+
+The pages are generated up front and written to disk, and each measurement runs in its own process that reads
+them back before taking its baseline, so generating the pages and the peak resident set size of one run don't
+hide the conversion being measured. PDFWriter embeds JPEG pages without decoding them, so only the PNG pages
+exercise its decode, encode and free path. Requires the resource module, which is not available on Windows.
+"""
+
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from PIL import Image
+from mangadex_downloader.services.file_access_service import generate_PDF
+from pages import create_page
+
+
+def generate_PDF_with_save_all(
+    image_data_list: list[bytes], output_name: str, output_path: str
+) -> None:
+    """
+    The previous implementation of generate_PDF, kept here as the baseline
+    """
+
+    images = [
+        Image.open(io.BytesIO(image_data)).convert("RGB")
+        for image_data in image_data_list
+    ]
+    images[0].save(
+        os.path.join(output_path, output_name + ".pdf"),
+        "PDF",
+        save_all=True,
+        append_images=images[1:],
+    )
+
+
+def get_peak_rss_mb() -> float:
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def write_pages(
+    directory: str, pages: int, width: int, height: int, format: str
+) -> None:
+    """
+    Generates the pages of a chapter and writes them to a directory, in page order by file name
+    """
+
+    for i in range(pages):
+        with open(os.path.join(directory, f"{i:04d}"), "wb") as file:
+            file.write(create_page(width, height, i, format))
+
+
+def run_child(variant: str, input_path: str) -> None:
+    """
+    Converts the chapter whose pages are in input_path and prints how much the peak resident set size grew
+    during the conversion
+    """
+
+    image_data_list: list[bytes] = []
+    for name in sorted(os.listdir(input_path)):
+        with open(os.path.join(input_path, name), "rb") as file:
+            image_data_list.append(file.read())
+
+    function = generate_PDF_with_save_all if variant == "save_all" else generate_PDF
+    before: float = get_peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as output_path:
+        function(image_data_list, "benchmark", output_path)
+
+    print(f"{get_peak_rss_mb() - before:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--width", type=int, default=1400)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument(
+        "--formats", choices=["JPEG", "PNG"], nargs="+", default=["JPEG", "PNG"]
+    )
+    parser.add_argument("--child", choices=["save_all", "incremental"])
+    parser.add_argument("--input", help="the directory of pages a child converts")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.input)
+        return
+
+    print(f"Peak memory growth while converting {args.width}x{args.height} pages")
+    print(f"{'format':>6} {'pages':>6} {'save_all':>12} {'incremental':>12}")
+
+    for format in args.formats:
+        for pages in args.pages:
+            results: list[str] = []
+
+            with tempfile.TemporaryDirectory() as input_path:
+                write_pages(input_path, pages, args.width, args.height, format)
+
+                for variant in ["save_all", "incremental"]:
+                    output: str = subprocess.run(
+                        [
+                            sys.executable,
+                            __file__,
+                            "--child",
+                            variant,
+                            "--input",
+                            input_path,
+                        ],
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                    ).stdout
+                    results.append(f"{float(output):9.1f} MB")
+
+            print(f"{format:>6} {pages:>6} {results[0]:>12} {results[1]:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures how PDF conversion throughput scales with the number of workers in process and thread pools
+
+Run from the repository root with the package installed (or with PYTHONPATH=src):
+
+    python benchmarks/bench_pdf_workers.py --chapters 16 --pages 10 --workers 1 2 4 8
+
+Pages are PNGs by default because JPEG pages are embedded without being decoded and barely use the CPU.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, wait
+from mangadex_downloader.services.download_pipeline import create_executor
+from mangadex_downloader.services.file_access_service import generate_PDF
+from pages import create_page
+
+
+def convert_chapters(
+    executor: Executor, chapters: int, image_data_list: list[bytes], output_path: str
+) -> float:
+    start: float = time.perf_counter()
+    futures = [
+        executor.submit(generate_PDF, image_data_list, f"chapter {i}", output_path)
+        for i in range(chapters)
+    ]
+    wait(futures)
+
+    for future in futures:
+        future.result()
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--format", choices=["PNG", "JPEG"], default="PNG")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    image_data_list: list[bytes] = [
+        create_page(seed=i, format=args.format) for i in range(args.pages)
+    ]
+    print(
+        f"{args.chapters} chapters of {args.pages} {args.format} pages, {os.cpu_count()} cores"
+    )
+    print(f"{'workers':>8} {'process':>14} {'thread':>14}")
+
+    with tempfile.TemporaryDirectory() as output_path:
+        for workers in args.workers:
+            results: list[str] = []
+
+            for kind in ["process", "thread"]:
+                executor: Executor = create_executor(kind, workers)
+                # Start the workers before timing so process start-up isn't measured
+                wait([executor.submit(os.getpid) for _ in range(workers)])
+                elapsed: float = convert_chapters(
+                    executor, args.chapters, image_data_list, output_path
+                )
+                executor.shutdown()
+                results.append(f"{args.chapters / elapsed:7.2f} ch/s")
+
+            print(f"{workers:>8} {results[0]:>14} {results[1]:>14}")
+
+
+if __name__ == "__main__":
+    main()
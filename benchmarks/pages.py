@@ -0,0 +1,34 @@
+"""
+Synthetic manga pages shared by the benchmarks
+"""
+
+import io
+from PIL import Image, ImageDraw
+
+
+def create_page(
+    width: int = 1100, height: int = 1600, seed: int = 0, format: str = "JPEG"
+) -> bytes:
+    """
+    Creates a page with line art and screentone-like noise so it compresses roughly like a scanned manga page
+
+    :param width: The width of the page
+    :param height: The height of the page
+    :param seed: Varies the content of the page
+    :param format: The format to encode the page in
+    :return: The encoded page data
+    """
+
+    noise: Image.Image = Image.effect_noise((width, height), 24 + seed % 16)
+    image: Image.Image = Image.eval(noise, lambda value: 128 + value // 2).convert(
+        "RGB"
+    )
+    draw: ImageDraw.ImageDraw = ImageDraw.Draw(image)
+
+    for i in range(0, width + height, 37 + seed % 11):
+        draw.line([(i, 0), (0, i)], fill=(20, 20, 20), width=3)
+
+    buffer: io.BytesIO = io.BytesIO()
+    image.save(buffer, format, **({"quality": 85} if format == "JPEG" else {}))
+
+    return buffer.getvalue()
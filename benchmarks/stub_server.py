@@ -0,0 +1,277 @@
+"""
+A local stand-in for the MangaDex API and a MangaDex@Home node that serves synthetic pages
+
+Run from the repository root to try the scripts against it by hand:
+
+    python benchmarks/stub_server.py --port 8000 --latency 0.05 --bandwidth 20 --error-rate 0.01
+    MANGADEX_ROOT_URL=http://127.0.0.1:8000/manga \\
+    MANGADEX_RESOURCE_LINKS_URL=http://127.0.0.1:8000/at-home/server \\
+    MANGADEX_REPORT_URL=http://127.0.0.1:8000/report \\
+    mangadex-downloader-cli download stub-manga
+
+It implements /manga, /manga/{id}, /manga/{id}/feed and /at-home/server/{id}, serves the pages listed by the
+at-home responses from /{quality}/{hash}/{filename} and accepts reports at /report. Every response can be
+delayed by a fixed latency and fail with a 503 at a given rate, and page data is sent through a single link
+capped at a given bandwidth, so many concurrent downloads share it like they would share a real connection.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from aiohttp import web
+from pages import create_page
+
+# The number of distinct pages generated per quality, the pages of every chapter cycle through them
+distinct_pages: int = 8
+# The number of bytes written at a time while the bandwidth is capped
+chunk_size: int = 16 * 1024
+
+
+class StubServer:
+    """
+    Serves one synthetic manga with a configurable number of chapters and pages and injects latency, a
+    bandwidth cap and errors into its responses
+    """
+
+    def __init__(
+        self,
+        chapters: int = 10,
+        pages: int = 20,
+        format: str = "JPEG",
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        :param chapters: The number of chapters of the manga
+        :param pages: The number of pages of each chapter
+        :param format: The format of the pages, either "JPEG" or "PNG"
+        :param latency: The number of seconds every response is delayed by
+        :param bandwidth: The number of bytes per second all page data shares, 0 for no limit
+        :param error_rate: The fraction of requests that fail with a 503
+        :param seed: Seeds the injected errors so runs are reproducible
+        """
+
+        self.chapters: int = chapters
+        self.pages: int = pages
+        self.latency: float = latency
+        self.bandwidth: float = bandwidth
+        self.error_rate: float = error_rate
+        self.extension: str = "jpg" if format == "JPEG" else "png"
+        self.page_data: dict[str, list[bytes]] = {
+            "data": [create_page(seed=i, format=format) for i in range(distinct_pages)],
+            "data-saver": [
+                create_page(550, 800, i, format) for i in range(distinct_pages)
+            ],
+        }
+        self.requests: int = 0
+        self.errors: int = 0
+
+        self._random: random.Random = random.Random(seed)
+        self._link_free_at: float = 0.0
+
+    def create_app(self) -> web.Application:
+        """
+        :return: The aiohttp application of the server
+        """
+
+        app: web.Application = web.Application(middlewares=[self._inject_faults])
+        app.router.add_get("/manga", self.get_mangas)
+        app.router.add_get("/manga/{manga_id}", self.get_manga)
+        app.router.add_get("/manga/{manga_id}/feed", self.get_feed)
+        app.router.add_get("/at-home/server/{chapter_id}", self.get_at_home_server)
+        app.router.add_get("/{quality}/{hash}/{filename}", self.get_page)
+        app.router.add_post("/report", self.post_report)
+
+        return app
+
+    async def get_mangas(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"result": "ok", "data": [self._get_manga_data("stub-manga")], "total": 1}
+        )
+
+    async def get_manga(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "result": "ok",
+                "data": self._get_manga_data(request.match_info["manga_id"]),
+            }
+        )
+
+    async def get_feed(self, request: web.Request) -> web.Response:
+        limit: int = int(request.query.get("limit", 100))
+        offset: int = int(request.query.get("offset", 0))
+        data: list[dict] = [
+            {
+                "id": f"chapter-{i}",
+                "type": "chapter",
+                "attributes": {
+                    "title": f"Chapter {i}",
+                    "chapter": str(i),
+                    "translatedLanguage": "en",
+                    "updatedAt": "2024-01-01T00:00:00+00:00",
+                },
+            }
+            for i in range(1 + offset, 1 + min(self.chapters, offset + limit))
+        ]
+
+        return web.json_response(
+            {
+                "result": "ok",
+                "data": data,
+                "limit": limit,
+                "offset": offset,
+                "total": self.chapters,
+            }
+        )
+
+    async def get_at_home_server(self, request: web.Request) -> web.Response:
+        filenames: list[str] = [
+            f"{i + 1}-{i % distinct_pages}.{self.extension}" for i in range(self.pages)
+        ]
+
+        return web.json_response(
+            {
+                "result": "ok",
+                "baseUrl": f"{request.scheme}://{request.host}",
+                "chapter": {
+                    "hash": request.match_info["chapter_id"],
+                    "data": filenames,
+                    "dataSaver": filenames,
+                },
+            }
+        )
+
+    async def get_page(self, request: web.Request) -> web.StreamResponse:
+        quality: str = request.match_info["quality"]
+        filename: str = request.match_info["filename"]
+
+        try:
+            page_data: bytes = self.page_data[quality][
+                int(filename.split(".")[0].split("-")[1])
+            ]
+        except (KeyError, IndexError, ValueError):
+            raise web.HTTPNotFound()
+
+        response: web.StreamResponse = web.StreamResponse(
+            headers={
+                "Content-Type": f"image/{'jpeg' if self.extension == 'jpg' else 'png'}",
+                "X-Cache": "MISS",
+            }
+        )
+        response.content_length = len(page_data)
+        await response.prepare(request)
+
+        for start in range(0, len(page_data), chunk_size):
+            chunk: bytes = page_data[start : start + chunk_size]
+            await self._throttle(len(chunk))
+            await response.write(chunk)
+
+        await response.write_eof()
+
+        return response
+
+    async def post_report(self, request: web.Request) -> web.Response:
+        return web.json_response({"result": "ok"})
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler) -> web.StreamResponse:
+        """
+        Delays every request except reports by the latency and fails a fraction of them with a 503
+        """
+
+        if request.path == "/report":
+            return await handler(request)
+
+        self.requests += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"result": "error"}, status=503)
+
+        return await handler(request)
+
+    async def _throttle(self, size: int) -> None:
+        """
+        Waits until the shared link has had time to send a number of bytes at the capped bandwidth
+
+        :param size: The number of bytes about to be sent
+        """
+
+        if not self.bandwidth:
+            return
+
+        now: float = time.monotonic()
+        start: float = max(now, self._link_free_at)
+        self._link_free_at = start + size / self.bandwidth
+
+        await asyncio.sleep(self._link_free_at - now)
+
+    @staticmethod
+    def _get_manga_data(manga_id: str) -> dict:
+        return {
+            "id": manga_id,
+            "type": "manga",
+            "attributes": {"title": {"en": "Stub Manga"}},
+        }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the options of the stub server to a parser
+
+    :param parser: The parser to add the options to
+    """
+
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--format", choices=["JPEG", "PNG"], default="JPEG")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every response"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="MB/s shared by all page data, 0 for no limit",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of requests failing"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def create_server(args: argparse.Namespace) -> StubServer:
+    """
+    :param args: The arguments parsed with the options of add_arguments
+    :return: The stub server configured by the arguments
+    """
+
+    return StubServer(
+        args.chapters,
+        args.pages,
+        args.format,
+        args.latency,
+        args.bandwidth * 1024 * 1024,
+        args.error_rate,
+        args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    web.run_app(create_server(args).create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,642 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from aiohttp import web
+from typing import TextIO
+from .services import api_access_service, metrics_service
+from .services.session_manager import *
+from .services.api_access_service import *
+from .services.data_processing_service import *
+from .services.download_pipeline import *
+from .services.response_cache import *
+from .services.page_store import *
+from .services.job_journal import *
+from .services.download_daemon import *
+from .services.sync_state import *
+from .services.rate_limiter import *
+from .services.metrics_service import MetricsRegistry, save_metrics
+from .services.device_profile import *
+from .services.file_access_service import output_backends
+
+# Where the JSON lines are written, anything else printed goes to stderr so it can't corrupt the output
+output: TextIO = sys.stdout
+
+# The commands that download, whose rate limits and stage metrics are reported once they finish
+metrics_commands: tuple[str, ...] = ("download", "sync", "resume", "daemon")
+
+
+def emit(event: str, **fields) -> None:
+    """
+    Writes an event as a single line of JSON
+
+    :param event: The name of the event
+    :param fields: The fields of the event
+    """
+
+    output.write(json.dumps({"event": event, **fields}) + "\n")
+    output.flush()
+
+
+async def search(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Writes a manga event for every manga similar to the query
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the search command
+    :return: The exit code
+    """
+
+    manga_data: dict = await retrieve_mangas(session, args.query)
+
+    if manga_data is None:
+        emit("error", message=f"Failed to search for {args.query}")
+        return 1
+
+    for manga in process_manga_data(manga_data):
+        emit("manga", **manga)
+
+    return 0
+
+
+async def chapters(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Writes a chapter event for every chapter of the manga in the requested ranges and languages
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the chapters command
+    :return: The exit code
+    """
+
+    chapter_data: dict = await retrieve_chapters(session, args.manga_id, args.languages)
+
+    if chapter_data is None:
+        emit("error", manga_id=args.manga_id, message="Failed to retrieve chapters")
+        return 1
+
+    for chapter in select_chapters(process_chapter_data(chapter_data), args.chapters):
+        emit("chapter", manga_id=args.manga_id, **chapter)
+
+    return 0
+
+
+async def download_chapters(
+    session: aiohttp.ClientSession,
+    manga_id: str,
+    manga_title: str,
+    selected_chapters: list[dict],
+    args: argparse.Namespace,
+    journal: JobJournal,
+    scheduler: FetchScheduler,
+    job_id: int = None,
+) -> list[bool]:
+    """
+    Downloads chapters of a manga, writing an event as the download starts, as each chapter finishes and once
+    every chapter is finished
+
+    :param session: The aiohttp.ClientSession to use
+    :param manga_id: The id of the manga
+    :param manga_title: The title of the manga
+    :param selected_chapters: The processed chapter data of the chapters to download
+    :param args: The parsed arguments of the command
+    :param journal: The JobJournal to record the progress of the download in
+    :param scheduler: The FetchScheduler shared by the downloads of every manga
+    :param job_id: The id of the unfinished job in the journal the chapters belong to, a new job is recorded if
+    none is given
+    :return: A list containing whether each chapter was downloaded, in the same order as the chapters
+    """
+
+    emit("start", manga_id=manga_id, title=manga_title, chapters=len(selected_chapters))
+
+    if not selected_chapters:
+        emit("finish", manga_id=manga_id, downloaded=0, failed=0)
+        return []
+
+    output_files: list[str] = get_output_files(
+        manga_title, selected_chapters, args.output, args.format, args.group
+    )
+
+    def report_chapter(chapter: dict, success: bool) -> None:
+        emit(
+            "chapter",
+            manga_id=manga_id,
+            id=chapter["id"],
+            chapter_number=chapter["chapter_number"],
+            success=success,
+            file=output_files[selected_chapters.index(chapter)],
+        )
+
+    if job_id is None:
+        job_id = journal.create_job(
+            manga_title,
+            selected_chapters,
+            args.output,
+            args.format,
+            args.group,
+            args.quality,
+            args.profile,
+            "cli",
+            manga_id,
+        )
+
+    pipeline: DownloadPipeline = DownloadPipeline(
+        session,
+        manga_title,
+        selected_chapters,
+        args.workers,
+        args.output,
+        scheduler=scheduler,
+        on_chapter_complete=report_chapter,
+        journal=journal,
+        job_id=job_id,
+        image_session=SessionManager.create_session("images"),
+        quality=args.quality,
+        profile=args.profile,
+        output_format=args.format,
+        group=args.group,
+    )
+    results: list[bool] = await pipeline.run()
+
+    if all(results):
+        journal.finish_job(job_id)
+
+    emit(
+        "finish",
+        manga_id=manga_id,
+        downloaded=results.count(True),
+        failed=results.count(False),
+    )
+
+    return results
+
+
+async def download_manga(
+    session: aiohttp.ClientSession,
+    manga_id: str,
+    args: argparse.Namespace,
+    journal: JobJournal,
+    scheduler: FetchScheduler,
+) -> bool:
+    """
+    Downloads the chapters of a manga in the requested ranges and languages
+
+    :param session: The aiohttp.ClientSession to use
+    :param manga_id: The id of the manga to download
+    :param args: The parsed arguments of the download command
+    :param journal: The JobJournal to record the progress of the download in
+    :param scheduler: The FetchScheduler shared by the downloads of every manga
+    :return: Whether every chapter was downloaded
+    """
+
+    manga: dict = await retrieve_manga(session, manga_id)
+    chapter_data: dict = await retrieve_chapters(session, manga_id, args.languages)
+
+    if manga is None or chapter_data is None:
+        emit("error", manga_id=manga_id, message="Failed to retrieve manga")
+        return False
+
+    manga_title: str = process_manga_data({"data": [manga["data"]]})[0]["title"]
+    selected_chapters: list[dict] = select_chapters(
+        process_chapter_data(chapter_data), args.chapters
+    )
+    results: list[bool] = await download_chapters(
+        session, manga_id, manga_title, selected_chapters, args, journal, scheduler
+    )
+
+    return all(results)
+
+
+async def sync_manga(
+    session: aiohttp.ClientSession,
+    manga_id: str,
+    args: argparse.Namespace,
+    journal: JobJournal,
+    scheduler: FetchScheduler,
+    state: SyncState,
+) -> bool:
+    """
+    Downloads the chapters of a manga that were updated since its last sync and haven't been exported yet. The
+    latest updatedAt of the series only moves forward once every new chapter was downloaded and no chapter was
+    left out by --chapters, so chapters that failed or weren't selected are asked for again by the next sync.
+
+    :param session: The aiohttp.ClientSession to use
+    :param manga_id: The id of the manga to sync
+    :param args: The parsed arguments of the sync command
+    :param journal: The JobJournal to record the progress of the download in
+    :param scheduler: The FetchScheduler shared by the downloads of every manga
+    :param state: The SyncState of the synced series
+    :return: Whether every new chapter was downloaded
+    """
+
+    series: dict = state.get_series(manga_id) or {
+        "languages": ["en"],
+        "updated_at": None,
+        "exported": set(),
+    }
+    languages: list[str] = args.languages or series["languages"]
+
+    manga: dict = await retrieve_manga(session, manga_id)
+    chapter_data: dict = await retrieve_chapters(
+        session, manga_id, languages, series["updated_at"]
+    )
+
+    if manga is None or chapter_data is None:
+        emit("error", manga_id=manga_id, message="Failed to retrieve manga")
+        return False
+
+    manga_title: str = process_manga_data({"data": [manga["data"]]})[0]["title"]
+    new_chapters: list[dict] = [
+        chapter
+        for chapter in select_chapters(
+            process_chapter_data(chapter_data), args.chapters
+        )
+        if chapter["id"] not in series["exported"]
+    ]
+    results: list[bool] = await download_chapters(
+        session, manga_id, manga_title, new_chapters, args, journal, scheduler
+    )
+
+    state.mark_exported(
+        manga_id,
+        [chapter["id"] for chapter, success in zip(new_chapters, results) if success],
+    )
+    state.record_sync(
+        manga_id,
+        languages,
+        (
+            get_latest_update(chapter_data)
+            if all(results) and not args.chapters
+            else None
+        ),
+    )
+
+    return all(results)
+
+
+async def download(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Downloads the chapters of every manga one manga at a time, sharing one FetchScheduler between them
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the download command
+    :return: The exit code, 1 if any chapter failed
+    """
+
+    os.makedirs(args.output, exist_ok=True)
+    journal: JobJournal = JobJournal()
+    scheduler: FetchScheduler = FetchScheduler()
+    success: bool = True
+
+    try:
+        for manga_id in args.manga_ids:
+            success &= await download_manga(session, manga_id, args, journal, scheduler)
+    finally:
+        journal.close()
+
+    return 0 if success else 1
+
+
+async def resume(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Resumes the last unfinished download or sync of the CLI in the format, grouping, image quality and device
+    profile it started with, skipping the chapters that were already saved
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the resume command
+    :return: The exit code, 1 if there is nothing to resume or any chapter failed
+    """
+
+    journal: JobJournal = JobJournal()
+
+    try:
+        job: dict = journal.get_unfinished_job("cli")
+
+        if job is None:
+            emit("error", message="There is no unfinished download to resume")
+            return 1
+
+        job_args: argparse.Namespace = argparse.Namespace(
+            **vars(args),
+            output=job["output_path"],
+            format=job["output_format"],
+            group=job["group"],
+            quality=job["quality"],
+            profile=job["profile"],
+        )
+        results: list[bool] = await download_chapters(
+            session,
+            job["manga_id"],
+            job["manga_title"],
+            job["chapters"],
+            job_args,
+            journal,
+            FetchScheduler(),
+            job["id"],
+        )
+    finally:
+        journal.close()
+
+    return 0 if all(results) else 1
+
+
+async def daemon(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Runs a DownloadDaemon fed by a queue file and a local HTTP endpoint until the process is interrupted,
+    writing an event as each job and chapter changes state
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the daemon command
+    :return: The exit code
+    """
+
+    if args.queue_file is None and args.port is None:
+        emit(
+            "error",
+            message="The daemon needs a --queue-file or a --port to read jobs from",
+        )
+        return 1
+
+    journal: JobJournal = JobJournal()
+    download_daemon: DownloadDaemon = DownloadDaemon(
+        session,
+        args.output,
+        args.series_workers,
+        args.workers,
+        journal=journal,
+        on_event=lambda event, fields: emit(event, **fields),
+        image_session=SessionManager.create_session("images"),
+        quality=args.quality,
+        profile=args.profile,
+        output_format=args.format,
+        group=args.group,
+    )
+    tasks: list[asyncio.Task] = [asyncio.create_task(download_daemon.run())]
+    runner: web.AppRunner = None
+
+    if args.queue_file is not None:
+        tasks.append(asyncio.create_task(download_daemon.watch_file(args.queue_file)))
+
+    try:
+        if args.port is not None:
+            runner = web.AppRunner(download_daemon.create_app())
+            await runner.setup()
+            await web.TCPSite(runner, args.host, args.port).start()
+            emit("listening", host=args.host, port=args.port)
+
+        await asyncio.gather(*tasks)
+    finally:
+        download_daemon.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if runner is not None:
+            await runner.cleanup()
+        journal.close()
+
+    return 0
+
+
+async def sync(session: aiohttp.ClientSession, args: argparse.Namespace) -> int:
+    """
+    Syncs every given manga, or every manga synced before if none are given, one manga at a time
+
+    :param session: The aiohttp.ClientSession to use
+    :param args: The parsed arguments of the sync command
+    :return: The exit code, 1 if any chapter failed
+    """
+
+    state: SyncState = SyncState()
+    manga_ids: list[str] = args.manga_ids or state.list_series()
+
+    if not manga_ids:
+        state.close()
+        emit(
+            "error",
+            message="There are no synced series, give the ids of the manga to sync",
+        )
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    journal: JobJournal = JobJournal()
+    scheduler: FetchScheduler = FetchScheduler()
+    success: bool = True
+
+    try:
+        for manga_id in manga_ids:
+            success &= await sync_manga(
+                session, manga_id, args, journal, scheduler, state
+            )
+    finally:
+        journal.close()
+        state.close()
+
+    return 0 if success else 1
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """
+    :return: The parser of the command line arguments
+    """
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="mangadex-downloader-cli",
+        description="Search and download manga from MangaDex without prompts, reporting progress as JSON lines",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="don't read or store API responses and pages in the cache",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="save the timings, throughput and retries of every stage to a file once finished, in the "
+        "Prometheus text format if it ends in .prom and as JSON otherwise",
+    )
+    subparsers: argparse._SubParsersAction = parser.add_subparsers(
+        dest="command", required=True
+    )
+
+    search_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "search", help="search for manga by title"
+    )
+    search_parser.add_argument("query", help="the title to search for")
+    search_parser.set_defaults(handler=search)
+
+    chapters_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "chapters", help="list the chapters of a manga"
+    )
+    chapters_parser.add_argument("manga_id", help="the id of the manga")
+    chapters_parser.set_defaults(handler=chapters)
+
+    download_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "download", help="download the chapters of one or more manga as PDF files"
+    )
+    download_parser.add_argument(
+        "manga_ids", nargs="+", metavar="manga_id", help="the ids of the manga"
+    )
+    download_parser.set_defaults(handler=download)
+
+    resume_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "resume",
+        help="resume the last unfinished download or sync, skipping the chapters that were already saved",
+    )
+    resume_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="the number of chapters downloaded concurrently",
+    )
+    resume_parser.set_defaults(handler=resume)
+
+    daemon_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "daemon",
+        help="download the jobs appended to a queue file or posted to a local HTTP endpoint until interrupted",
+    )
+    daemon_parser.add_argument(
+        "-q",
+        "--queue-file",
+        help='a file of jobs, one JSON object per line like {"manga_id": "...", "chapters": "1-10", "languages": ["en"]}',
+    )
+    daemon_parser.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        help="the port to accept jobs on with POST /jobs and report them on with GET /jobs",
+    )
+    daemon_parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="the address to accept jobs on, defaults to 127.0.0.1",
+    )
+    daemon_parser.add_argument(
+        "-s",
+        "--series-workers",
+        type=int,
+        default=2,
+        help="the number of series downloaded concurrently",
+    )
+    daemon_parser.set_defaults(handler=daemon)
+
+    sync_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "sync",
+        help="download only the chapters of followed manga that are new since their last sync",
+    )
+    sync_parser.add_argument(
+        "manga_ids",
+        nargs="*",
+        metavar="manga_id",
+        help="the ids of the manga to sync, defaults to every manga synced before",
+    )
+    sync_parser.set_defaults(handler=sync)
+
+    for subparser in (download_parser, daemon_parser, sync_parser):
+        subparser.add_argument(
+            "-o",
+            "--output",
+            default=os.getcwd(),
+            help="the directory to save the chapters to, defaults to the current directory",
+        )
+        subparser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=4,
+            help="the number of chapters of each series downloaded concurrently",
+        )
+        subparser.add_argument(
+            "-Q",
+            "--quality",
+            choices=image_quality_modes,
+            help='the quality of the pages, "data-saver" for compressed pages or "auto" to pick one per chapter '
+            "from the measured bandwidth, defaults to the MANGADEX_IMAGE_QUALITY environment variable or "
+            '"data"',
+        )
+        subparser.add_argument(
+            "-P",
+            "--profile",
+            type=DeviceProfile.parse,
+            help=f"transform the pages for a reading device, one of {', '.join(device_profiles)} or fields like "
+            '"1264x1680,grayscale,quality=80"',
+        )
+        subparser.add_argument(
+            "-f",
+            "--format",
+            choices=output_backends,
+            help='the format to save the chapters in, "folder" for a directory of the original pages, defaults '
+            'to the MANGADEX_OUTPUT_FORMAT environment variable or "pdf"',
+        )
+        subparser.add_argument(
+            "-g",
+            "--group",
+            choices=output_groups,
+            help="save a file per chapter, per volume or for every chapter of the series, bookmarked by chapter, "
+            'defaults to the MANGADEX_OUTPUT_GROUP environment variable or "chapter"',
+        )
+
+    for subparser in (chapters_parser, download_parser, sync_parser):
+        subparser.add_argument(
+            "-c",
+            "--chapters",
+            type=parse_chapter_ranges,
+            default=[],
+            help='the chapter numbers to select, e.g. "1-10,12,20-", defaults to every chapter',
+        )
+        subparser.add_argument(
+            "-l",
+            "--languages",
+            type=lambda text: [language.strip() for language in text.split(",")],
+            # A synced series keeps the languages it was last synced in unless new ones are given
+            default=None if subparser is sync_parser else ["en"],
+            help='the comma separated languages of the chapters, defaults to "en"',
+        )
+
+    return parser
+
+
+async def run(args: argparse.Namespace) -> int:
+    """
+    Runs the handler of the parsed command with a new session
+
+    :param args: The parsed command line arguments
+    :return: The exit code
+    """
+
+    session: aiohttp.ClientSession = SessionManager.create_session()
+    api_access_service.rate_limiter = RateLimiter()
+    metrics_service.metrics = MetricsRegistry()
+
+    if not args.no_cache:
+        api_access_service.response_cache = ResponseCache()
+        api_access_service.page_store = PageStore()
+
+    try:
+        return await args.handler(session, args)
+    finally:
+        if args.command in metrics_commands:
+            emit("rate_limits", **api_access_service.rate_limiter.metrics)
+            emit("metrics", **metrics_service.metrics.to_dict()["stages"])
+
+        if args.metrics:
+            save_metrics(metrics_service.metrics, args.metrics)
+
+        await SessionManager.close_session()
+
+        if api_access_service.response_cache is not None:
+            api_access_service.response_cache.close()
+
+
+def main() -> None:
+    args: argparse.Namespace = create_parser().parse_args()
+
+    # Keep the messages the services print out of the JSON lines
+    with contextlib.redirect_stdout(sys.stderr):
+        exit_code: int = asyncio.run(run(args))
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,29 @@
+import argparse
 import asyncio
 import curses
+from .services import api_access_service, metrics_service
 from .services.session_manager import *
 from .services.api_access_service import *
 from .services.data_processing_service import *
 from .services.user_interface_service import *
 from .services.file_access_service import *
+from .services.download_pipeline import *
+from .services.response_cache import *
+from .services.page_store import *
+from .services.job_journal import *
+from .services.rate_limiter import *
+from .services.metrics_service import MetricsRegistry, save_metrics
 
 
 async def end() -> None:
     await SessionManager.close_session()
+
+    if api_access_service.response_cache is not None:
+        api_access_service.response_cache.close()
     quit()
 
 
-async def start(stdscr: curses) -> None:
+async def start(stdscr: curses, resume: bool = False, metrics_file: str = None) -> None:
     # Main body of the program
 
     # Initialize curses settings for UI
@@ -24,96 +35,157 @@ async def start(stdscr: curses) -> None:
     curses.init_pair(3, curses.COLOR_CYAN, curses.COLOR_WHITE)
     curses.init_pair(4, curses.COLOR_WHITE, curses.COLOR_BLACK)
 
-    # Create a new session
+    # Create the API and image sessions, serve repeated searches, chapter lists and pages from the caches and
+    # keep every request under MangaDex's rate limits
     session: aiohttp.ClientSession = SessionManager.create_session()
+    image_session: aiohttp.ClientSession = SessionManager.create_session("images")
+    api_access_service.response_cache = ResponseCache()
+    api_access_service.page_store = PageStore()
+    api_access_service.rate_limiter = RateLimiter()
+
+    # Time every stage of the download if the metrics should be saved
+    if metrics_file:
+        metrics_service.metrics = MetricsRegistry()
+
+    # Record the progress of the download so an interrupted download can be resumed
+    journal: JobJournal = JobJournal()
+
+    # Downloads started here use the default output format, grouping, image quality and device profile
+    options: dict = {}
+
+    if resume:
+        # Resume the last unfinished download instead of prompting the user, writing the files it started
+        job: dict = journal.get_unfinished_job()
+
+        if job is None:
+            print("\033[31m" + "There is no unfinished download to resume" + "\033[0m")
+            await end()
+
+        job_id: int = job["id"]
+        manga_title: str = job["manga_title"]
+        selected_chapters: list[dict] = job["chapters"]
+        output_path: str = job["output_path"]
+        options = {
+            "output_format": job["output_format"],
+            "group": job["group"],
+            "quality": job["quality"],
+            "profile": job["profile"],
+        }
+    else:
+        # Prompt user for a initial query
+        query: str = prompt_user_input(stdscr, "Enter a manga title")
+
+        if query == "":
+            await end()
+
+        # Retrieve and process the API response into a list of mangas similar to the query
+        manga_data: dict = await retrieve_mangas(session, query)
+        processed_manga_data: list[dict] = process_manga_data(manga_data)
+
+        # Prompt user to select a manga out of the list of mangas
+        selected_manga_index: int = prompt_list_selection(
+            stdscr, processed_manga_data, 20, "Select manga"
+        )
 
-    # Prompt user for a initial query
-    query: str = prompt_user_input(stdscr, "Enter a manga title")
-
-    if query == "":
-        await end()
+        if selected_manga_index == None:
+            await end()
 
-    # Retrieve and process the API response into a list of mangas similar to the query
-    manga_data: dict = await retrieve_mangas(session, query)
-    processed_manga_data: list[dict] = process_manga_data(manga_data)
+        # Retrieve and process the API response into a list of chapters of the selected manga
+        chapter_data: dict = await retrieve_chapters(
+            session, processed_manga_data[int(selected_manga_index)]["id"]
+        )
+        processed_chapter_data: list[dict] = process_chapter_data(chapter_data)
 
-    # Prompt user to select a manga out of the list of mangas
-    selected_manga_index: int = prompt_list_selection(
-        stdscr, processed_manga_data, 20, "Select manga"
-    )
+        # Prompt user to select a list of chapters to download
+        selected_chapters_indexes: list[int] = prompt_list_multi_selection(
+            stdscr, processed_chapter_data, 20, "Select chapters"
+        )
 
-    if selected_manga_index == None:
-        await end()
+        if selected_chapters_indexes == None or len(selected_chapters_indexes) == 0:
+            await end()
+
+        # Download the selected chapters and generate a PDF file for each one as soon as its pages arrive
+        manga_title: str = processed_manga_data[int(selected_manga_index)]["title"]
+        selected_chapters: list[dict] = [
+            processed_chapter_data[i] for i in selected_chapters_indexes
+        ]
+
+        output_path: str = os.getcwd()
+        job_id: int = journal.create_job(
+            manga_title,
+            selected_chapters,
+            output_path,
+            manga_id=processed_manga_data[int(selected_manga_index)]["id"],
+        )
 
-    # Retrieve and process the API response into a list of chapters of the selected manga
-    chapter_data: dict = await retrieve_chapters(
-        session, processed_manga_data[int(selected_manga_index)]["id"]
+    stdscr.clear()
+    stdscr.refresh()
+    pipeline: DownloadPipeline = DownloadPipeline(
+        session,
+        manga_title,
+        selected_chapters,
+        output_path=output_path,
+        journal=journal,
+        job_id=job_id,
+        image_session=image_session,
+        **options,
     )
-    processed_chapter_data: list[dict] = process_chapter_data(chapter_data)
 
-    # Prompt user to select a list of chapters to download
-    selected_chapters_indexes: list[int] = prompt_list_multi_selection(
-        stdscr, processed_chapter_data, 20, "Select chapters"
+    # Display the progress of every chapter while it downloads, on the same loop as the downloads
+    progress_view: asyncio.Task = asyncio.create_task(
+        show_download_progress(stdscr, pipeline, manga_title)
     )
 
-    if selected_chapters_indexes == None or len(selected_chapters_indexes) == 0:
-        await end()
-
-    # Retrieve download resources for the selected chapters
-    selected_chapter_ids: list[str] = [
-        processed_chapter_data[i]["id"] for i in selected_chapters_indexes
-    ]
-    all_download_resources_tasks: list[dict] = [
-        retrieve_download_resources(session, id) for id in selected_chapter_ids
-    ]
-    all_download_resources: list[dict] = await asyncio.gather(
-        *all_download_resources_tasks
-    )
+    try:
+        results: list[bool] = await pipeline.run()
+    finally:
+        progress_view.cancel()
+        await asyncio.gather(progress_view, return_exceptions=True)
 
-    # Process the download resources into lists of download links and retrieve the image data for each batch
-    link_batches: list[list[str]] = [
-        process_download_resource_data(dr) for dr in all_download_resources
-    ]
-    all_batch_download_tasks: list[list[bytes]] = [
-        retrieve_image_data_list(session, link_batch) for link_batch in link_batches
-    ]
-    all_image_data_lists: list[list[bytes]] = await asyncio.gather(
-        *all_batch_download_tasks
-    )
+    # Keep the job resumable until every chapter has been saved
+    if all(results):
+        journal.finish_job(job_id)
+    journal.close()
 
-    # Display the progress of the download and generate the PDF files
-    stdscr.clear()
-    for i in range(len(all_image_data_lists)):
-        stdscr.addstr(
-            i,
-            0,
-            f'Downloading {processed_manga_data[int(selected_manga_index)]["title"]} [{processed_chapter_data[selected_chapters_indexes[i]]["chapter_number"]}]',
-            curses.color_pair(1),
-        )
-        stdscr.refresh()
-        generate_PDF(
-            all_image_data_lists[i],
-            f'{processed_manga_data[int(selected_manga_index)]["title"]} [{processed_chapter_data[selected_chapters_indexes[i]]["chapter_number"]}]',
-        )
     print(
         "\033[31m"
-        + f"Finished downloading {len(all_image_data_lists)} chapters of {processed_manga_data[selected_manga_index]['title']}"
+        + f"Finished downloading {results.count(True)} chapters of {manga_title}"
         + "\033[0m"
     )
-    print("\033[31m" + f"Saved to {os.getcwd()}" + "\033[0m")
+    print("\033[31m" + f"Saved to {output_path}" + "\033[0m")
+
+    if metrics_service.metrics is not None:
+        save_metrics(metrics_service.metrics, metrics_file)
+        print("\033[31m" + f"Saved metrics to {metrics_file}" + "\033[0m")
 
     # Close the session and exit the program
     await end()
 
 
-def curses_main(stdscr: curses) -> None:
+def curses_main(stdscr: curses, resume: bool = False, metrics_file: str = None) -> None:
     # Run the start function in an asyncio.run to enable use of async/await
-    asyncio.run(start(stdscr))
+    asyncio.run(start(stdscr, resume, metrics_file))
 
 
 def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="mangadex-downloader", description="Download manga from MangaDex"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume the last unfinished download, skipping the chapters that were already saved",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="save the timings, throughput and retries of every stage of the download to a file, in the "
+        "Prometheus text format if it ends in .prom and as JSON otherwise",
+    )
+    args: argparse.Namespace = parser.parse_args()
+
     # wrap curses_main in curses.wrapper to initialize curses
-    curses.wrapper(curses_main)
+    curses.wrapper(curses_main, args.resume, args.metrics)
 
 
 if __name__ == "__main__":
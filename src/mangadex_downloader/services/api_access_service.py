@@ -1,10 +1,25 @@
 from dotenv import load_dotenv
 import os
 import asyncio
+import time
 import aiohttp
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, TypeVar
+from urllib.parse import urlsplit
+from . import metrics_service
+from .chapter_progress import ChapterProgress
+from .data_processing_service import image_qualities, process_download_resource_data
+from .page_store import PageStore
+from .quality_selector import QualitySelector
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .retry_policy import ResponseStatusError, RetryPolicy, parse_retry_after
 
 load_dotenv()
 
+T = TypeVar("T")
+
 mangadex_root_url: str = (
     os.getenv("MANGADEX_ROOT_URL") or "https://api.mangadex.org/manga"
 )
@@ -12,25 +27,410 @@ mangadex_resource_links_url: str = (
     os.getenv("MANGADEX_RESOURCE_LINKS_URL")
     or "https://api.mangadex.org/at-home/server"
 )
+max_concurrent_requests: int = int(os.getenv("MANGADEX_MAX_CONCURRENT_REQUESTS") or 32)
+max_requests_per_host: int = int(os.getenv("MANGADEX_MAX_REQUESTS_PER_HOST") or 8)
+max_requests_per_chapter: int = int(os.getenv("MANGADEX_MAX_REQUESTS_PER_CHAPTER") or 4)
+# The feed returns at most 500 chapters per request and refuses offsets past 10000
+feed_page_size: int = 500
+max_feed_offset: int = 10000
+mangadex_report_url: str = (
+    os.getenv("MANGADEX_REPORT_URL") or "https://api.mangadex.network/report"
+)
+at_home_request_timeout: float = float(os.getenv("MANGADEX_AT_HOME_TIMEOUT") or 30)
+at_home_latency_threshold: float = float(
+    os.getenv("MANGADEX_AT_HOME_LATENCY_THRESHOLD") or 10
+)
+at_home_error_threshold: int = int(os.getenv("MANGADEX_AT_HOME_ERROR_THRESHOLD") or 3)
+max_at_home_refreshes: int = int(os.getenv("MANGADEX_AT_HOME_MAX_REFRESHES") or 2)
+default_retry_policy: RetryPolicy = RetryPolicy()
+# Either "data", "data-saver" or "auto" to let quality_selector pick the quality of each chapter
+image_quality: str = os.getenv("MANGADEX_IMAGE_QUALITY") or "data"
+quality_selector: QualitySelector = QualitySelector()
+# The number of bytes of an image read from the response at a time when streaming
+image_chunk_size: int = 64 * 1024
+# The number of bytes of an image buffered before they are written to disk in a thread when streaming
+image_flush_size: int = 256 * 1024
+# The caches and rate limiter used when none are given, the entry points enable them
+response_cache: ResponseCache = None
+page_store: PageStore = None
+rate_limiter: RateLimiter = None
+
+
+class FetchScheduler:
+    """
+    Caps the number of requests in flight globally, per host and per chapter. Requests that can't start
+    immediately wait in a queue for their chapter, and chapters take turns starting requests in round-robin
+    order so one large chapter can't starve the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = None,
+        max_per_host: int = None,
+        max_per_chapter: int = None,
+    ) -> None:
+        """
+        :param max_concurrent: The maximum number of requests in flight overall
+        :param max_per_host: The maximum number of requests in flight to a single host
+        :param max_per_chapter: The maximum number of requests in flight for a single chapter
+        """
+
+        self.max_concurrent: int = max_concurrent or max_concurrent_requests
+        self.max_per_host: int = max_per_host or max_requests_per_host
+        self.max_per_chapter: int = max_per_chapter or max_requests_per_chapter
+
+        self._active: int = 0
+        self._active_per_host: dict[str, int] = {}
+        self._active_per_chapter: dict[str, int] = {}
+        self._waiting: dict[str, deque[tuple[str, asyncio.Future]]] = {}
+        self._last_turn: dict[str, int] = {}
+        self._turns: int = 0
+
+    @property
+    def active(self) -> int:
+        """
+        The number of requests currently in flight
+        """
+
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        """
+        The number of requests waiting to start
+        """
+
+        return sum(len(queue) for queue in self._waiting.values())
+
+    @asynccontextmanager
+    async def request(self, url: str, chapter_id: str = None) -> AsyncIterator[None]:
+        """
+        Waits until a request to the url is allowed to start and holds its slot until the context exits
+
+        :param url: The url that will be requested
+        :param chapter_id: The id of the chapter the request belongs to
+        """
+
+        host: str = urlsplit(url).hostname or ""
+        chapter_id = chapter_id or ""
+        start: float = time.monotonic()
+
+        await self._acquire(host, chapter_id)
+        metrics_service.observe("scheduler_wait_seconds", time.monotonic() - start)
+        self._report()
+        try:
+            yield
+        finally:
+            self._release(host, chapter_id)
+            self._report()
+
+    def _report(self) -> None:
+        """
+        Records the number of requests in flight and waiting in metrics
+        """
+
+        metrics_service.set_gauge("scheduler_active_requests", self.active)
+        metrics_service.set_gauge("scheduler_waiting_requests", self.waiting)
+
+    async def _acquire(self, host: str, chapter_id: str) -> None:
+        """
+        Queues a request behind the other requests of its chapter and waits until it is granted a slot
+
+        :param host: The host the request is made to
+        :param chapter_id: The id of the chapter the request belongs to
+        """
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(chapter_id, deque()).append((host, future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(host, chapter_id)
+            else:
+                self._discard(host, chapter_id, future)
+            raise
 
+    def _release(self, host: str, chapter_id: str) -> None:
+        """
+        Frees the slot held by a finished request and starts the next waiting requests
 
-async def fetch(session: aiohttp.ClientSession, url: str, params: dict = {}) -> dict:
+        :param host: The host the request was made to
+        :param chapter_id: The id of the chapter the request belongs to
+        """
+
+        self._active -= 1
+        self._active_per_host[host] -= 1
+        self._active_per_chapter[chapter_id] -= 1
+
+        if self._active_per_host[host] == 0:
+            del self._active_per_host[host]
+
+        if self._active_per_chapter[chapter_id] == 0:
+            del self._active_per_chapter[chapter_id]
+
+            # Forget the chapter's turn once it has nothing left in flight or waiting
+            if chapter_id not in self._waiting:
+                self._last_turn.pop(chapter_id, None)
+
+        self._dispatch()
+
+    def _discard(self, host: str, chapter_id: str, future: asyncio.Future) -> None:
+        """
+        Removes a cancelled request from the queue of its chapter
+
+        :param host: The host the request would have been made to
+        :param chapter_id: The id of the chapter the request belongs to
+        :param future: The future the request was waiting on
+        """
+
+        queue: deque[tuple[str, asyncio.Future]] = self._waiting.get(chapter_id)
+
+        if queue is not None and (host, future) in queue:
+            queue.remove((host, future))
+            if not queue:
+                del self._waiting[chapter_id]
+
+    def _dispatch(self) -> None:
+        """
+        Starts waiting requests while there are free slots, giving the turn to the chapter that started a
+        request the longest time ago
+        """
+
+        while self._active < self.max_concurrent:
+            eligible: list[str] = [
+                chapter_id
+                for chapter_id, queue in self._waiting.items()
+                if self._active_per_chapter.get(chapter_id, 0) < self.max_per_chapter
+                and self._active_per_host.get(queue[0][0], 0) < self.max_per_host
+            ]
+
+            if not eligible:
+                return
+
+            chapter_id: str = min(eligible, key=lambda c: self._last_turn.get(c, -1))
+            host, future = self._waiting[chapter_id].popleft()
+
+            if not self._waiting[chapter_id]:
+                del self._waiting[chapter_id]
+
+            self._turns += 1
+            self._last_turn[chapter_id] = self._turns
+            self._active += 1
+            self._active_per_host[host] = self._active_per_host.get(host, 0) + 1
+            self._active_per_chapter[chapter_id] = (
+                self._active_per_chapter.get(chapter_id, 0) + 1
+            )
+            future.set_result(None)
+
+
+class AtHomeNode:
     """
-    Makes a GET request to the url and returns the response
+    Tracks the health of the MangaDex@Home node serving a chapter and reports the outcome of every request made
+    to it back to MangaDex, which uses the reports to route clients to better nodes. A node becomes unhealthy
+    once enough requests to it have failed or taken longer than the latency threshold.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url: str,
+        latency_threshold: float = None,
+        error_threshold: int = None,
+        report_url: str = None,
+    ) -> None:
+        """
+        :param session: The aiohttp.ClientSession to send reports with
+        :param base_url: The base url of the node
+        :param latency_threshold: The number of seconds after which a successful request counts as failed
+        :param error_threshold: The number of failed requests after which the node is unhealthy
+        :param report_url: The url to send reports to, defaults to mangadex_report_url
+        """
+
+        self.session: aiohttp.ClientSession = session
+        self.base_url: str = base_url
+        self.latency_threshold: float = latency_threshold or at_home_latency_threshold
+        self.error_threshold: int = error_threshold or at_home_error_threshold
+        self.report_url: str = report_url or mangadex_report_url
+        self.failures: int = 0
+        self.received: int = 0
+
+        self._unhealthy: asyncio.Event = asyncio.Event()
+        self._reports: set[asyncio.Task] = set()
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Whether the node has stayed under the error threshold
+        """
+
+        return not self._unhealthy.is_set()
+
+    async def wait_unhealthy(self) -> None:
+        """
+        Waits until the node becomes unhealthy
+        """
+
+        await self._unhealthy.wait()
+
+    def record(
+        self, url: str, success: bool, size: int, duration: float, cached: bool
+    ) -> None:
+        """
+        Records the outcome of a request to the node and sends a report about it in the background
+
+        :param url: The url that was requested
+        :param success: Whether the request succeeded
+        :param size: The number of bytes received
+        :param duration: The number of seconds the request took
+        :param cached: Whether the node served the image from its cache
+        """
+
+        if success:
+            self.received += size
+
+        if not success or duration > self.latency_threshold:
+            self.failures += 1
+            if self.failures >= self.error_threshold:
+                self._unhealthy.set()
+
+        # Images served from MangaDex's own servers must not be reported
+        if (urlsplit(url).hostname or "").endswith("mangadex.org"):
+            return
+
+        task: asyncio.Task = asyncio.create_task(
+            self._send_report(
+                {
+                    "url": url,
+                    "success": success,
+                    "bytes": size,
+                    "duration": int(duration * 1000),
+                    "cached": cached,
+                }
+            )
+        )
+        self._reports.add(task)
+        task.add_done_callback(self._reports.discard)
+
+    async def flush_reports(self) -> None:
+        """
+        Waits for the reports that are still being sent
+        """
+
+        if self._reports:
+            await asyncio.gather(*self._reports, return_exceptions=True)
+
+    async def _send_report(self, report: dict) -> None:
+        """
+        Sends a report, ignoring any errors since reports are only a hint to MangaDex
+
+        :param report: The report to send
+        """
+
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire(self.report_url)
+
+            async with self.session.post(self.report_url, json=report):
+                pass
+        except Exception:
+            pass
+
+
+def rate_limited(
+    limiter: RateLimiter, url: str, error: ResponseStatusError
+) -> ResponseStatusError:
+    """
+    Pauses the limits of the url if the error says the request was rate limited
+
+    :param limiter: The RateLimiter the request waited on, if any
+    :param url: The url of the request
+    :param error: The error raised for the response
+    :return: The error
+    """
+
+    if limiter is not None and error.status == 429:
+        limiter.pause(url, error.retry_after if error.retry_after is not None else 1.0)
+
+    return error
+
+
+@metrics_service.instrument("fetch")
+async def fetch(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict = {},
+    retry_policy: RetryPolicy = None,
+    cache: ResponseCache = None,
+    limiter: RateLimiter = None,
+) -> dict:
+    """
+    Makes a GET request to the url and returns the response, retrying rate limited, failed and timed out requests.
+    Fresh responses are served from the cache without a request, and stale ones are revalidated with the server.
 
     :param session: The aiohttp.ClientSession to use
     :param url: The url to fetch
     :param params: The query parameters to pass to the url
+    :param retry_policy: The RetryPolicy to retry failed requests with, defaults to default_retry_policy
+    :param cache: The ResponseCache to store responses in, defaults to response_cache
+    :param limiter: The RateLimiter to wait on before every attempt, defaults to rate_limiter
     :return: The dictionary resulting from calling .json() on the response
     """
 
-    async with session.get(url, params=params) as response:
-        if response and response.status == 200:
-            return await response.json()
-        else:
-            raise Exception(
-                f"Error fetching url: {url}. Status code: {response.status}"
-            )
+    cache = cache or response_cache
+    limiter = limiter or rate_limiter
+    cached: dict = None
+    headers: dict = {}
+
+    if cache is not None and cache.get_ttl(url) > 0:
+        cached = cache.get(url, params)
+
+        if cached is not None and cached["fresh"]:
+            return cached["body"]
+
+        # Ask the server to confirm a stale response is still current instead of sending it again
+        if cached is not None and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached is not None and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    async def request() -> dict:
+        options: dict = {"headers": headers} if headers else {}
+
+        if limiter is not None:
+            await limiter.acquire(url)
+
+        async with session.get(url, params=params, **options) as response:
+            if response and response.status == 200:
+                body: dict = await response.json()
+
+                if cache is not None and cache.get_ttl(url) > 0:
+                    cache.put(
+                        url,
+                        params,
+                        body,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                    )
+
+                return body
+            elif response and response.status == 304 and cached is not None:
+                cache.refresh(url, params)
+                return cached["body"]
+            else:
+                raise rate_limited(
+                    limiter,
+                    url,
+                    ResponseStatusError(
+                        f"Error fetching url: {url}. Status code: {response.status}",
+                        response.status,
+                        parse_retry_after(response.headers),
+                    ),
+                )
+
+    return await (retry_policy or default_retry_policy).call(request)
 
 
 async def retrieve_mangas(session: aiohttp.ClientSession, query: str) -> dict:
@@ -51,23 +451,70 @@ async def retrieve_mangas(session: aiohttp.ClientSession, query: str) -> dict:
         return None
 
 
-async def retrieve_chapters(session: aiohttp.ClientSession, manga_id: str) -> dict:
+async def retrieve_manga(session: aiohttp.ClientSession, manga_id: str) -> dict:
     """
-    Retrieves chapters of the manga with the given manga_id from the MangaDex API
+    Retrieves the manga with the given manga_id from the MangaDex API
+
+    :param session: The aiohttp.ClientSession to use
+    :param manga_id: The id of the manga to retrieve
+    :return: A dictionary containing information for the manga
+    """
+    try:
+        url: str = f"{mangadex_root_url}/{manga_id}"
+
+        return await fetch(session, url)
+    except Exception as e:
+        print(e)
+        return None
+
+
+async def retrieve_chapters(
+    session: aiohttp.ClientSession,
+    manga_id: str,
+    languages: list[str] = None,
+    updated_since: str = None,
+) -> dict:
+    """
+    Retrieves chapters of the manga with the given manga_id from the MangaDex API. The first page of the feed
+    says how many chapters there are in total, and the remaining pages are then retrieved concurrently and
+    merged in order.
 
     :param session: The aiohttp.ClientSession to use
     :param manga_id: The id of the manga to retrieve chapters for
+    :param languages: The languages of the chapters to retrieve, defaults to English
+    :param updated_since: Only retrieve chapters updated at or after this time, formatted as
+    YYYY-MM-DDTHH:MM:SS in UTC
     :return: A dictionary containing information for chapters of the manga
     """
     try:
         url: str = f"{mangadex_root_url}/{manga_id}/feed"
         params: dict = {
-            "translatedLanguage[]": ["en"],
-            "limit": 500,
+            "translatedLanguage[]": languages or ["en"],
+            "limit": feed_page_size,
             "includeEmptyPages": 0,
+            "order[createdAt]": "asc",
         }
 
-        return await fetch(session, url, params)
+        if updated_since is not None:
+            params["updatedAtSince"] = updated_since
+
+        first_page: dict = await fetch(session, url, params)
+        total: int = min(first_page.get("total", 0), max_feed_offset)
+        remaining_pages: list[dict] = await asyncio.gather(
+            *[
+                fetch(session, url, {**params, "offset": offset})
+                for offset in range(feed_page_size, total, feed_page_size)
+            ]
+        )
+
+        if not remaining_pages:
+            return first_page
+
+        data: list[dict] = list(first_page["data"])
+        for page in remaining_pages:
+            data.extend(page["data"])
+
+        return {**first_page, "data": data, "limit": len(data), "offset": 0}
     except Exception as e:
         print(e)
         return None
@@ -92,38 +539,470 @@ async def retrieve_download_resources(
         return None
 
 
-async def retrieve_image_data(session: aiohttp.ClientSession, image_url: str) -> bytes:
+async def request_image(
+    session: aiohttp.ClientSession,
+    image_url: str,
+    read: Callable[[aiohttp.ClientResponse], Awaitable[tuple[T, int]]],
+    scheduler: FetchScheduler = None,
+    chapter_id: str = None,
+    retry_policy: RetryPolicy = None,
+    node: AtHomeNode = None,
+    timeout: float = None,
+    limiter: RateLimiter = None,
+    progress: ChapterProgress = None,
+) -> T:
     """
-    Retrieves the image data from the given image url
+    Requests an image and reads the response, retrying the image on its own if the request fails
+
+    :param session: The aiohttp.ClientSession to use
+    :param image_url: The url of the image to request
+    :param read: Reads a successful response, returning the result and the number of bytes received
+    :param scheduler: The FetchScheduler to wait on before making the request, if any
+    :param chapter_id: The id of the chapter the image belongs to, used by the scheduler to share requests fairly
+    :param retry_policy: The RetryPolicy to retry failed requests with, defaults to default_retry_policy
+    :param node: The AtHomeNode serving the image, which every attempt is recorded with, if any
+    :param timeout: The number of seconds after which a single attempt is abandoned, if any
+    :param limiter: The RateLimiter to wait on before every attempt, defaults to rate_limiter
+    :param progress: The ChapterProgress of the chapter the image belongs to, which the received bytes and
+    retries are recorded in, if any
+    :return: The result of reading the first successful response
+    """
+
+    limiter = limiter or rate_limiter
+
+    options: dict = {}
+    if timeout is not None:
+        options["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+    host: str = urlsplit(image_url).hostname or ""
+
+    async def request() -> T:
+        start: float = time.monotonic()
+
+        try:
+            async with session.get(image_url, **options) as response:
+                if response and response.status == 200:
+                    result, size = await read(response)
+                    duration: float = time.monotonic() - start
+
+                    if node is not None:
+                        node.record(
+                            image_url,
+                            True,
+                            size,
+                            duration,
+                            response.headers.get("X-Cache", "").startswith("HIT"),
+                        )
+
+                    metrics_service.observe(
+                        "image_request_duration_seconds", duration, host=host
+                    )
+                    metrics_service.increment("image_requests_total", host=host)
+                    metrics_service.increment("image_bytes_total", size, host=host)
+
+                    if progress is not None:
+                        progress.record_bytes(size)
+
+                    return result
+                else:
+                    raise rate_limited(
+                        limiter,
+                        image_url,
+                        ResponseStatusError(
+                            f"Failed to retrieve image data for {image_url}. Status code: {response.status}",
+                            response.status,
+                            parse_retry_after(response.headers),
+                        ),
+                    )
+        except Exception:
+            if node is not None:
+                node.record(image_url, False, 0, time.monotonic() - start, False)
+
+            metrics_service.increment("image_requests_total", host=host)
+            metrics_service.increment("image_request_errors_total", host=host)
+            raise
+
+    async def limited_request() -> T:
+        # Wait for the rate limit before taking a slot so waiting requests don't hold slots
+        if limiter is not None:
+            await limiter.acquire(image_url)
+
+        if scheduler is None:
+            return await request()
+
+        # The slot is only held for the request itself and not while waiting to retry
+        async with scheduler.request(image_url, chapter_id):
+            return await request()
+
+    return await (retry_policy or default_retry_policy).call(
+        limited_request, progress.record_retry if progress is not None else None
+    )
+
+
+@metrics_service.instrument(
+    "image", lambda image_data, *args, **kwargs: len(image_data or b"")
+)
+async def retrieve_image_data(
+    session: aiohttp.ClientSession,
+    image_url: str,
+    scheduler: FetchScheduler = None,
+    chapter_id: str = None,
+    retry_policy: RetryPolicy = None,
+    node: AtHomeNode = None,
+    timeout: float = None,
+    store: PageStore = None,
+    limiter: RateLimiter = None,
+    progress: ChapterProgress = None,
+) -> bytes:
+    """
+    Retrieves the image data from the given image url, retrying the page on its own if the request fails.
+    Pages that were downloaded before are read from the page store instead.
 
     :param session: The aiohttp.ClientSession to use
     :param image_url: The url of the image to retrieve data for
+    :param scheduler: The FetchScheduler to wait on before making the request, if any
+    :param chapter_id: The id of the chapter the image belongs to, used by the scheduler to share requests fairly
+    :param retry_policy: The RetryPolicy to retry failed requests with, defaults to default_retry_policy
+    :param node: The AtHomeNode serving the image, which every attempt is recorded with, if any
+    :param timeout: The number of seconds after which a single attempt is abandoned, if any
+    :param store: The PageStore to read and store pages with, defaults to page_store
+    :param limiter: The RateLimiter to wait on before every attempt, defaults to rate_limiter
+    :param progress: The ChapterProgress to record the received bytes and retries in, if any
     :return: The binary data of the image
     """
 
-    async with session.get(image_url) as response:
-        if response and response.status == 200:
-            return await response.read()
-        else:
-            raise Exception(
-                f"Failed to retrieve image data for {image_url}. Status code: {response.status}"
+    store = store or page_store
+
+    if store is not None:
+        image_data: bytes = await asyncio.to_thread(store.get, image_url)
+
+        if image_data is not None:
+            return image_data
+
+    async def read(response: aiohttp.ClientResponse) -> tuple[bytes, int]:
+        image_data: bytes = await response.read()
+
+        return image_data, len(image_data)
+
+    image_data: bytes = await request_image(
+        session,
+        image_url,
+        read,
+        scheduler,
+        chapter_id,
+        retry_policy,
+        node,
+        timeout,
+        limiter,
+        progress,
+    )
+
+    if store is not None and image_data is not None:
+        await asyncio.to_thread(store.put, image_url, image_data)
+
+    return image_data
+
+
+@metrics_service.instrument(
+    "image", lambda path, *args, **kwargs: os.path.getsize(path)
+)
+async def retrieve_image_file(
+    session: aiohttp.ClientSession,
+    image_url: str,
+    scheduler: FetchScheduler = None,
+    chapter_id: str = None,
+    retry_policy: RetryPolicy = None,
+    node: AtHomeNode = None,
+    timeout: float = None,
+    store: PageStore = None,
+    limiter: RateLimiter = None,
+    progress: ChapterProgress = None,
+) -> str:
+    """
+    Streams the image at the given image url into the page store in chunks as it arrives, so the image is never
+    held in memory as a whole. The partial file is opened, written, closed and discarded in threads, a few
+    chunks at a time, so a slow disk doesn't stall the event loop every download shares. An image that ends
+    before its Content-Length is retried like a dropped connection and never stored, unless the response is
+    compressed, since the Content-Length is then the size of the compressed image. Pages that were downloaded
+    before aren't requested again.
+
+    :param session: The aiohttp.ClientSession to use
+    :param image_url: The url of the image to retrieve
+    :param scheduler: The FetchScheduler to wait on before making the request, if any
+    :param chapter_id: The id of the chapter the image belongs to, used by the scheduler to share requests fairly
+    :param retry_policy: The RetryPolicy to retry failed requests with, defaults to default_retry_policy
+    :param node: The AtHomeNode serving the image, which every attempt is recorded with, if any
+    :param timeout: The number of seconds after which a single attempt is abandoned, if any
+    :param store: The PageStore to stream the image into, defaults to page_store
+    :param limiter: The RateLimiter to wait on before every attempt, defaults to rate_limiter
+    :param progress: The ChapterProgress to record the received bytes and retries in, if any
+    :return: The path of the image in the page store
+    """
+
+    store = store or page_store
+
+    if store is None:
+        raise ValueError("Streaming images requires a page store")
+
+    path: str = await asyncio.to_thread(store.get_file, image_url)
+
+    if path is not None:
+        return path
+
+    async def read(response: aiohttp.ClientResponse) -> tuple[str, int]:
+        size: int = 0
+        buffered: list[bytes] = []
+        buffered_size: int = 0
+        file: BinaryIO = await asyncio.to_thread(store.open_part, image_url)
+
+        try:
+            async for chunk in response.content.iter_chunked(image_chunk_size):
+                buffered.append(chunk)
+                buffered_size += len(chunk)
+                size += len(chunk)
+
+                if buffered_size >= image_flush_size:
+                    await asyncio.to_thread(file.writelines, buffered)
+                    buffered, buffered_size = [], 0
+
+            await asyncio.to_thread(file.writelines, buffered)
+            await asyncio.to_thread(file.close)
+
+            if (
+                response.content_length is not None
+                and "Content-Encoding" not in response.headers
+                and size != response.content_length
+            ):
+                raise aiohttp.ClientPayloadError(
+                    f"Received {size} of {response.content_length} bytes of {image_url}"
+                )
+
+            return (
+                await asyncio.to_thread(store.commit_part, image_url, file.name),
+                size,
             )
+        except BaseException:
+            await asyncio.to_thread(file.close)
+            await asyncio.to_thread(store.discard_part, file.name)
+            raise
+
+    return await request_image(
+        session,
+        image_url,
+        read,
+        scheduler,
+        chapter_id,
+        retry_policy,
+        node,
+        timeout,
+        limiter,
+        progress,
+    )
 
 
 async def retrieve_image_data_list(
-    session: aiohttp.ClientSession, url_list: list[str]
+    session: aiohttp.ClientSession,
+    url_list: list[str],
+    scheduler: FetchScheduler = None,
+    chapter_id: str = None,
 ) -> list[bytes]:
     """
     Retrieves the image data from the given image urls
 
     :param session: The aiohttp.ClientSession to use
     :param url_list: The urls of the images to retrieve data for
+    :param scheduler: The FetchScheduler to limit the number of requests in flight with, if any
+    :param chapter_id: The id of the chapter the images belong to
     :return: A list containing the binary data of the images
     """
     try:
-        tasks = [retrieve_image_data(session, url) for url in url_list]
+        tasks = [
+            retrieve_image_data(session, url, scheduler, chapter_id) for url in url_list
+        ]
 
         return await asyncio.gather(*tasks)
     except Exception as e:
         print(e)
         return None
+
+
+async def retrieve_missing_pages(
+    session: aiohttp.ClientSession,
+    url_list: list[str],
+    pages: list[bytes],
+    node: AtHomeNode,
+    scheduler: FetchScheduler = None,
+    chapter_id: str = None,
+    on_page: Callable[[int], None] = None,
+    stream: bool = False,
+    progress: ChapterProgress = None,
+) -> None:
+    """
+    Retrieves the image data of every page that is still missing, filling it into pages as each one arrives.
+    Stops early once the node serving the pages becomes unhealthy, leaving the remaining pages missing.
+
+    :param session: The aiohttp.ClientSession to use
+    :param url_list: The urls of every page of the chapter
+    :param pages: The image data of every page of the chapter, with None for missing pages
+    :param node: The AtHomeNode serving the pages
+    :param scheduler: The FetchScheduler to limit the number of requests in flight with, if any
+    :param chapter_id: The id of the chapter the pages belong to
+    :param on_page: Called with the index of each page as soon as it arrives
+    :param stream: Whether to stream the pages into the page store and fill in their paths instead of their data
+    :param progress: The ChapterProgress to record the arrived pages, received bytes and retries in, if any
+    :return: None
+    """
+
+    retrieve_page_data: Callable = (
+        retrieve_image_file if stream else retrieve_image_data
+    )
+
+    async def retrieve_page(index: int) -> None:
+        try:
+            pages[index] = await retrieve_page_data(
+                session,
+                url_list[index],
+                scheduler,
+                chapter_id,
+                node=node,
+                timeout=at_home_request_timeout,
+                progress=progress,
+            )
+        except Exception:
+            return
+
+        if pages[index] is None:
+            return
+
+        if progress is not None:
+            progress.record_page()
+        if on_page is not None:
+            on_page(index)
+
+    page_tasks: list[asyncio.Task] = [
+        asyncio.create_task(retrieve_page(i))
+        for i, page in enumerate(pages)
+        if page is None
+    ]
+    unhealthy_task: asyncio.Task = asyncio.create_task(node.wait_unhealthy())
+
+    try:
+        if page_tasks:
+            await asyncio.wait(
+                [asyncio.gather(*page_tasks), unhealthy_task],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+    finally:
+        for task in [*page_tasks, unhealthy_task]:
+            task.cancel()
+        await asyncio.gather(*page_tasks, unhealthy_task, return_exceptions=True)
+
+
+async def retrieve_chapter_image_data(
+    session: aiohttp.ClientSession,
+    chapter_id: str,
+    scheduler: FetchScheduler = None,
+    on_page: Callable[[int], None] = None,
+    image_session: aiohttp.ClientSession = None,
+    stream: bool = False,
+    quality: str = None,
+    progress: ChapterProgress = None,
+) -> list[bytes]:
+    """
+    Retrieves the download resources of the chapter with the given chapter_id and then the image data
+    for each page of the chapter. If the MangaDex@Home node serving the chapter fails or is too slow, a fresh
+    node is requested and only the pages that are still missing are retrieved from it. When streaming, each
+    page is written to the page store as it arrives and only its path is kept, so memory use doesn't grow with
+    the size or number of pages.
+
+    :param session: The aiohttp.ClientSession to use
+    :param chapter_id: The id of the chapter to retrieve image data for
+    :param scheduler: The FetchScheduler to limit the number of image requests in flight with, if any
+    :param on_page: Called with the index of each page as soon as it arrives
+    :param image_session: The aiohttp.ClientSession to retrieve the pages with, defaults to session
+    :param stream: Whether to stream the pages into the page store, which must be enabled, and return their paths
+    :param quality: Either "data", "data-saver" or "auto" to let quality_selector pick the quality from the
+    measured bandwidth and the size of the chapter, defaults to image_quality
+    :param progress: The ChapterProgress to record the number of pages, the arrived pages, received bytes and
+    retries of the chapter in, if any
+    :return: A list containing the binary data, or the paths when streaming, of the chapter's pages in page order
+    """
+
+    pages: list[bytes] = None
+    quality = quality or image_quality
+
+    if quality != "auto" and quality not in image_qualities:
+        raise ValueError(f"Unknown image quality: {quality}")
+
+    if stream and page_store is None:
+        raise ValueError("Streaming pages requires a page store")
+
+    if page_store is not None:
+        # A chapter stored in either quality is good enough when the quality is picked automatically
+        for stored_quality in image_qualities if quality == "auto" else [quality]:
+            pages = await asyncio.to_thread(
+                page_store.get_chapter_files if stream else page_store.get_chapter,
+                chapter_id,
+                stored_quality,
+            )
+
+            if pages is not None:
+                if progress is not None:
+                    progress.set_pages(len(pages), len(pages))
+
+                return pages
+
+    for _ in range(max_at_home_refreshes + 1):
+        download_resources: dict = await retrieve_download_resources(
+            session, chapter_id
+        )
+
+        if download_resources is None:
+            return None
+
+        # Keep the quality picked for the first node so the pages of every node match
+        if quality == "auto":
+            quality = quality_selector.choose(
+                len(download_resources["chapter"]["data"])
+            )
+
+        url_list: list[str] = process_download_resource_data(
+            download_resources, quality
+        )
+
+        if pages is None or len(pages) != len(url_list):
+            pages = [None] * len(url_list)
+
+        missing: int = pages.count(None)
+
+        if progress is not None:
+            progress.set_pages(len(pages), len(pages) - missing)
+
+        start: float = time.monotonic()
+        node: AtHomeNode = AtHomeNode(session, download_resources["baseUrl"])
+        await retrieve_missing_pages(
+            image_session or session,
+            url_list,
+            pages,
+            node,
+            scheduler,
+            chapter_id,
+            on_page,
+            stream,
+            progress,
+        )
+        quality_selector.record(
+            quality,
+            node.received,
+            missing - pages.count(None),
+            time.monotonic() - start,
+        )
+        await node.flush_reports()
+
+        if None not in pages:
+            if page_store is not None:
+                await asyncio.to_thread(page_store.put_chapter, chapter_id, url_list)
+
+            return pages
+
+    return None
@@ -0,0 +1,127 @@
+import time
+
+
+class ChapterProgress:
+    """
+    Follows the download of a single chapter while it happens: how many of its pages have arrived, how many
+    bytes were received and how many requests were retried. The download pipeline and the requests of the
+    chapter's pages update it from the event loop, so it can be read at any time without locking, for example
+    by a UI redrawing its progress.
+    """
+
+    states: tuple[str, ...] = (
+        "pending",
+        "downloading",
+        "converting",
+        "done",
+        "failed",
+        "cancelled",
+    )
+
+    def __init__(self, chapter: dict) -> None:
+        """
+        :param chapter: The processed chapter data of the chapter
+        """
+
+        self.chapter: dict = chapter
+        self.state: str = "pending"
+        # Unknown until the download resources of the chapter are retrieved
+        self.pages_total: int = None
+        self.pages_done: int = 0
+        self.bytes: int = 0
+        self.retries: int = 0
+        self.started: float = None
+        self.finished: float = None
+
+    @property
+    def elapsed(self) -> float:
+        """
+        The number of seconds the chapter has been downloading for, or None if it hasn't started
+        """
+
+        if self.started is None:
+            return None
+
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def bytes_per_second(self) -> float:
+        """
+        The number of bytes received per second since the chapter started downloading, or None if it hasn't
+        """
+
+        elapsed: float = self.elapsed
+
+        return self.bytes / elapsed if elapsed else None
+
+    @property
+    def eta(self) -> float:
+        """
+        The estimated number of seconds until every page of the chapter has arrived, going by how long the
+        pages so far took, or None while there is nothing to estimate from
+        """
+
+        if self.state != "downloading" or not self.pages_total or not self.pages_done:
+            return None
+
+        return self.elapsed * (self.pages_total - self.pages_done) / self.pages_done
+
+    def start(self) -> None:
+        """
+        Marks the chapter as downloading, starting the clock its throughput and ETA are measured with
+        """
+
+        self.state = "downloading"
+        self.started = time.monotonic()
+        self.finished = None
+
+    def set_pages(self, pages_total: int, pages_done: int = 0) -> None:
+        """
+        Records the number of pages of the chapter once its download resources are known
+
+        :param pages_total: The number of pages of the chapter
+        :param pages_done: The number of pages that already arrived
+        """
+
+        self.pages_total = pages_total
+        self.pages_done = pages_done
+
+    def record_page(self) -> None:
+        """
+        Records a page that arrived
+        """
+
+        self.pages_done += 1
+
+    def record_bytes(self, size: int) -> None:
+        """
+        Records data received for a page
+
+        :param size: The number of bytes received
+        """
+
+        self.bytes += size
+
+    def record_retry(self, error_class: str = None) -> None:
+        """
+        Records a request that failed and is retried
+
+        :param error_class: The class of the error the request failed with, see RetryPolicy.classify
+        """
+
+        self.retries += 1
+
+    def finish(self, state: str) -> None:
+        """
+        Marks the chapter as finished, stopping its clock
+
+        :param state: Either "done", "failed" or "cancelled"
+        """
+
+        if state not in self.states[3:]:
+            raise ValueError(f"Unknown final chapter state: {state}")
+
+        self.state = state
+
+        if self.started is not None and self.finished is None:
+            self.finished = time.monotonic()
@@ -1,3 +1,11 @@
+from datetime import datetime, timezone
+
+# The path segment of each image quality and the key listing its pages in the download resources
+image_qualities: dict[str, str] = {"data": "data", "data-saver": "dataSaver"}
+# The image qualities that can be asked for, auto picks one of image_qualities for every chapter
+image_quality_modes: list[str] = [*image_qualities, "auto"]
+
+
 def process_manga_data(manga_data: dict) -> list[dict]:
     """
     Processes the manga_data dictionary to contain only the following fields:
@@ -36,7 +44,8 @@ def process_chapter_data(chapter_data: dict) -> list[dict]:
     {
         title: title of the chapter,
         id: chapterID for the API,
-        chapter_number: chapter number
+        chapter_number: chapter number,
+        volume: volume number, or None if the chapter isn't in a volume
     }
 
     :param chapter_data: The chapter data dictionary
@@ -62,6 +71,7 @@ def process_chapter_data(chapter_data: dict) -> list[dict]:
                 and element["attributes"]["chapter"]
                 else "0"
             )
+            chapter["volume"] = element["attributes"].get("volume") or None
 
             if chapter["chapter_number"] not in already_contains:
                 already_contains.add(chapter["chapter_number"])
@@ -72,20 +82,111 @@ def process_chapter_data(chapter_data: dict) -> list[dict]:
     return processed_chapter_data
 
 
-def process_download_resource_data(download_resources: dict) -> list[str]:
+def get_latest_update(chapter_data: dict) -> str:
+    """
+    Finds when the most recently updated chapter of the chapter_data dictionary was updated, in the format the
+    updatedAtSince parameter of the MangaDex API expects
+
+    :param chapter_data: The chapter data dictionary
+    :return: The latest updatedAt of the chapters as YYYY-MM-DDTHH:MM:SS in UTC, or None if no chapter has one
+    """
+
+    latest_update: datetime = None
+
+    for element in chapter_data["data"]:
+        updated_at: str = element.get("attributes", {}).get("updatedAt")
+
+        if not updated_at:
+            continue
+
+        update: datetime = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+        if update.tzinfo is not None:
+            update = update.astimezone(timezone.utc).replace(tzinfo=None)
+
+        if latest_update is None or update > latest_update:
+            latest_update = update
+
+    if latest_update is None:
+        return None
+
+    return latest_update.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def parse_chapter_ranges(text: str) -> list[tuple[float, float]]:
+    """
+    Parses a comma separated list of chapter numbers and inclusive ranges, where either end of a range can be
+    left open, e.g. "1-10,12,15.5,20-"
+
+    :param text: The chapter ranges to parse
+    :return: A list of pairs of the lowest and highest chapter number of each range
+    """
+
+    ranges: list[tuple[float, float]] = []
+
+    for part in text.split(","):
+        part = part.strip()
+
+        if not part:
+            continue
+
+        try:
+            if "-" in part:
+                low, high = part.split("-", 1)
+                ranges.append(
+                    (
+                        float(low) if low.strip() else float("-inf"),
+                        float(high) if high.strip() else float("inf"),
+                    )
+                )
+            else:
+                ranges.append((float(part), float(part)))
+        except ValueError:
+            raise ValueError(f"Invalid chapter range: {part}")
+
+    return ranges
+
+
+def select_chapters(
+    processed_chapter_data: list[dict], ranges: list[tuple[float, float]]
+) -> list[dict]:
+    """
+    Selects the chapters whose chapter number is in any of the ranges
+
+    :param processed_chapter_data: The processed chapter data
+    :param ranges: The pairs of the lowest and highest chapter number of each range, every chapter is selected
+    if there are none
+    :return: A list containing the processed chapter data of the selected chapters
+    """
+
+    if not ranges:
+        return list(processed_chapter_data)
+
+    return [
+        chapter
+        for chapter in processed_chapter_data
+        if any(low <= float(chapter["chapter_number"]) <= high for low, high in ranges)
+    ]
+
+
+def process_download_resource_data(
+    download_resources: dict, quality: str = "data"
+) -> list[str]:
     """
     Processes the download_resources dictionary into a list of download urls
 
     :param download_resources: The download resources data dictionary
+    :param quality: Either "data" for the original pages or "data-saver" for compressed ones
     :return: A list containing the download urls
     """
 
+    if quality not in image_qualities:
+        raise ValueError(f"Unknown image quality: {quality}")
+
     download_urls: list[str] = []
     base_url: str = download_resources["baseUrl"]
     url_hash: str = download_resources["chapter"]["hash"]
-    quality: str = "data"
 
-    for element in download_resources["chapter"][quality]:
+    for element in download_resources["chapter"][image_qualities[quality]]:
         download_urls.append(f"{base_url}/{quality}/{url_hash}/{element}")
 
     return download_urls
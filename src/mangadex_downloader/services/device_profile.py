@@ -0,0 +1,141 @@
+import io
+from PIL import Image
+from .pdf_writer import read_jpeg_header
+
+
+class DeviceProfile:
+    """
+    Describes the pages a reading device wants: at most a given size, optionally grayscale, encoded as JPEG at a
+    given quality. Transforming a page decodes JPEGs with Pillow's draft mode, which lets libjpeg scale the page
+    down by up to 8x and convert it to grayscale while decoding, so a downscaled page is much faster to produce
+    than by decoding it at full size first. Pages that already fit the profile are left as they are.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_width: int = None,
+        max_height: int = None,
+        grayscale: bool = False,
+        quality: int = 85,
+        draft: bool = True,
+    ) -> None:
+        """
+        :param name: The name of the profile
+        :param max_width: The maximum width of a page in pixels, if any
+        :param max_height: The maximum height of a page in pixels, if any
+        :param grayscale: Whether pages are converted to grayscale
+        :param quality: The JPEG quality transformed pages are encoded with
+        :param draft: Whether JPEGs are scaled down while they are decoded
+        """
+
+        self.name: str = name
+        self.max_width: int = max_width
+        self.max_height: int = max_height
+        self.grayscale: bool = grayscale
+        self.quality: int = quality
+        self.draft: bool = draft
+
+    def get_size(self, width: int, height: int) -> tuple[int, int]:
+        """
+        :param width: The width of a page
+        :param height: The height of a page
+        :return: The size of the page scaled down to fit the profile, keeping its aspect ratio
+        """
+
+        scale: float = min(
+            1.0,
+            self.max_width / width if self.max_width else 1.0,
+            self.max_height / height if self.max_height else 1.0,
+        )
+
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def transform(self, image_data: bytes) -> bytes:
+        """
+        Scales a page down to fit the profile, converts it to grayscale if the profile asks for it and encodes
+        it as JPEG
+
+        :param image_data: The binary data of the page
+        :return: The binary data of the transformed page as JPEG, or image_data if it already fits the profile
+        """
+
+        header: tuple[int, int, int] = read_jpeg_header(image_data)
+
+        # JPEGs that already fit are embedded as they are, re-encoding them would only lose quality
+        if header is not None:
+            width, height, components = header
+
+            if self.get_size(width, height) == (width, height) and (
+                components == 1 or (components == 3 and not self.grayscale)
+            ):
+                return image_data
+
+        with Image.open(io.BytesIO(image_data)) as image:
+            size: tuple[int, int] = self.get_size(image.width, image.height)
+            mode: str = "L" if self.grayscale or image.mode in ("1", "L") else "RGB"
+
+            if self.draft and image.format == "JPEG":
+                image.draft(mode, size)
+
+            page: Image.Image = image.convert(mode)
+
+        if page.size != size:
+            page = page.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+        buffer: io.BytesIO = io.BytesIO()
+        page.save(buffer, "JPEG", quality=self.quality)
+
+        return buffer.getvalue()
+
+    @staticmethod
+    def parse(text: str) -> "DeviceProfile":
+        """
+        Parses the name of one of device_profiles or a custom profile like "1264x1680,grayscale,quality=80,nodraft",
+        where every field is optional
+
+        :param text: The text to parse
+        :return: The parsed profile
+        """
+
+        if text in device_profiles:
+            return device_profiles[text]
+
+        profile: DeviceProfile = DeviceProfile(text)
+
+        for field in text.split(","):
+            field = field.strip().lower()
+
+            try:
+                if field == "grayscale":
+                    profile.grayscale = True
+                elif field == "nodraft":
+                    profile.draft = False
+                elif field.startswith("quality="):
+                    profile.quality = int(field[len("quality=") :])
+                elif "x" in field:
+                    width, height = field.split("x")
+                    profile.max_width = int(width) or None
+                    profile.max_height = int(height) or None
+                else:
+                    raise ValueError()
+            except ValueError:
+                raise ValueError(
+                    f"Invalid device profile: {text}, expected one of {', '.join(device_profiles)} "
+                    'or fields like "1264x1680,grayscale,quality=80"'
+                )
+
+        if not 1 <= profile.quality <= 95:
+            raise ValueError(f"Invalid JPEG quality in device profile: {text}")
+
+        return profile
+
+
+# Profiles of common reading devices, sized to their screens
+device_profiles: dict[str, DeviceProfile] = {
+    "kindle": DeviceProfile("kindle", 1236, 1648, grayscale=True, quality=80),
+    "kindle-scribe": DeviceProfile("kindle-scribe", 1860, 2480, grayscale=True),
+    "kobo": DeviceProfile("kobo", 1264, 1680, grayscale=True, quality=80),
+    "remarkable": DeviceProfile("remarkable", 1404, 1872, grayscale=True, quality=80),
+    "tablet": DeviceProfile("tablet", 1600, 2560),
+}
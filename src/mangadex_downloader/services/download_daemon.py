@@ -0,0 +1,540 @@
+import asyncio
+import aiohttp
+import hashlib
+import json
+import os
+from aiohttp import web
+from concurrent.futures import Executor
+from typing import Callable
+from . import metrics_service
+from .api_access_service import FetchScheduler, retrieve_chapters, retrieve_manga
+from .data_processing_service import (
+    image_quality_modes,
+    parse_chapter_ranges,
+    process_chapter_data,
+    process_manga_data,
+    select_chapters,
+)
+from .device_profile import DeviceProfile
+from .download_pipeline import (
+    DownloadPipeline,
+    create_executor,
+    default_output_group,
+    get_output_files,
+    output_groups,
+    pdf_workers,
+)
+from .file_access_service import (
+    get_cache_directory,
+    get_output_backend,
+    output_backends,
+)
+from .job_journal import JobJournal
+
+
+class DownloadDaemon:
+    """
+    Downloads a queue of manga for as long as it runs. Jobs are submitted directly, appended to a queue file or
+    posted to a local HTTP endpoint, and a fixed number of series workers download them over shared API and
+    image sessions and one FetchScheduler, converting every chapter in one shared executor so the network and
+    every core stay busy no matter how many series are queued. The workers of the executor are split between the
+    series workers, so the series being downloaded don't hold more converting chapters than it can convert.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        output_path: str = None,
+        series_workers: int = 2,
+        chapter_workers: int = 4,
+        executor: Executor = None,
+        executor_workers: int = None,
+        scheduler: FetchScheduler = None,
+        journal: JobJournal = None,
+        on_event: Callable[[str, dict], None] = None,
+        image_session: aiohttp.ClientSession = None,
+        quality: str = None,
+        profile: DeviceProfile = None,
+        output_format: str = None,
+        group: str = None,
+    ) -> None:
+        """
+        :param session: The aiohttp.ClientSession to use
+        :param output_path: The directory to save the output files of jobs that don't name one to, defaults to
+        the current working directory
+        :param series_workers: The number of series downloaded concurrently
+        :param chapter_workers: The number of chapters of each series downloaded concurrently
+        :param executor: The executor to convert chapters in, one is created with create_executor if none is given
+        :param executor_workers: The number of workers of the executor, or of the one created if none is given,
+        defaults to the MANGADEX_PDF_WORKERS environment variable or the number of cores
+        :param scheduler: The FetchScheduler shared by the image requests of every job, one is created if none is given
+        :param journal: The JobJournal to record the progress of every job in, if any
+        :param on_event: Called with the name and fields of an event whenever a job or chapter changes state
+        :param image_session: The aiohttp.ClientSession to download pages with, defaults to session
+        :param quality: The image quality of jobs that don't name one, defaults to api_access_service.image_quality
+        :param profile: The DeviceProfile to transform the pages of jobs that don't name one with, if any
+        :param output_format: The output format of jobs that don't name one, defaults to
+        file_access_service.default_output_format
+        :param group: How the chapters of jobs that don't name a grouping are grouped into output files, one of
+        download_pipeline.output_groups
+        """
+
+        self.session: aiohttp.ClientSession = session
+        self.output_path: str = output_path or os.getcwd()
+        self.series_workers: int = max(1, series_workers)
+        self.chapter_workers: int = max(1, chapter_workers)
+        self.executor: Executor = executor
+        self.executor_workers: int = max(1, executor_workers or pdf_workers)
+        self.scheduler: FetchScheduler = scheduler or FetchScheduler()
+        self.journal: JobJournal = journal
+        self.on_event: Callable[[str, dict], None] = on_event
+        self.image_session: aiohttp.ClientSession = image_session
+        self.quality: str = quality
+        self.profile: DeviceProfile = profile
+        self.output_format: str = get_output_backend(output_format).name
+        self.group: str = group or default_output_group
+        self.jobs: dict[int, dict] = {}
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # The DeviceProfile of every job, which the job itself only names
+        self._profiles: dict[int, DeviceProfile] = {}
+        self._stopped: asyncio.Event = asyncio.Event()
+
+    def submit(self, request: dict) -> dict:
+        """
+        Queues a job
+
+        :param request: A dictionary containing the manga_id of the manga to download and optionally the
+        chapters ranges, languages, image quality, device profile, output format, grouping and output directory
+        of the job
+        :return: The dictionary tracking the state of the job
+        """
+
+        if not isinstance(request, dict) or not isinstance(
+            request.get("manga_id"), str
+        ):
+            raise ValueError("A job needs the manga_id of the manga to download")
+
+        languages: list[str] = request.get("languages") or ["en"]
+
+        if not isinstance(languages, list) or not all(
+            isinstance(language, str) for language in languages
+        ):
+            raise ValueError("The languages of a job must be a list of strings")
+
+        quality: str = request.get("quality") or self.quality
+
+        if quality is not None and quality not in image_quality_modes:
+            raise ValueError(
+                f"The quality of a job must be one of {', '.join(image_quality_modes)}"
+            )
+
+        profile: DeviceProfile = self.profile
+
+        if request.get("profile") is not None:
+            if not isinstance(request["profile"], str):
+                raise ValueError("The profile of a job must be a string")
+            profile = DeviceProfile.parse(request["profile"])
+
+        output_format: str = request.get("format") or self.output_format
+
+        if output_format not in output_backends:
+            raise ValueError(
+                f"The format of a job must be one of {', '.join(output_backends)}"
+            )
+
+        group: str = request.get("group") or self.group
+
+        if group not in output_groups:
+            raise ValueError(
+                f"The group of a job must be one of {', '.join(output_groups)}"
+            )
+
+        job: dict = {
+            "id": len(self.jobs) + 1,
+            "manga_id": request["manga_id"],
+            "chapters": str(request.get("chapters") or ""),
+            "languages": languages,
+            "quality": quality,
+            "profile": profile.name if profile is not None else None,
+            "format": output_format,
+            "group": group,
+            "output": str(request.get("output") or self.output_path),
+            "status": "queued",
+            "downloaded": 0,
+            "failed": 0,
+        }
+        # Reject invalid ranges before the job is queued
+        parse_chapter_ranges(job["chapters"])
+
+        self.jobs[job["id"]] = job
+        self._profiles[job["id"]] = profile
+        self._queue.put_nowait(job)
+        self._emit("job", job)
+
+        return job
+
+    async def run(self) -> None:
+        """
+        Downloads queued jobs until stop is called
+        """
+
+        executor: Executor = self.executor or create_executor(
+            max_workers=self.executor_workers
+        )
+        conversion_workers: int = max(1, self.executor_workers // self.series_workers)
+        workers: list[asyncio.Task] = [
+            asyncio.create_task(self._series_worker(executor, conversion_workers))
+            for _ in range(self.series_workers)
+        ]
+
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            if self.executor is None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, executor.shutdown
+                )
+
+    def stop(self) -> None:
+        """
+        Stops the daemon, abandoning the jobs that are still queued or running
+        """
+
+        self._stopped.set()
+
+    async def watch_file(
+        self, path: str, interval: float = 1.0, state_path: str = None
+    ) -> None:
+        """
+        Submits every job appended to a queue file as a line of JSON, checking the file for new lines every
+        interval seconds until the daemon stops. The lines whose jobs finished are remembered in a state file, so
+        a restarted daemon only submits the jobs it hadn't finished yet. Lines that aren't valid jobs, including
+        lines that aren't UTF-8, are reported as errors and skipped.
+
+        :param path: The path of the queue file
+        :param interval: The number of seconds between checks
+        :param state_path: The path of the file the finished lines are remembered in, defaults to a file named
+        after the queue file in get_cache_directory("daemon")
+        """
+
+        if state_path is None:
+            state_path = os.path.join(
+                await asyncio.to_thread(get_cache_directory, "daemon"),
+                hashlib.sha256(os.path.abspath(path).encode()).hexdigest() + ".json",
+            )
+
+        state: dict = await asyncio.to_thread(self._read_state, state_path)
+        # Every line before position is finished, the lines after it that finished are skipped when read
+        position: int = state["position"]
+        skipped: set[int] = set(state["finished"])
+        read_position: int = position
+        # The end and job of every line read since position by the offset it starts at, without a job once the
+        # line is finished
+        lines: dict[int, tuple[int, dict]] = {}
+
+        while True:
+            # Lines are read in order from position, with nothing but blank lines between them
+            for start in sorted(lines):
+                end, job = lines[start]
+
+                if job is not None and job["status"] not in ("done", "failed"):
+                    break
+
+                del lines[start]
+                position = end
+
+            finished: list[int] = sorted(
+                start
+                for start, (_, job) in lines.items()
+                if job is None or job["status"] in ("done", "failed")
+            )
+
+            if state != {"position": position, "finished": finished}:
+                state = {"position": position, "finished": finished}
+                await asyncio.to_thread(self._write_state, state_path, state)
+
+            if self._stopped.is_set():
+                return
+
+            read_lines, next_position = await asyncio.to_thread(
+                self._read_lines, path, read_position
+            )
+
+            # The file was truncated or replaced, so the offsets of its lines start over
+            if (read_lines[0][0] if read_lines else next_position) < read_position:
+                position, skipped, lines = 0, set(), {}
+
+            read_position = next_position
+
+            for start, end, line in read_lines:
+                job: dict = None
+
+                if start not in skipped:
+                    try:
+                        job = self.submit(json.loads(line.decode()))
+                    except ValueError as e:
+                        # Invalid JSON and undecodable bytes both raise ValueError
+                        self._emit(
+                            "error",
+                            {"message": str(e), "line": line.decode(errors="replace")},
+                        )
+
+                lines[start] = (end, job)
+
+            try:
+                await asyncio.wait_for(self._stopped.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def create_app(self) -> web.Application:
+        """
+        Creates the HTTP application jobs are submitted to with POST /jobs and inspected with GET /jobs and
+        GET /jobs/{id}. While metrics are enabled, GET /metrics serves them in the Prometheus text format, or as
+        JSON with ?format=json.
+
+        :return: The aiohttp application
+        """
+
+        async def post_job(request: web.Request) -> web.Response:
+            try:
+                job: dict = self.submit(await request.json())
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            return web.json_response(job, status=202)
+
+        async def get_jobs(request: web.Request) -> web.Response:
+            return web.json_response(list(self.jobs.values()))
+
+        async def get_job(request: web.Request) -> web.Response:
+            job: dict = self.jobs.get(int(request.match_info["id"]))
+
+            if job is None:
+                return web.json_response({"error": "Unknown job"}, status=404)
+
+            return web.json_response(job)
+
+        async def get_metrics(request: web.Request) -> web.Response:
+            if metrics_service.metrics is None:
+                return web.json_response({"error": "Metrics are disabled"}, status=404)
+
+            if request.query.get("format") == "json":
+                return web.json_response(metrics_service.metrics.to_dict())
+
+            return web.Response(
+                text=metrics_service.metrics.to_prometheus(), content_type="text/plain"
+            )
+
+        app: web.Application = web.Application()
+        app.router.add_post("/jobs", post_job)
+        app.router.add_get("/jobs", get_jobs)
+        app.router.add_get(r"/jobs/{id:\d+}", get_job)
+        app.router.add_get("/metrics", get_metrics)
+
+        return app
+
+    async def _series_worker(self, executor: Executor, conversion_workers: int) -> None:
+        """
+        Downloads queued jobs one at a time
+
+        :param executor: The executor to convert chapters in
+        :param conversion_workers: The number of chapters of a job converted concurrently
+        """
+
+        while True:
+            job: dict = await self._queue.get()
+            self._set_status(job, "running")
+
+            try:
+                success: bool = await self._download(job, executor, conversion_workers)
+            except Exception as e:
+                self._emit("error", {"job": job["id"], "message": str(e)})
+                success = False
+
+            self._set_status(job, "done" if success else "failed")
+
+    async def _download(
+        self, job: dict, executor: Executor, conversion_workers: int = None
+    ) -> bool:
+        """
+        Downloads the chapters of a job
+
+        :param job: The job to download
+        :param executor: The executor to convert chapters in
+        :param conversion_workers: The number of chapters of the job converted concurrently, defaults to
+        the MANGADEX_PDF_WORKERS environment variable or the number of cores
+        :return: Whether every chapter was downloaded
+        """
+
+        manga: dict = await retrieve_manga(self.session, job["manga_id"])
+        chapter_data: dict = await retrieve_chapters(
+            self.session, job["manga_id"], job["languages"]
+        )
+
+        if manga is None or chapter_data is None:
+            return False
+
+        manga_title: str = process_manga_data({"data": [manga["data"]]})[0]["title"]
+        selected_chapters: list[dict] = select_chapters(
+            process_chapter_data(chapter_data), parse_chapter_ranges(job["chapters"])
+        )
+
+        if not selected_chapters:
+            return True
+
+        output_files: list[str] = get_output_files(
+            manga_title,
+            selected_chapters,
+            job["output"],
+            job["format"],
+            job["group"],
+        )
+
+        def report_chapter(chapter: dict, success: bool) -> None:
+            job["downloaded" if success else "failed"] += 1
+            self._emit(
+                "chapter",
+                {
+                    "job": job["id"],
+                    "manga_id": job["manga_id"],
+                    "id": chapter["id"],
+                    "chapter_number": chapter["chapter_number"],
+                    "success": success,
+                    "file": output_files[selected_chapters.index(chapter)],
+                },
+            )
+
+        os.makedirs(job["output"], exist_ok=True)
+        job_id: int = None
+        if self.journal is not None:
+            job_id = self.journal.create_job(
+                manga_title,
+                selected_chapters,
+                job["output"],
+                job["format"],
+                job["group"],
+                job["quality"],
+                self._profiles.get(job["id"]),
+                "daemon",
+                job["manga_id"],
+            )
+
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.session,
+            manga_title,
+            selected_chapters,
+            self.chapter_workers,
+            job["output"],
+            executor=executor,
+            conversion_workers=conversion_workers,
+            scheduler=self.scheduler,
+            on_chapter_complete=report_chapter,
+            journal=self.journal,
+            job_id=job_id,
+            image_session=self.image_session,
+            quality=job["quality"],
+            profile=self._profiles.get(job["id"]),
+            output_format=job["format"],
+            group=job["group"],
+        )
+        results: list[bool] = await pipeline.run()
+
+        if self.journal is not None and all(results):
+            self.journal.finish_job(job_id)
+
+        return all(results)
+
+    def _set_status(self, job: dict, status: str) -> None:
+        """
+        Records the new status of a job and notifies the on_event callback
+
+        :param job: The job
+        :param status: One of queued, running, done or failed
+        """
+
+        job["status"] = status
+        self._emit("job", job)
+
+    def _emit(self, event: str, fields: dict) -> None:
+        """
+        Notifies the on_event callback, if any
+
+        :param event: The name of the event
+        :param fields: The fields of the event
+        """
+
+        if self.on_event is not None:
+            self.on_event(event, dict(fields))
+
+    @staticmethod
+    def _read_lines(
+        path: str, position: int
+    ) -> tuple[list[tuple[int, int, bytes]], int]:
+        """
+        Reads the complete lines appended to a file since the last read
+
+        :param path: The path of the file
+        :param position: The offset the last read stopped at
+        :return: A tuple of the offsets each non-empty line read starts and ends at along with the line, and the
+        offset to continue from
+        """
+
+        try:
+            with open(path, "rb") as file:
+                # Start over if the file was truncated or replaced by a shorter one
+                if file.seek(0, os.SEEK_END) < position:
+                    position = 0
+
+                file.seek(position)
+                data: bytes = file.read()
+        except FileNotFoundError:
+            return [], position
+
+        # Leave a line that is still being written for the next read
+        lines: list[tuple[int, int, bytes]] = []
+        start: int = 0
+
+        while (end := data.find(b"\n", start) + 1) > 0:
+            if data[start:end].strip():
+                lines.append(
+                    (position + start, position + end, data[start:end].strip())
+                )
+            start = end
+
+        return lines, position + start
+
+    @staticmethod
+    def _read_state(path: str) -> dict:
+        """
+        Reads the state of a queue file
+
+        :param path: The path of the state file
+        :return: A dictionary containing the offset every line before is finished and the offsets of the lines
+        after it that finished, or the state of a queue file that was never read if there is none
+        """
+
+        try:
+            with open(path) as file:
+                state: dict = json.load(file)
+
+            return {"position": int(state["position"]), "finished": state["finished"]}
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return {"position": 0, "finished": []}
+
+    @staticmethod
+    def _write_state(path: str, state: dict) -> None:
+        """
+        Replaces the state of a queue file, so a daemon that dies while writing it leaves the old state behind
+
+        :param path: The path of the state file
+        :param state: The state, see _read_state
+        """
+
+        with open(path + ".part", "w") as file:
+            json.dump(state, file)
+        os.replace(path + ".part", path)
@@ -0,0 +1,816 @@
+import asyncio
+import aiohttp
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
+from . import api_access_service, metrics_service
+from .api_access_service import FetchScheduler, retrieve_chapter_image_data
+from .chapter_progress import ChapterProgress
+from .device_profile import DeviceProfile
+from .file_access_service import (
+    OutputBackend,
+    generate_output,
+    get_output_backend,
+    transform_pages,
+)
+from .job_journal import JobJournal
+from .output_writer import OutputWriter
+
+pdf_executor_kind: str = os.getenv("MANGADEX_PDF_EXECUTOR") or "process"
+pdf_workers: int = int(os.getenv("MANGADEX_PDF_WORKERS") or 0) or os.cpu_count() or 1
+# The ways chapters can be grouped into output files
+output_groups: list[str] = ["chapter", "volume", "series"]
+default_output_group: str = os.getenv("MANGADEX_OUTPUT_GROUP") or "chapter"
+
+
+def create_executor(kind: str = None, max_workers: int = None) -> Executor:
+    """
+    Creates the executor chapters are converted in. A process pool spreads decoding and encoding over every
+    core, while a thread pool avoids copying the pages to other processes and still runs in parallel wherever
+    Pillow releases the GIL.
+
+    :param kind: Either "process" or "thread", defaults to the MANGADEX_PDF_EXECUTOR environment variable
+    :param max_workers: The number of workers, defaults to the MANGADEX_PDF_WORKERS environment variable or the
+    number of cores
+    :return: The created executor
+    """
+
+    kind = kind or pdf_executor_kind
+    max_workers = max_workers or pdf_workers
+
+    if kind == "process":
+        # Spawn the workers instead of forking a process that is running an event loop and resolver threads
+        return ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    elif kind == "thread":
+        return ThreadPoolExecutor(max_workers)
+    else:
+        raise ValueError(f"Unknown executor kind: {kind}")
+
+
+def get_output_name(manga_title: str, chapter: dict) -> str:
+    """
+    Builds the name of the output file for a chapter of a manga
+
+    :param manga_title: The title of the manga
+    :param chapter: The processed chapter data dictionary
+    :return: The name of the output file without an extension
+    """
+
+    return f'{manga_title} [{chapter["chapter_number"]}]'
+
+
+def get_chapter_title(chapter: dict) -> str:
+    """
+    :param chapter: The processed chapter data dictionary
+    :return: The title the chapter is bookmarked under in output files holding several chapters
+    """
+
+    title: str = f'Chapter {chapter["chapter_number"]}'
+
+    return f'{title} - {chapter["title"]}' if chapter.get("title") else title
+
+
+def get_group_output_names(
+    manga_title: str, chapters: list[dict], group: str
+) -> list[str]:
+    """
+    Names the output file each chapter is saved to when chapters are grouped into output files. Every chapter
+    has its own file when grouped by chapter, the chapters of a volume share a file named after the volume when
+    grouped by volume and every chapter shares a file named after the range of chapter numbers when grouped by
+    series.
+
+    :param manga_title: The title of the manga
+    :param chapters: The processed chapter data of the chapters, in chapter order
+    :param group: One of output_groups
+    :return: The name of the output file without an extension of each chapter
+    """
+
+    if group == "chapter":
+        return [get_output_name(manga_title, chapter) for chapter in chapters]
+
+    if group == "volume":
+        return [
+            (
+                f'{manga_title} [Vol. {chapter["volume"]}]'
+                if chapter.get("volume")
+                else f"{manga_title} [No Volume]"
+            )
+            for chapter in chapters
+        ]
+
+    if group == "series":
+        if not chapters:
+            return []
+
+        first: str = chapters[0]["chapter_number"]
+        last: str = chapters[-1]["chapter_number"]
+        name: str = (
+            f"{manga_title} [{first}-{last}]"
+            if first != last
+            else get_output_name(manga_title, chapters[0])
+        )
+
+        return [name] * len(chapters)
+
+    raise ValueError(
+        f"Unknown output group: {group}, expected one of {', '.join(output_groups)}"
+    )
+
+
+def get_output_files(
+    manga_title: str,
+    chapters: list[dict],
+    output_path: str = None,
+    output_format: str = None,
+    group: str = None,
+) -> list[str]:
+    """
+    :param manga_title: The title of the manga
+    :param chapters: The processed chapter data of the chapters, in chapter order
+    :param output_path: The directory the output files are saved to, defaults to the current working directory
+    :param output_format: The name of one of file_access_service.output_backends, defaults to
+    file_access_service.default_output_format
+    :param group: One of output_groups, defaults to default_output_group
+    :return: The path of the output file each chapter is saved to
+    """
+
+    extension: str = get_output_backend(output_format).extension
+
+    return [
+        os.path.join(output_path or os.getcwd(), name + extension)
+        for name in get_group_output_names(
+            manga_title, chapters, group or default_output_group
+        )
+    ]
+
+
+class DownloadPipeline:
+    """
+    Downloads chapters and saves them in an output format, PDF files by default, in two overlapping stages.
+    Download workers pull chapters from a pending queue and hand each one to the conversion stage as soon as all
+    of its pages have arrived, so only a handful of chapters are held in memory at any time regardless of how
+    many were selected: at most max_workers downloading, as many waiting to be converted and conversion_workers
+    converting, however many cores the executor has. While the page store is enabled, pages are streamed into it
+    and handed over as paths, so memory use doesn't depend on the size of the pages either. Formats that only
+    copy page data are written in a thread instead of the executor, so the pages aren't sent to another process
+    just to be copied. Given a DeviceProfile, pages are transformed for the device in the executor as they are
+    converted. Given a JobJournal, the state of every chapter is recorded as it changes and chapters the
+    journal already finished are skipped.
+
+    When chapters are grouped by volume or series, each group is written to one output file with an
+    OutputWriter as its chapters finish, in chapter order and bookmarked by chapter. Chapters that finish before
+    the chapters ahead of them in their group wait to be written, and only a window of chapters is downloaded or
+    waiting at a time, so memory stays bounded however many chapters a file holds. A chapter counts as finished
+    once it is written to its file. If the file can't be finished, its result is revoked: the chapter is failed
+    in the results, the journal and its progress, but isn't reported to on_chapter_complete a second time.
+    Given a JobJournal, the chapters of every file are recorded once it is closed. A file that already exists
+    is written again with the chapters the journal recorded for it, which are downloaded along with the given
+    chapters, usually from the page store, so a later download into the same file doesn't lose them. These
+    chapters are in chapters and progress, but not in the results or reported to on_chapter_complete, and if
+    one of them fails the file is left as it was.
+
+    The ChapterProgress of every chapter is kept up to date in progress while the pipeline runs, and chapters
+    can be cancelled or moved to the front of the pending queue until they start converting.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        manga_title: str,
+        chapters: list[dict],
+        max_workers: int = 4,
+        output_path: str = None,
+        executor: Executor = None,
+        conversion_workers: int = None,
+        scheduler: FetchScheduler = None,
+        on_chapter_complete: Callable[[dict, bool], None] = None,
+        journal: JobJournal = None,
+        job_id: int = None,
+        image_session: aiohttp.ClientSession = None,
+        quality: str = None,
+        profile: DeviceProfile = None,
+        output_format: str = None,
+        group: str = None,
+    ) -> None:
+        """
+        :param session: The aiohttp.ClientSession to use
+        :param manga_title: The title of the manga the chapters belong to
+        :param chapters: The processed chapter data of the chapters to download, in chapter order while grouped
+        :param max_workers: The number of chapters downloaded concurrently
+        :param output_path: The directory to save the output files to, defaults to the current working directory
+        :param executor: The executor to convert chapters in, one is created with create_executor if none is given
+        :param conversion_workers: The number of chapters converted concurrently, should match the number of
+        workers of the executor and defaults to the MANGADEX_PDF_WORKERS environment variable or the number of cores
+        :param scheduler: The FetchScheduler shared by the image requests of every chapter, one is created if none is given
+        :param on_chapter_complete: Called with the chapter and whether it succeeded once it is finished
+        :param journal: The JobJournal to record the progress of the job in, if any
+        :param job_id: The id of the job in the journal
+        :param image_session: The aiohttp.ClientSession to download pages with, defaults to session
+        :param quality: The image quality to download pages in, either "data", "data-saver" or "auto", defaults
+        to api_access_service.image_quality
+        :param profile: The DeviceProfile to transform pages with while they are converted, if any
+        :param output_format: The name of the format to save chapters in, one of file_access_service.output_backends,
+        defaults to file_access_service.default_output_format
+        :param group: How chapters are grouped into output files, one of output_groups, defaults to the
+        MANGADEX_OUTPUT_GROUP environment variable or "chapter"
+        """
+
+        self.session: aiohttp.ClientSession = session
+        self.manga_title: str = manga_title
+        self.max_workers: int = max(1, max_workers)
+        self.output_path: str = output_path
+        self.executor: Executor = executor
+        self.conversion_workers: int = max(1, conversion_workers or pdf_workers)
+        self.scheduler: FetchScheduler = scheduler or FetchScheduler()
+        self.on_chapter_complete: Callable[[dict, bool], None] = on_chapter_complete
+        self.journal: JobJournal = journal
+        self.job_id: int = job_id
+        self.image_session: aiohttp.ClientSession = image_session
+        self.quality: str = quality
+        self.profile: DeviceProfile = profile
+        self.output_backend: OutputBackend = get_output_backend(output_format)
+        self.group: str = group or default_output_group
+
+        # The chapters of existing files are written again with the given ones, in chapter order
+        written: list[dict] = self._get_written_chapters(chapters, output_format)
+        self.chapters: list[dict] = (
+            sorted(
+                chapters + written, key=lambda chapter: float(chapter["chapter_number"])
+            )
+            if written
+            else chapters
+        )
+        positions: dict[str, int] = {
+            chapter["id"]: index for index, chapter in enumerate(self.chapters)
+        }
+        # The index of every given chapter, in the order the chapters were given
+        self._given: list[int] = [positions[chapter["id"]] for chapter in chapters]
+        self._rewritten: set[int] = {positions[chapter["id"]] for chapter in written}
+
+        self.progress: list[ChapterProgress] = [
+            ChapterProgress(chapter) for chapter in self.chapters
+        ]
+
+        self._output_names: list[str] = get_group_output_names(
+            manga_title, self.chapters, self.group
+        )
+        self._output_files: list[str] = get_output_files(
+            manga_title, self.chapters, output_path, output_format, self.group
+        )
+        self._pending: deque[int] = deque()
+        self._ready: asyncio.Queue = None
+        self._results: list[bool] = []
+        self._downloads: dict[int, asyncio.Task] = {}
+        self._cancelled: set[int] = set()
+        # The chapters of every output file and, while grouped, the state of the files being written
+        self._groups: dict[str, list[int]] = {}
+        self._unwritten: dict[str, deque[int]] = {}
+        self._finished: dict[int, list[bytes]] = {}
+        self._writers: dict[str, OutputWriter] = {}
+        self._writing: set[str] = set()
+        self._broken: set[str] = set()
+        self._held: int = 0
+        self._written: asyncio.Condition = None
+
+    async def run(self) -> list[bool]:
+        """
+        Downloads and converts every chapter, returning once all of them are finished
+
+        :return: A list containing whether each given chapter succeeded, in the order they were given
+        """
+
+        self._pending = deque(range(len(self.chapters)))
+        # Sized by the downloads rather than the cores, so a large executor doesn't let finished downloads pile up
+        self._ready = asyncio.Queue(
+            maxsize=min(self.conversion_workers, self.max_workers)
+        )
+        self._results = [False] * len(self.chapters)
+        self._downloads = {}
+        self._cancelled = set()
+        self._groups = {}
+        for index, name in enumerate(self._output_names):
+            self._groups.setdefault(name, []).append(index)
+
+        if self.journal is not None:
+            states: dict[str, str] = self.journal.get_chapter_states(self.job_id)
+
+            # A file is only skipped once every chapter it holds is finished, chapters it already held before
+            # the job are in it
+            for indices in self._groups.values():
+                if all(
+                    states.get(self.chapters[index]["id"]) == "done"
+                    for index in indices
+                    if index not in self._rewritten
+                ) and os.path.exists(self.get_output_file(indices[0])):
+                    for index in indices:
+                        self._pending.remove(index)
+                        self._complete(index, True)
+
+        if not self._pending:
+            return [self._results[index] for index in self._given]
+
+        self._unwritten = {
+            name: deque(index for index in indices if index in self._pending)
+            for name, indices in self._groups.items()
+        }
+        self._finished = {}
+        self._writers = {}
+        self._writing = set()
+        self._broken = set()
+        self._held = 0
+        self._written = asyncio.Condition()
+
+        conversion_workers: int = min(self.conversion_workers, len(self._pending))
+        executor: Executor = self.executor or create_executor(
+            max_workers=conversion_workers
+        )
+        downloaders: list[asyncio.Task] = [
+            asyncio.create_task(self._download_worker())
+            for _ in range(min(self.max_workers, len(self._pending)))
+        ]
+        converters: list[asyncio.Task] = [
+            asyncio.create_task(self._convert_worker(executor))
+            for _ in range(conversion_workers)
+        ]
+
+        try:
+            await asyncio.gather(*downloaders)
+            await self._ready.join()
+        finally:
+            for task in downloaders + converters:
+                task.cancel()
+            await asyncio.gather(*downloaders, *converters, return_exceptions=True)
+
+            # Files that were never finished are left out instead of holding some of their chapters
+            for writer in self._writers.values():
+                writer.abort()
+            self._writers.clear()
+
+            if self.executor is None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, executor.shutdown
+                )
+
+        return [self._results[index] for index in self._given]
+
+    async def cancel(self, index: int) -> bool:
+        """
+        Cancels a chapter that is waiting to be downloaded or downloading while the pipeline runs, stopping the
+        requests of its pages. The chapter finishes as failed, so the journal keeps the job resumable.
+
+        :param index: The index of the chapter
+        :return: Whether the chapter was cancelled, False if it already finished or is being converted
+        """
+
+        if index in self._cancelled:
+            return False
+
+        if index in self._pending:
+            self._cancelled.add(index)
+            self._pending.remove(index)
+
+            if self.group == "chapter":
+                self._complete(index, False)
+                return True
+
+            # The file of the chapter still has to move past it, which the next free worker does right away
+            self._pending.appendleft(index)
+
+            async with self._written:
+                self._written.notify_all()
+
+            return True
+
+        download: asyncio.Task = self._downloads.get(index)
+
+        if download is None:
+            return False
+
+        self._cancelled.add(index)
+        download.cancel()
+
+        return True
+
+    def prioritize(self, index: int) -> bool:
+        """
+        Moves a chapter that is waiting to be downloaded to the front of the pending queue, so it is downloaded
+        next. While chapters are grouped and the window is full, it still waits for the chapters its file needs
+        first.
+
+        :param index: The index of the chapter
+        :return: Whether the chapter was moved, False if it isn't waiting to be downloaded
+        """
+
+        if index not in self._pending or index in self._cancelled:
+            return False
+
+        self._pending.remove(index)
+        self._pending.appendleft(index)
+
+        return True
+
+    def _get_written_chapters(
+        self, chapters: list[dict], output_format: str
+    ) -> list[dict]:
+        """
+        Looks up the chapters the journal recorded for the existing output files of the given chapters, while
+        chapters are grouped
+
+        :param chapters: The processed chapter data of the given chapters
+        :param output_format: The name of the format the chapters are saved in
+        :return: The processed chapter data of the chapters the files hold that aren't given
+        """
+
+        if self.journal is None or self.group == "chapter":
+            return []
+
+        chapter_ids: set[str] = {chapter["id"] for chapter in chapters}
+        written: list[dict] = []
+
+        for path in dict.fromkeys(
+            get_output_files(
+                self.manga_title, chapters, self.output_path, output_format, self.group
+            )
+        ):
+            if not os.path.exists(path):
+                continue
+
+            for chapter in self.journal.get_output_file_chapters(path) or []:
+                if chapter["id"] not in chapter_ids:
+                    chapter_ids.add(chapter["id"])
+                    written.append(chapter)
+
+        return written
+
+    def get_output_file(self, index: int) -> str:
+        """
+        :param index: The index of a chapter
+        :return: The path of the output file the chapter is saved to
+        """
+
+        return self._output_files[index]
+
+    async def _download_worker(self) -> None:
+        """
+        Downloads pending chapters one at a time and queues them for conversion, waiting while the conversion
+        stage is full so that finished downloads don't pile up in memory
+        """
+
+        while True:
+            index: int = await self._next_chapter()
+            if index is None:
+                return
+
+            image_data_list: list[bytes] = None
+
+            # Chapters cancelled while pending are passed on without being downloaded
+            if index not in self._cancelled:
+                image_data_list = await self._download_chapter(index)
+
+            success: bool = bool(image_data_list) and None not in image_data_list
+
+            if not success:
+                if self.group == "chapter":
+                    self._complete(index, False)
+                    continue
+
+                # The group still has to move past the chapter
+                image_data_list = None
+            else:
+                self.progress[index].state = "converting"
+
+            await self._ready.put((index, image_data_list))
+            self._report()
+
+    async def _download_chapter(self, index: int) -> list[bytes]:
+        """
+        Downloads the pages of a chapter in a task of its own, so the chapter can be cancelled without stopping
+        the worker downloading it
+
+        :param index: The index of the chapter
+        :return: The binary data or path of each page of the chapter, or None if it failed or was cancelled
+        """
+
+        chapter_id: str = self.chapters[index]["id"]
+        self._set_state(index, "downloading")
+        self.progress[index].start()
+        self._report()
+        start: float = time.perf_counter()
+
+        download: asyncio.Task = asyncio.create_task(
+            retrieve_chapter_image_data(
+                self.session,
+                chapter_id,
+                self.scheduler,
+                image_session=self.image_session,
+                stream=api_access_service.page_store is not None,
+                quality=self.quality,
+                progress=self.progress[index],
+            )
+        )
+        self._downloads[index] = download
+
+        try:
+            image_data_list: list[bytes] = await download
+        except asyncio.CancelledError:
+            # Cancelling the worker cancels the download too, which has to stop the worker as well
+            if index not in self._cancelled or not download.cancelled():
+                raise
+
+            return None
+        except Exception:
+            image_data_list = None
+        finally:
+            self._downloads.pop(index, None)
+
+        metrics_service.record_stage(
+            "download_chapter",
+            time.perf_counter() - start,
+            error=not image_data_list or None in image_data_list,
+        )
+
+        return image_data_list
+
+    async def _next_chapter(self) -> int:
+        """
+        Takes the next pending chapter. While chapters are grouped, only a window of chapters is downloaded or
+        waiting to be written at a time, except for the chapters their files are waiting for, so a slow chapter
+        can't make the chapters after it pile up in memory.
+
+        :return: The index of the chapter, or None once no chapter is pending
+        """
+
+        if self.group == "chapter":
+            return self._pending.popleft() if self._pending else None
+
+        async with self._written:
+            while self._pending:
+                if self._held < self.max_workers + self.conversion_workers:
+                    index: int = self._pending[0]
+                else:
+                    # Cancelled chapters hold no pages, so they never wait for the window
+                    index = next(
+                        (
+                            index
+                            for index in self._pending
+                            if index in self._cancelled
+                            or self._unwritten[self._output_names[index]][0] == index
+                        ),
+                        None,
+                    )
+
+                if index is not None:
+                    self._pending.remove(index)
+                    self._held += 1
+                    return index
+
+                await self._written.wait()
+
+        return None
+
+    async def _convert_worker(self, executor: Executor) -> None:
+        """
+        Saves downloaded chapters as soon as they are queued, in the executor if the pages have to be decoded or
+        encoded and in the loop's default thread pool otherwise
+
+        :param executor: The executor to run the conversion in
+        """
+
+        if not self.output_backend.encodes and self.profile is None:
+            executor = None
+
+        while True:
+            index, image_data_list = await self._ready.get()
+            self._report()
+
+            try:
+                if self.group == "chapter":
+                    await self._convert_chapter(executor, index, image_data_list)
+                else:
+                    await self._write_chapter(executor, index, image_data_list)
+            finally:
+                # Drop the reference before waiting on the queue so the pages can be freed
+                del image_data_list
+                self._ready.task_done()
+
+    async def _convert_chapter(
+        self, executor: Executor, index: int, image_data_list: list[bytes]
+    ) -> None:
+        """
+        Saves a chapter to its own output file
+
+        :param executor: The executor to run the conversion in, or None for the loop's default thread pool
+        :param index: The index of the chapter
+        :param image_data_list: The binary data or path of each page of the chapter
+        """
+
+        start: float = time.perf_counter()
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                executor,
+                generate_output,
+                image_data_list,
+                self._output_names[index],
+                self.output_path,
+                self.output_backend.name,
+                self.profile,
+            )
+            metrics_service.record_stage("convert_chapter", time.perf_counter() - start)
+            self._complete(index, True)
+        except Exception:
+            metrics_service.record_stage(
+                "convert_chapter", time.perf_counter() - start, error=True
+            )
+            self._complete(index, False)
+
+    async def _write_chapter(
+        self, executor: Executor, index: int, image_data_list: list[bytes]
+    ) -> None:
+        """
+        Hands a chapter to the file of its group and writes every chapter the file can take next in chapter
+        order, closing the file once it holds all of its chapters. A chapter that can't be written yet waits for
+        the chapters ahead of it, which are written by whichever worker finishes them.
+
+        :param executor: The executor to transform the pages in, or None for the loop's default thread pool
+        :param index: The index of the chapter
+        :param image_data_list: The binary data or path of each page of the chapter, or None if it failed
+        """
+
+        name: str = self._output_names[index]
+
+        if image_data_list is not None and self.profile is not None:
+            start: float = time.perf_counter()
+
+            try:
+                image_data_list = await asyncio.get_running_loop().run_in_executor(
+                    executor, transform_pages, image_data_list, self.profile
+                )
+            except Exception:
+                metrics_service.record_stage(
+                    "convert_chapter", time.perf_counter() - start, error=True
+                )
+                image_data_list = None
+
+        self._finished[index] = image_data_list
+        del image_data_list
+
+        # The worker already writing the file picks the chapter up once the chapters ahead of it are written
+        if name in self._writing:
+            return
+
+        self._writing.add(name)
+        unwritten: deque[int] = self._unwritten[name]
+
+        try:
+            while unwritten and unwritten[0] in self._finished:
+                next_index: int = unwritten.popleft()
+                pages: list[bytes] = self._finished.pop(next_index)
+
+                # The file can't be written again without a chapter it already held, so it is left as it was
+                if (
+                    pages is None
+                    and next_index in self._rewritten
+                    and name not in self._broken
+                ):
+                    await self._discard_file(name, self._writers.pop(name, None))
+
+                success: bool = pages is not None and name not in self._broken
+
+                if success:
+                    start = time.perf_counter()
+
+                    try:
+                        await asyncio.to_thread(
+                            self._add_chapter, name, next_index, pages
+                        )
+                        metrics_service.record_stage(
+                            "convert_chapter", time.perf_counter() - start
+                        )
+                    except Exception:
+                        metrics_service.record_stage(
+                            "convert_chapter", time.perf_counter() - start, error=True
+                        )
+                        success = False
+                        await self._discard_file(name, self._writers.pop(name, None))
+
+                del pages
+                self._complete(next_index, success)
+
+                async with self._written:
+                    self._held -= 1
+                    self._written.notify_all()
+
+            if not unwritten and name in self._writers:
+                writer: OutputWriter = self._writers.pop(name)
+
+                try:
+                    await asyncio.to_thread(writer.close)
+                except Exception:
+                    await self._discard_file(name, writer)
+                else:
+                    if self.journal is not None:
+                        self.journal.record_output_file(
+                            self.get_output_file(self._groups[name][0]),
+                            [
+                                self.chapters[index]
+                                for index in self._groups[name]
+                                if self._results[index]
+                            ],
+                        )
+        finally:
+            self._writing.discard(name)
+
+    async def _discard_file(self, name: str, writer: OutputWriter) -> None:
+        """
+        Removes a file that failed to be written and revokes the results of the chapters already written to it,
+        since the file can't hold them anymore. The chapters of the file that are still to come fail as well.
+
+        :param name: The name of the output file
+        :param writer: The OutputWriter of the file, if it was opened
+        """
+
+        self._broken.add(name)
+
+        if writer is not None:
+            try:
+                await asyncio.to_thread(writer.abort)
+            except Exception:
+                pass
+
+        for index in self._groups[name]:
+            if self._results[index]:
+                self._revoke(index)
+
+    def _add_chapter(self, name: str, index: int, image_data_list: list[bytes]) -> None:
+        """
+        Adds a chapter to the file of its group, opening the file with the first chapter
+
+        :param name: The name of the output file
+        :param index: The index of the chapter
+        :param image_data_list: The binary data or path of each page of the chapter
+        """
+
+        writer: OutputWriter = self._writers.get(name)
+
+        if writer is None:
+            writer = self.output_backend.writer(self.get_output_file(index), name)
+            writer.open()
+            self._writers[name] = writer
+
+        writer.add_chapter(image_data_list, get_chapter_title(self.chapters[index]))
+
+    def _report(self) -> None:
+        """
+        Records the number of chapters waiting to be downloaded and waiting to be converted in metrics
+        """
+
+        metrics_service.set_gauge("pipeline_pending_chapters", len(self._pending))
+        metrics_service.set_gauge("pipeline_ready_chapters", self._ready.qsize())
+
+    def _complete(self, index: int, success: bool) -> None:
+        """
+        Records the result of a chapter and notifies the on_chapter_complete callback
+
+        :param index: The index of the chapter
+        :param success: Whether the chapter was downloaded and converted successfully
+        """
+
+        self._results[index] = success
+        self._set_state(index, "done" if success else "failed")
+        self.progress[index].finish(
+            "done" if success else "cancelled" if index in self._cancelled else "failed"
+        )
+
+        if self.on_chapter_complete is not None and index not in self._rewritten:
+            self.on_chapter_complete(self.chapters[index], success)
+
+    def _revoke(self, index: int) -> None:
+        """
+        Fails a chapter that was already completed successfully, without notifying the on_chapter_complete
+        callback again, so every chapter is reported exactly once
+
+        :param index: The index of the chapter
+        """
+
+        self._results[index] = False
+        self._set_state(index, "failed")
+        self.progress[index].finish("failed")
+
+    def _set_state(self, index: int, state: str) -> None:
+        """
+        Records the new state of a chapter in the journal, if any
+
+        :param index: The index of the chapter
+        :param state: One of JobJournal.chapter_states
+        """
+
+        if self.journal is not None:
+            self.journal.set_chapter_state(
+                self.job_id, self.chapters[index]["id"], state
+            )
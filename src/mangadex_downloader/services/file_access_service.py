@@ -1,6 +1,37 @@
 import os
-import tempfile
 from PIL import Image
+from .device_profile import DeviceProfile
+from .output_writer import (
+    CBZOutputWriter,
+    EPUBOutputWriter,
+    FolderOutputWriter,
+    OutputWriter,
+    PDFOutputWriter,
+)
+
+# The output format chapters are saved in when none is given
+default_output_format: str = os.getenv("MANGADEX_OUTPUT_FORMAT") or "pdf"
+
+
+def get_cache_directory(name: str) -> str:
+    """
+    Gets the directory a cache is stored in, creating it if it doesn't exist. Caches are stored in the
+    directory given by the MANGADEX_CACHE_DIR environment variable, or in the user's cache directory.
+
+    :param name: The name of the cache
+    :return: The path to the directory
+    """
+
+    root: str = os.getenv("MANGADEX_CACHE_DIR") or os.path.join(
+        os.getenv("LOCALAPPDATA")
+        or os.getenv("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache"),
+        "mangadex-downloader",
+    )
+    directory: str = os.path.join(root, name)
+    os.makedirs(directory, exist_ok=True)
+
+    return directory
 
 
 def save_image(image_data: bytes, file_path: str) -> None:
@@ -85,19 +116,171 @@ def convert_images_to_pdf(
     )
 
 
-def generate_PDF(image_data_list: list[bytes], output_name: str) -> None:
+def transform_pages(
+    image_data_list: list[bytes], profile: DeviceProfile
+) -> list[bytes]:
     """
-    Generates a PDF file from the image data list by creating a temporary directory and saving each image to a file
-    in the temporary directory, then converting the temporary directory to a PDF file
+    Transforms the pages of a chapter for a device ahead of writing them, reading pages given as paths
 
-    :param image_data_list: The image data list to convert to a PDF file
+    :param image_data_list: The binary data or path of each page
+    :param profile: The DeviceProfile to transform the pages with
+    :return: The binary data of each transformed page, None where a page is missing
+    """
+
+    transformed: list[bytes] = []
+
+    for image_data in image_data_list:
+        if image_data and isinstance(image_data, str):
+            with open(image_data, "rb") as file:
+                image_data = file.read()
+
+        transformed.append(profile.transform(image_data) if image_data else None)
+
+    return transformed
+
+
+class OutputBackend:
+    """
+    A format chapters can be saved in, written by an OutputWriter that is given the path of the output and
+    optionally its title and a DeviceProfile. Backends that don't decode or encode pages only copy bytes, so
+    they don't need to run in a process pool.
+    """
+
+    def __init__(
+        self, name: str, extension: str, writer: type[OutputWriter], encodes: bool
+    ) -> None:
+        """
+        :param name: The name of the format
+        :param extension: The extension of the output files, empty for directories
+        :param writer: The OutputWriter subclass writing the output files
+        :param encodes: Whether the backend decodes or encodes pages even without a device profile
+        """
+
+        self.name: str = name
+        self.extension: str = extension
+        self.writer: type[OutputWriter] = writer
+        self.encodes: bool = encodes
+
+
+# The formats chapters can be saved in, keyed by name
+output_backends: dict[str, OutputBackend] = {
+    "pdf": OutputBackend("pdf", ".pdf", PDFOutputWriter, True),
+    "cbz": OutputBackend("cbz", ".cbz", CBZOutputWriter, False),
+    "epub": OutputBackend("epub", ".epub", EPUBOutputWriter, False),
+    "folder": OutputBackend("folder", "", FolderOutputWriter, False),
+}
+
+
+def get_output_backend(output_format: str = None) -> OutputBackend:
+    """
+    :param output_format: The name of one of output_backends, defaults to default_output_format
+    :return: The backend of the format
+    """
+
+    output_format = output_format or default_output_format
+
+    if output_format not in output_backends:
+        raise ValueError(
+            f"Unknown output format: {output_format}, expected one of {', '.join(output_backends)}"
+        )
+
+    return output_backends[output_format]
+
+
+def convert_image_data(
+    image_data_list: list[bytes],
+    output_path: str,
+    output_name: str,
+    output_format: str = None,
+    profile: DeviceProfile = None,
+) -> None:
+    """
+    Writes a list of image data to a file in an output format one page at a time in page order, so only the page
+    being written is decoded at any time. Pages given as paths are read from disk as they are written, or copied
+    in chunks by formats that store the original pages. Given a device profile, each page is transformed for
+    the device on the way, in the same pass.
+
+    This usually runs in a worker process, where metrics_service records nothing, so the time it takes is
+    reported by the download pipeline as its convert_chapter stage instead.
+
+    :param image_data_list: The image data list to write, containing the binary data or path of each page
+    :param output_path: The path to the output directory
+    :param output_name: The name of the output file without an extension
+    :param output_format: The name of one of output_backends, defaults to default_output_format
+    :param profile: The DeviceProfile to transform the pages with, if any
+    :return: None
+    """
+
+    backend: OutputBackend = get_output_backend(output_format)
+
+    if not any(image_data_list):
+        raise ValueError(f"No images to write to {output_name}{backend.extension}")
+
+    with backend.writer(
+        os.path.join(output_path, output_name + backend.extension), output_name, profile
+    ) as writer:
+        writer.add_chapter(image_data_list)
+
+
+def convert_image_data_to_pdf(
+    image_data_list: list[bytes],
+    output_path: str,
+    output_name: str,
+    profile: DeviceProfile = None,
+) -> None:
+    """
+    Converts a list of image data to a PDF file, see convert_image_data
+
+    :param image_data_list: The image data list to convert to a PDF file, containing the binary data or path of
+    each page
+    :param output_path: The path to the output directory
     :param output_name: The name of the output PDF file
+    :param profile: The DeviceProfile to transform the pages with, if any
     :return: None
     """
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        save_image_list(image_data_list, temp_dir)
-        file_list: list[str] = get_file_list(temp_dir)
-        file_list.sort(key=lambda x: int(x.split(os.path.sep)[-1].split(".")[0]))
+    convert_image_data(image_data_list, output_path, output_name, "pdf", profile)
+
 
-        convert_images_to_pdf(file_list, os.getcwd(), output_name)
+def generate_output(
+    image_data_list: list[bytes],
+    output_name: str,
+    output_path: str = None,
+    output_format: str = None,
+    profile: DeviceProfile = None,
+) -> None:
+    """
+    Saves the image data list in an output format without writing the images to disk first
+
+    :param image_data_list: The image data list to save, containing the binary data or path of each page
+    :param output_name: The name of the output file without an extension
+    :param output_path: The directory to save the output file to, defaults to the current working directory
+    :param output_format: The name of one of output_backends, defaults to default_output_format
+    :param profile: The DeviceProfile to transform the pages with, if any
+    :return: None
+    """
+
+    convert_image_data(
+        image_data_list, output_path or os.getcwd(), output_name, output_format, profile
+    )
+
+
+def generate_PDF(
+    image_data_list: list[bytes],
+    output_name: str,
+    output_path: str = None,
+    profile: DeviceProfile = None,
+) -> None:
+    """
+    Generates a PDF file from the image data list without writing the images to disk first
+
+    :param image_data_list: The image data list to convert to a PDF file
+    :param output_name: The name of the output PDF file
+    :param output_path: The directory to save the PDF file to, defaults to the current working directory
+    :param profile: The DeviceProfile to transform the pages with, if any
+    :return: None
+    """
+
+    convert_image_data_to_pdf(
+        image_data_list, output_path or os.getcwd(), output_name, profile
+    )
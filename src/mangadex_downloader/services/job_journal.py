@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import time
+from .device_profile import DeviceProfile
+from .file_access_service import get_cache_directory
+
+
+class JobJournal:
+    """
+    Records the state of every chapter of a download job in a SQLite database as soon as it changes, so a job
+    that was interrupted can be resumed without converting the chapters that already finished. Pages that
+    arrived before the job was interrupted are read back from the PageStore, so the journal doesn't record them.
+    The output format, grouping, image quality and device profile of a job are recorded with it, so a resumed
+    job writes the same files it started writing. Every job also records the script that started it, so each
+    script only resumes its own jobs. The chapters of every output file holding several chapters are recorded
+    too, so a later job writing to the same file can write them again instead of replacing them.
+    """
+
+    # The columns of the jobs table added to journals created before they were recorded, by their definition
+    added_columns: dict[str, str] = {
+        "output_format": "TEXT",
+        "output_group": "TEXT",
+        "quality": "TEXT",
+        "profile": "TEXT",
+        "origin": "TEXT NOT NULL DEFAULT 'interactive'",
+        "manga_id": "TEXT",
+    }
+
+    # The scripts that start jobs, the interactive script, mangadex-downloader-cli and its daemon
+    origins: tuple[str, ...] = ("interactive", "cli", "daemon")
+
+    # The states a chapter moves through, a chapter is only finished once its output file is written
+    chapter_states: tuple[str, ...] = ("pending", "downloading", "done", "failed")
+
+    def __init__(self, directory: str = None) -> None:
+        """
+        :param directory: The directory to store the journal in, defaults to get_cache_directory("jobs")
+        """
+
+        self.directory: str = directory or get_cache_directory("jobs")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            os.path.join(self.directory, "jobs.sqlite3")
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                manga_title TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                output_format TEXT,
+                output_group TEXT,
+                quality TEXT,
+                profile TEXT,
+                origin TEXT NOT NULL DEFAULT 'interactive',
+                manga_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chapters (
+                job_id INTEGER NOT NULL,
+                chapter_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (job_id, chapter_id)
+            );
+            CREATE TABLE IF NOT EXISTS output_files (
+                path TEXT PRIMARY KEY,
+                chapters TEXT NOT NULL
+            );
+            DROP TABLE IF EXISTS pages;
+            """
+        )
+        columns: set[str] = {
+            row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")
+        }
+        for column, definition in self.added_columns.items():
+            if column not in columns:
+                self._connection.execute(
+                    f"ALTER TABLE jobs ADD COLUMN {column} {definition}"
+                )
+        self._connection.commit()
+
+    def create_job(
+        self,
+        manga_title: str,
+        chapters: list[dict],
+        output_path: str,
+        output_format: str = None,
+        group: str = None,
+        quality: str = None,
+        profile: DeviceProfile = None,
+        origin: str = "interactive",
+        manga_id: str = None,
+    ) -> int:
+        """
+        Records a new job with every chapter pending
+
+        :param manga_title: The title of the manga the chapters belong to
+        :param chapters: The processed chapter data of the chapters to download
+        :param output_path: The directory the output files are saved to
+        :param output_format: The format the chapters are saved in, None for the default format
+        :param group: How the chapters are grouped into output files, None for the default grouping
+        :param quality: The image quality the pages are downloaded in, None for the default quality
+        :param profile: The DeviceProfile the pages are transformed with, if any
+        :param origin: One of origins, the script that started the job
+        :param manga_id: The id of the manga the chapters belong to, if known
+        :return: The id of the job
+        """
+
+        if origin not in self.origins:
+            raise ValueError(f"Unknown job origin: {origin}")
+
+        job_id: int = self._connection.execute(
+            "INSERT INTO jobs (manga_title, output_path, created_at, output_format, output_group, quality, "
+            "profile, origin, manga_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                manga_title,
+                output_path,
+                time.time(),
+                output_format,
+                group,
+                quality,
+                profile.name if profile is not None else None,
+                origin,
+                manga_id,
+            ),
+        ).lastrowid
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO chapters VALUES (?, ?, ?, ?, 'pending')",
+            [
+                (job_id, chapter["id"], position, json.dumps(chapter))
+                for position, chapter in enumerate(chapters)
+            ],
+        )
+        self._connection.commit()
+
+        return job_id
+
+    def get_unfinished_job(self, origin: str = "interactive") -> dict:
+        """
+        Looks up the most recently created job of a script that hasn't finished
+
+        :param origin: One of origins, the script whose jobs are looked up
+        :return: A dictionary containing the id, manga_id, manga_title, output_path, chapters, output_format,
+        group, quality and profile of the job, or None if every job of the script has finished
+        """
+
+        row: tuple = self._connection.execute(
+            "SELECT id, manga_id, manga_title, output_path, output_format, output_group, quality, profile "
+            "FROM jobs WHERE finished_at IS NULL AND origin = ? ORDER BY id DESC LIMIT 1",
+            (origin,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        (
+            job_id,
+            manga_id,
+            manga_title,
+            output_path,
+            output_format,
+            group,
+            quality,
+            profile,
+        ) = row
+        chapters: list[dict] = [
+            json.loads(data)
+            for (data,) in self._connection.execute(
+                "SELECT data FROM chapters WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            )
+        ]
+
+        return {
+            "id": job_id,
+            "manga_id": manga_id,
+            "manga_title": manga_title,
+            "output_path": output_path,
+            "chapters": chapters,
+            "output_format": output_format,
+            "group": group,
+            "quality": quality,
+            "profile": DeviceProfile.parse(profile) if profile is not None else None,
+        }
+
+    def get_chapter_states(self, job_id: int) -> dict[str, str]:
+        """
+        :param job_id: The id of the job
+        :return: A dictionary mapping the id of every chapter of the job to its state
+        """
+
+        return dict(
+            self._connection.execute(
+                "SELECT chapter_id, state FROM chapters WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        )
+
+    def set_chapter_state(self, job_id: int, chapter_id: str, state: str) -> None:
+        """
+        Records the new state of a chapter
+
+        :param job_id: The id of the job
+        :param chapter_id: The id of the chapter
+        :param state: One of chapter_states
+        """
+
+        if state not in self.chapter_states:
+            raise ValueError(f"Unknown chapter state: {state}")
+
+        self._connection.execute(
+            "UPDATE chapters SET state = ? WHERE job_id = ? AND chapter_id = ?",
+            (state, job_id, chapter_id),
+        )
+        self._connection.commit()
+
+    def record_output_file(self, path: str, chapters: list[dict]) -> None:
+        """
+        Records the chapters an output file holds once it is written, replacing what it held before
+
+        :param path: The path of the output file
+        :param chapters: The processed chapter data of the chapters in the file, in the order they are in
+        """
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO output_files VALUES (?, ?)",
+            (os.path.abspath(path), json.dumps(chapters)),
+        )
+        self._connection.commit()
+
+    def get_output_file_chapters(self, path: str) -> list[dict]:
+        """
+        :param path: The path of an output file
+        :return: The processed chapter data of the chapters the file held when it was last written, or None if
+        it wasn't recorded
+        """
+
+        row: tuple = self._connection.execute(
+            "SELECT chapters FROM output_files WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def finish_job(self, job_id: int) -> None:
+        """
+        Marks a job as finished so it is no longer resumed
+
+        :param job_id: The id of the job
+        """
+
+        self._connection.execute(
+            "UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time(), job_id)
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database of the journal
+        """
+
+        self._connection.close()
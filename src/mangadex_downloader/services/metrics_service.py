@@ -0,0 +1,458 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from typing import Any, Callable
+
+# The upper bounds in seconds of the latency histogram buckets
+default_buckets: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# The prefix of every metric name in the Prometheus text format
+metric_prefix: str = "mangadex_"
+
+
+class Histogram:
+    """
+    Counts observed values into fixed buckets, which is enough to estimate percentiles and export the
+    distribution to Prometheus without keeping every value
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = None) -> None:
+        """
+        :param buckets: The sorted upper bounds of the buckets, defaults to default_buckets
+        """
+
+        self.buckets: tuple[float, ...] = buckets or default_buckets
+        # The last count is the bucket of values above every upper bound
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Records a value
+
+        :param value: The value to record
+        """
+
+        index: int = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating within the bucket it falls in
+
+        :param q: The quantile, between 0 and 1
+        :return: The estimated value, or None if nothing was observed
+        """
+
+        if self.count == 0:
+            return None
+
+        rank: float = q * self.count
+        seen: int = 0
+
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower: float = self.buckets[index - 1] if index > 0 else 0.0
+
+                # Values above the last bucket can only be bounded from below
+                if index == len(self.buckets):
+                    return lower
+
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+
+            seen += count
+
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Collects counters, gauges and latency histograms keyed by name and labels from every stage of a download,
+    and exports them as JSON or in the Prometheus text format. Conversions may run in threads, so every update
+    is made under a lock.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = None) -> None:
+        """
+        :param buckets: The upper bounds of the buckets of every histogram, defaults to default_buckets
+        """
+
+        self.buckets: tuple[float, ...] = buckets or default_buckets
+        self.started: float = time.monotonic()
+
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._gauges: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter
+
+        :param name: The name of the counter
+        :param value: The amount to add
+        :param labels: The labels of the counter
+        """
+
+        key: tuple[str, tuple] = self._get_key(name, labels)
+
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """
+        Sets a gauge to its current value
+
+        :param name: The name of the gauge
+        :param value: The current value
+        :param labels: The labels of the gauge
+        """
+
+        with self._lock:
+            self._gauges[self._get_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records a value in a histogram
+
+        :param name: The name of the histogram
+        :param value: The value to record
+        :param labels: The labels of the histogram
+        """
+
+        key: tuple[str, tuple] = self._get_key(name, labels)
+
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.buckets)
+
+            self._histograms[key].observe(value)
+
+    def record_stage(
+        self, stage: str, duration: float, size: int = 0, error: bool = False
+    ) -> None:
+        """
+        Records a single run of a stage of the download
+
+        :param stage: The name of the stage
+        :param duration: The number of seconds the run took
+        :param size: The number of bytes the run processed
+        :param error: Whether the run failed
+        """
+
+        self.observe("stage_duration_seconds", duration, stage=stage)
+
+        if size:
+            self.increment("stage_bytes_total", size, stage=stage)
+        if error:
+            self.increment("stage_errors_total", stage=stage)
+
+    def to_dict(self) -> dict:
+        """
+        :return: A dictionary of every metric, with the p50 and p99 of every histogram and the bytes per second
+        of every stage that processed bytes
+        """
+
+        with self._lock:
+            counters: dict = dict(self._counters)
+            gauges: dict = dict(self._gauges)
+            histograms: dict = {
+                key: (
+                    histogram.count,
+                    histogram.sum,
+                    histogram.quantile(0.5),
+                    histogram.quantile(0.99),
+                )
+                for key, histogram in self._histograms.items()
+            }
+
+        stages: dict[str, dict] = {}
+        for (name, labels), (count, total, p50, p99) in histograms.items():
+            if name == "stage_duration_seconds":
+                stage: str = dict(labels)["stage"]
+                size: float = counters.get(("stage_bytes_total", labels), 0)
+                stages[stage] = {
+                    "count": count,
+                    "errors": counters.get(("stage_errors_total", labels), 0),
+                    "seconds": total,
+                    "p50": p50,
+                    "p99": p99,
+                    "bytes": size,
+                    "bytes_per_second": size / total if total > 0 else None,
+                }
+
+        return {
+            "uptime": time.monotonic() - self.started,
+            "stages": stages,
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            "gauges": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(gauges.items())
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "sum": total,
+                    "p50": p50,
+                    "p99": p99,
+                }
+                for (name, labels), (count, total, p50, p99) in sorted(
+                    histograms.items()
+                )
+            ],
+        }
+
+    def to_json(self) -> str:
+        """
+        :return: Every metric as a JSON document, see to_dict
+        """
+
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Every metric in the Prometheus text exposition format
+        """
+
+        lines: list[str] = []
+
+        with self._lock:
+            counters: list = sorted(self._counters.items())
+            gauges: list = sorted(self._gauges.items())
+            histograms: list = sorted(
+                (key, list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self._histograms.items()
+            )
+
+        for metric_type, metrics in (("counter", counters), ("gauge", gauges)):
+            declared: set[str] = set()
+
+            for (name, labels), value in metrics:
+                if name not in declared:
+                    lines.append(f"# TYPE {metric_prefix}{name} {metric_type}")
+                    declared.add(name)
+
+                lines.append(
+                    f"{metric_prefix}{name}{self._format_labels(labels)} {value}"
+                )
+
+        declared: set[str] = set()
+        for (name, labels), counts, count, total in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {metric_prefix}{name} histogram")
+                declared.add(name)
+
+            cumulative: int = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{metric_prefix}{name}_bucket"
+                    f"{self._format_labels(labels + (('le', str(bound)),))} {cumulative}"
+                )
+
+            lines.append(
+                f"{metric_prefix}{name}_bucket"
+                f"{self._format_labels(labels + (('le', '+Inf'),))} {count}"
+            )
+            lines.append(
+                f"{metric_prefix}{name}_sum{self._format_labels(labels)} {total}"
+            )
+            lines.append(
+                f"{metric_prefix}{name}_count{self._format_labels(labels)} {count}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _get_key(name: str, labels: dict[str, str]) -> tuple[str, tuple]:
+        """
+        :param name: The name of a metric
+        :param labels: The labels of the metric
+        :return: The key the metric is stored under
+        """
+
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        """
+        :param labels: The sorted pairs of label names and values
+        :return: The labels formatted as {name="value",...}, or an empty string if there are none
+        """
+
+        if not labels:
+            return ""
+
+        formatted: list[str] = []
+        for key, value in labels:
+            escaped: str = (
+                value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            )
+            formatted.append(f'{key}="{escaped}"')
+
+        return "{" + ",".join(formatted) + "}"
+
+
+# The registry the instrumented functions record into, the entry points enable it
+metrics: MetricsRegistry = None
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """
+    Adds to a counter of metrics, if enabled
+
+    :param name: The name of the counter
+    :param value: The amount to add
+    :param labels: The labels of the counter
+    """
+
+    if metrics is not None:
+        metrics.increment(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    """
+    Sets a gauge of metrics, if enabled
+
+    :param name: The name of the gauge
+    :param value: The current value
+    :param labels: The labels of the gauge
+    """
+
+    if metrics is not None:
+        metrics.set_gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """
+    Records a value in a histogram of metrics, if enabled
+
+    :param name: The name of the histogram
+    :param value: The value to record
+    :param labels: The labels of the histogram
+    """
+
+    if metrics is not None:
+        metrics.observe(name, value, **labels)
+
+
+def record_stage(
+    stage: str, duration: float, size: int = 0, error: bool = False
+) -> None:
+    """
+    Records a single run of a stage of the download in metrics, if enabled
+
+    :param stage: The name of the stage
+    :param duration: The number of seconds the run took
+    :param size: The number of bytes the run processed
+    :param error: Whether the run failed
+    """
+
+    if metrics is not None:
+        metrics.record_stage(stage, duration, size, error)
+
+
+def save_metrics(registry: MetricsRegistry, file_path: str) -> None:
+    """
+    Writes every metric of a registry to a file, in the Prometheus text format if the file ends in .prom and
+    as JSON otherwise
+
+    :param registry: The registry to save
+    :param file_path: The path of the file
+    """
+
+    with open(file_path, "w") as file:
+        if file_path.endswith(".prom"):
+            file.write(registry.to_prometheus())
+        else:
+            file.write(registry.to_json())
+
+
+def instrument(stage: str, size: Callable[..., int] = None) -> Callable:
+    """
+    Creates a decorator that records the duration, failures and processed bytes of every call of a function or
+    coroutine function as a stage in metrics, doing nothing while metrics is disabled
+
+    :param stage: The name of the stage
+    :param size: Called with the result and then the arguments of a successful call, returns the number of
+    bytes the call processed
+    :return: The decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        def record(start: float, result: Any, args: tuple, kwargs: dict) -> None:
+            processed: int = 0
+
+            if size is not None:
+                try:
+                    processed = size(result, *args, **kwargs)
+                except Exception:
+                    pass
+
+            metrics.record_stage(stage, time.perf_counter() - start, processed)
+
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                if metrics is None:
+                    return await function(*args, **kwargs)
+
+                start: float = time.perf_counter()
+                try:
+                    result: Any = await function(*args, **kwargs)
+                except Exception:
+                    metrics.record_stage(stage, time.perf_counter() - start, error=True)
+                    raise
+
+                record(start, result, args, kwargs)
+
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) -> Any:
+            if metrics is None:
+                return function(*args, **kwargs)
+
+            start: float = time.perf_counter()
+            try:
+                result: Any = function(*args, **kwargs)
+            except Exception:
+                metrics.record_stage(stage, time.perf_counter() - start, error=True)
+                raise
+
+            record(start, result, args, kwargs)
+
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,411 @@
+import html
+import io
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from abc import ABC, abstractmethod
+from PIL import Image
+from typing import Iterator
+from .device_profile import DeviceProfile
+from .pdf_writer import PDFWriter
+
+# The extensions of the image formats pages are served in, keyed by the signature their data starts with
+image_signatures: dict[bytes, str] = {
+    b"\xff\xd8": ".jpg",
+    b"\x89PNG": ".png",
+    b"GIF8": ".gif",
+    b"RIFF": ".webp",
+}
+# The media types of the image formats, keyed by extension
+image_media_types: dict[str, str] = {
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+
+def get_image_extension(image_data: bytes) -> str:
+    """
+    :param image_data: The binary data of an image, or at least its first bytes
+    :return: The file extension of the image's format, .jpg if the format is unknown
+    """
+
+    for signature, extension in image_signatures.items():
+        if image_data.startswith(signature):
+            return extension
+
+    return ".jpg"
+
+
+def get_pages(
+    image_data_list: list[bytes], profile: DeviceProfile = None
+) -> Iterator[tuple[str, bytes]]:
+    """
+    Names the pages of a chapter after their number and extension, skipping missing pages. Pages given as paths
+    are left on disk unless they have to be transformed with a device profile, so they can be copied in chunks.
+
+    :param image_data_list: The binary data or path of each page
+    :param profile: The DeviceProfile to transform the pages with, if any
+    :return: An iterator of the file name and the binary data or path of each page, in page order
+    """
+
+    width: int = max(3, len(str(len(image_data_list))))
+    number: int = 0
+
+    for image_data in image_data_list:
+        if not image_data:
+            continue
+
+        if profile is not None:
+            if isinstance(image_data, str):
+                with open(image_data, "rb") as file:
+                    image_data = file.read()
+
+            image_data = profile.transform(image_data)
+
+        if isinstance(image_data, str):
+            with open(image_data, "rb") as file:
+                header: bytes = file.read(8)
+        else:
+            header = image_data[:8]
+
+        number += 1
+        yield f"{number:0{width}d}{get_image_extension(header)}", image_data
+
+
+def get_safe_name(title: str) -> str:
+    """
+    :param title: The title of a chapter
+    :return: The title with the characters that separate paths replaced, so it can name a directory
+    """
+
+    return title.replace("/", "-").replace("\\", "-")
+
+
+class OutputWriter(ABC):
+    """
+    Writes the chapters of one output file or directory one at a time, so an output covering a whole volume or
+    series only ever holds the chapter being added in memory and pages are never decoded again to merge
+    chapters. Chapters added with a title are bookmarked in the format's own way. The output is written next to
+    its final path with a .part suffix and only moved into place once it is closed.
+    """
+
+    def __init__(
+        self, file_path: str, title: str = None, profile: DeviceProfile = None
+    ) -> None:
+        """
+        :param file_path: The path of the output
+        :param title: The title of the output, defaults to the name of the file without its extension
+        :param profile: The DeviceProfile to transform the pages with, if any
+        """
+
+        self.file_path: str = file_path
+        self.part_path: str = file_path + ".part"
+        self.title: str = title or os.path.splitext(os.path.basename(file_path))[0]
+        self.profile: DeviceProfile = profile
+        self.page_count: int = 0
+        self.chapter_count: int = 0
+
+    def __enter__(self) -> "OutputWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @abstractmethod
+    def open(self) -> None:
+        """
+        Creates the partial output
+        """
+
+    @abstractmethod
+    def add_chapter(self, image_data_list: list[bytes], title: str = None) -> None:
+        """
+        Adds the pages of a chapter after the pages added so far
+
+        :param image_data_list: The binary data or path of each page, missing pages are skipped
+        :param title: The title the chapter is bookmarked under, or None to add its pages without a bookmark
+        :return: None
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Finishes the output and moves it into place, raising ValueError without producing any output if no
+        page was added
+        """
+
+    @abstractmethod
+    def abort(self) -> None:
+        """
+        Removes the partial output without producing any output
+        """
+
+
+class StagedOutputWriter(OutputWriter):
+    """
+    An OutputWriter that builds the output at its .part path itself and moves it into place once it is closed,
+    leaving only _finish to the format
+    """
+
+    def close(self) -> None:
+        if self.page_count == 0:
+            self.abort()
+            raise ValueError(
+                f"No images to write to {os.path.basename(self.file_path)}"
+            )
+
+        self._finish()
+
+        if os.path.isdir(self.file_path):
+            shutil.rmtree(self.file_path)
+
+        os.replace(self.part_path, self.file_path)
+
+    def abort(self) -> None:
+        self._finish()
+
+        if os.path.isdir(self.part_path):
+            shutil.rmtree(self.part_path, ignore_errors=True)
+        elif os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    def _finish(self) -> None:
+        """
+        Writes whatever the format needs after the last page and closes the partial output
+        """
+
+
+class PDFOutputWriter(OutputWriter):
+    """
+    Writes pages to a PDF file with PDFWriter, embedding JPEGs as they are. Every chapter added with a title is
+    an entry of the outline of the file.
+    """
+
+    def open(self) -> None:
+        self._writer: PDFWriter = PDFWriter(self.file_path)
+        self._writer.open()
+
+    def add_chapter(self, image_data_list: list[bytes], title: str = None) -> None:
+        if title is not None:
+            self._writer.add_bookmark(title)
+
+        for image_data in image_data_list:
+            if not image_data:
+                continue
+
+            if self.profile is not None:
+                if isinstance(image_data, str):
+                    with open(image_data, "rb") as file:
+                        image_data = file.read()
+
+                self._writer.add_page_data(self.profile.transform(image_data))
+            elif isinstance(image_data, str):
+                self._writer.add_page_file(image_data)
+            else:
+                self._writer.add_page_data(image_data)
+
+        self.page_count = self._writer.page_count
+        self.chapter_count += 1
+
+    def close(self) -> None:
+        if self.page_count == 0:
+            self.abort()
+            raise ValueError(
+                f"No images to write to {os.path.basename(self.file_path)}"
+            )
+
+        self._writer.close()
+
+    def abort(self) -> None:
+        self._writer.abort()
+
+
+class CBZOutputWriter(StagedOutputWriter):
+    """
+    Stores pages in a CBZ file, a zip of the original page data without compression, so nothing is decoded or
+    encoded and pages given as paths are copied into the file in chunks. Every chapter added with a title gets
+    its own directory and a bookmark in the ComicInfo.xml of the file.
+    """
+
+    def open(self) -> None:
+        self._archive: zipfile.ZipFile = zipfile.ZipFile(
+            self.part_path, "w", zipfile.ZIP_STORED
+        )
+        # The title of every bookmark and the index of the page it points at
+        self._bookmarks: list[tuple[str, int]] = []
+
+    def add_chapter(self, image_data_list: list[bytes], title: str = None) -> None:
+        directory: str = ""
+        if title is not None:
+            directory = f"{self.chapter_count + 1:04d} {get_safe_name(title)}/"
+            self._bookmarks.append((title, self.page_count))
+
+        for file_name, image_data in get_pages(image_data_list, self.profile):
+            if isinstance(image_data, str):
+                self._archive.write(image_data, directory + file_name)
+            else:
+                self._archive.writestr(directory + file_name, image_data)
+
+            self.page_count += 1
+
+        self.chapter_count += 1
+
+    def _finish(self) -> None:
+        if self._archive is None:
+            return
+
+        if self._bookmarks and self.page_count:
+            pages: str = "".join(
+                f'<Page Image="{page}" Bookmark="{html.escape(title)}"/>'
+                for title, page in self._bookmarks
+                if page < self.page_count
+            )
+            self._archive.writestr(
+                "ComicInfo.xml",
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                f"<ComicInfo><Title>{html.escape(self.title)}</Title>"
+                f"<PageCount>{self.page_count}</PageCount><Pages>{pages}</Pages></ComicInfo>",
+            )
+
+        self._archive.close()
+        self._archive = None
+
+
+class EPUBOutputWriter(StagedOutputWriter):
+    """
+    Stores pages in a fixed layout EPUB 3 file with one page per image. Like a CBZ file it is a zip of the
+    original page data without compression, only the headers of the pages are read to size their pages. Every
+    chapter added with a title is an entry of the table of contents.
+    """
+
+    def open(self) -> None:
+        self._archive: zipfile.ZipFile = zipfile.ZipFile(
+            self.part_path, "w", zipfile.ZIP_STORED
+        )
+        # The name of every page and of its image
+        self._pages: list[tuple[str, str]] = []
+        # The title of every table of contents entry and the name of the page it points at
+        self._contents: list[tuple[str, str]] = []
+
+        # The mimetype has to be the first entry of the file
+        self._archive.writestr("mimetype", "application/epub+zip")
+        self._archive.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+            'media-type="application/oebps-package+xml"/></rootfiles></container>',
+        )
+
+    def add_chapter(self, image_data_list: list[bytes], title: str = None) -> None:
+        for i, (file_name, image_data) in enumerate(
+            get_pages(image_data_list, self.profile)
+        ):
+            name: str = f"{self.page_count + 1:04d}"
+            image_name: str = name + os.path.splitext(file_name)[1]
+
+            if isinstance(image_data, str):
+                self._archive.write(image_data, f"OEBPS/images/{image_name}")
+                with Image.open(image_data) as image:
+                    width, height = image.size
+            else:
+                self._archive.writestr(f"OEBPS/images/{image_name}", image_data)
+                with Image.open(io.BytesIO(image_data)) as image:
+                    width, height = image.size
+
+            self._archive.writestr(
+                f"OEBPS/pages/{name}.xhtml",
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+                f"<title>{html.escape(title or self.title)}</title>"
+                f'<meta name="viewport" content="width={width}, height={height}"/>'
+                "<style>body{margin:0}img{width:100%;height:100%}</style></head>"
+                f'<body><img src="../images/{image_name}" alt="{name}"/></body></html>',
+            )
+
+            if i == 0 and (title is not None or not self._contents):
+                self._contents.append((title or self.title, name))
+
+            self._pages.append((name, image_name))
+            self.page_count += 1
+
+        self.chapter_count += 1
+
+    def _finish(self) -> None:
+        if self._archive is None:
+            return
+
+        if self._pages:
+            contents: str = "".join(
+                f'<li><a href="pages/{name}.xhtml">{html.escape(title)}</a></li>'
+                for title, name in self._contents
+            )
+            self._archive.writestr(
+                "OEBPS/nav.xhtml",
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+                f"<head><title>{html.escape(self.title)}</title></head>"
+                f'<body><nav epub:type="toc"><ol>{contents}</ol></nav></body></html>',
+            )
+            self._archive.writestr(
+                "OEBPS/content.opf",
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id" '
+                'prefix="rendition: http://www.idpf.org/vocab/rendition/#">'
+                '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                f'<dc:identifier id="id">urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, self.title)}</dc:identifier>'
+                f"<dc:title>{html.escape(self.title)}</dc:title><dc:language>en</dc:language>"
+                f'<meta property="dcterms:modified">{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}</meta>'
+                '<meta property="rendition:layout">pre-paginated</meta>'
+                '<meta property="rendition:spread">none</meta></metadata><manifest>'
+                '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+                + "".join(
+                    f'<item id="page-{name}" href="pages/{name}.xhtml" media-type="application/xhtml+xml"/>'
+                    f'<item id="image-{name}" href="images/{image_name}" '
+                    f'media-type="{image_media_types[os.path.splitext(image_name)[1]]}"/>'
+                    for name, image_name in self._pages
+                )
+                + "</manifest><spine>"
+                + "".join(f'<itemref idref="page-{name}"/>' for name, _ in self._pages)
+                + "</spine></package>",
+            )
+
+        self._archive.close()
+        self._archive = None
+
+
+class FolderOutputWriter(StagedOutputWriter):
+    """
+    Saves pages as they are to a directory, copying pages given as paths from disk without reading them into
+    memory. Every chapter added with a title gets its own subdirectory.
+    """
+
+    def open(self) -> None:
+        os.makedirs(self.part_path, exist_ok=True)
+
+    def add_chapter(self, image_data_list: list[bytes], title: str = None) -> None:
+        directory: str = self.part_path
+        if title is not None:
+            directory = os.path.join(
+                directory, f"{self.chapter_count + 1:04d} {get_safe_name(title)}"
+            )
+            os.makedirs(directory, exist_ok=True)
+
+        for file_name, image_data in get_pages(image_data_list, self.profile):
+            if isinstance(image_data, str):
+                shutil.copyfile(image_data, os.path.join(directory, file_name))
+            else:
+                with open(os.path.join(directory, file_name), "wb") as file:
+                    file.write(image_data)
+
+            self.page_count += 1
+
+        self.chapter_count += 1
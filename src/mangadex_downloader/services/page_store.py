@@ -0,0 +1,356 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO
+from urllib.parse import urlsplit
+from .file_access_service import get_cache_directory
+
+
+class PageStore:
+    """
+    Stores downloaded pages on disk under the quality, chapter hash and filename of their url, which never change
+    for the same page, so a page is only ever downloaded once. The least recently used pages are evicted once the
+    store is over its size. A manifest of each stored chapter's pages lets a chapter be read back without asking
+    the API where its pages are. Pages are written next to their final path to a partial file with a unique name
+    and a .part suffix, so concurrent downloads of the same page never share one, and only moved into place once
+    complete. A page that was being written when the process died is left as a .part file that nothing writes to
+    again, so partial files older than stale_part_age are removed when the stored pages are first scanned. Pages
+    are stored and read from many threads at once, so the index of stored pages is only used under a lock.
+    """
+
+    # The number of seconds after which a partial file can't belong to a download that is still running
+    stale_part_age: float = 60 * 60
+
+    def __init__(self, directory: str = None, max_size: int = None) -> None:
+        """
+        :param directory: The directory to store pages in, defaults to get_cache_directory("pages")
+        :param max_size: The maximum total size of the stored pages in bytes, defaults to the
+        MANGADEX_PAGE_STORE_SIZE environment variable or 2 GB
+        """
+
+        self.directory: str = directory or get_cache_directory("pages")
+        self.max_size: int = max_size or int(
+            os.getenv("MANGADEX_PAGE_STORE_SIZE") or 2 * 1024 * 1024 * 1024
+        )
+
+        # The size and last use of every stored page, scanned from disk the first time it is needed
+        self._index: dict[str, tuple[float, int]] = None
+        self._size: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        """
+        :param url: The url of a page, ending in /{quality}/{hash}/{filename}
+        :return: The key the page is stored under, or None if the url doesn't identify a page
+        """
+
+        parts: list[str] = urlsplit(url).path.strip("/").split("/")[-3:]
+
+        if len(parts) != 3 or any(part in ("", ".", "..") for part in parts):
+            return None
+
+        return "/".join(parts)
+
+    def get_path(self, key: str) -> str:
+        """
+        :param key: The key of a page
+        :return: The path the page is stored at
+        """
+
+        quality, chapter_hash, filename = key.split("/")
+
+        return os.path.join(
+            self.directory, quality, chapter_hash[:2], chapter_hash, filename
+        )
+
+    def get_manifest_path(self, chapter_id: str, quality: str) -> str:
+        """
+        :param chapter_id: The id of a chapter
+        :param quality: The quality of the chapter's pages
+        :return: The path the manifest of the chapter in that quality is stored at
+        """
+
+        return os.path.join(self.directory, "chapters", f"{chapter_id}.{quality}.json")
+
+    def get_file(self, url: str) -> str:
+        """
+        Looks up the path of a stored page and marks it as recently used
+
+        :param url: The url of the page
+        :return: The path of the page, or None if it isn't stored
+        """
+
+        key: str = self.get_key(url)
+
+        if key is None:
+            return None
+
+        path: str = self.get_path(key)
+
+        try:
+            os.utime(path)
+            modified: float = os.path.getmtime(path)
+            size: int = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+
+        self._touch(path, modified, size)
+
+        return path
+
+    def get(self, url: str) -> bytes:
+        """
+        Reads a stored page and marks it as recently used
+
+        :param url: The url of the page
+        :return: The binary data of the page, or None if it isn't stored
+        """
+
+        key: str = self.get_key(url)
+
+        if key is None:
+            return None
+
+        path: str = self.get_path(key)
+
+        try:
+            with open(path, "rb") as file:
+                image_data: bytes = file.read()
+            os.utime(path)
+            modified: float = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+
+        self._touch(path, modified, len(image_data))
+
+        return image_data
+
+    def put(self, url: str, image_data: bytes) -> None:
+        """
+        Stores a page, evicting the least recently used pages if the store is full
+
+        :param url: The url of the page
+        :param image_data: The binary data of the page
+        """
+
+        if self.get_key(url) is None or not image_data:
+            return
+
+        with self.open_part(url) as file:
+            file.write(image_data)
+        self.commit_part(url, file.name)
+
+    def open_part(self, url: str) -> BinaryIO:
+        """
+        Creates a partial file for a page and opens it for writing, a page is only stored once its partial file
+        is committed. Every call creates a partial file of its own, whose path is the name of the returned file.
+
+        :param url: The url of the page
+        :return: The opened partial file
+        """
+
+        key: str = self.get_key(url)
+
+        if key is None:
+            raise ValueError(f"Not the url of a page: {url}")
+
+        path: str = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        return tempfile.NamedTemporaryFile(
+            "wb",
+            dir=os.path.dirname(path),
+            prefix=os.path.basename(path) + ".",
+            suffix=".part",
+            delete=False,
+        )
+
+    def commit_part(self, url: str, part_path: str) -> str:
+        """
+        Moves the completely written partial file of a page into place, evicting the least recently used pages
+        if the store is full
+
+        :param url: The url of the page
+        :param part_path: The path of the partial file, the name of the file returned by open_part
+        :return: The path of the stored page
+        """
+
+        path: str = self.get_path(self.get_key(url))
+        os.replace(part_path, path)
+        size: int = os.path.getsize(path)
+        modified: float = os.path.getmtime(path)
+
+        with self._lock:
+            self._load_index()
+            self._size += size - self._index.get(path, (0, 0))[1]
+            self._index[path] = (modified, size)
+            self._evict()
+
+        return path
+
+    def discard_part(self, part_path: str) -> None:
+        """
+        Removes the partial file of a page that failed to download
+
+        :param part_path: The path of the partial file, the name of the file returned by open_part
+        """
+
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+
+    def put_chapter(self, chapter_id: str, url_list: list[str]) -> None:
+        """
+        Stores the manifest of a chapter whose pages are all stored
+
+        :param chapter_id: The id of the chapter
+        :param url_list: The urls of the chapter's pages in page order, which all have the same quality
+        """
+
+        keys: list[str] = [self.get_key(url) for url in url_list]
+
+        if not keys or None in keys:
+            return
+
+        path: str = self.get_manifest_path(chapter_id, keys[0].split("/")[0])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w") as file:
+            json.dump(keys, file)
+
+    def get_chapter(self, chapter_id: str, quality: str = "data") -> list[bytes]:
+        """
+        Reads every page of a chapter whose manifest is stored
+
+        :param chapter_id: The id of the chapter
+        :param quality: The quality the chapter was stored in
+        :return: A list containing the binary data of the chapter's pages in page order, or None if the
+        chapter's manifest or any of its pages aren't stored
+        """
+
+        paths: list[str] = self.get_chapter_files(chapter_id, quality)
+
+        if paths is None:
+            return None
+
+        pages: list[bytes] = []
+        for path in paths:
+            try:
+                with open(path, "rb") as file:
+                    pages.append(file.read())
+            except FileNotFoundError:
+                return None
+
+        return pages
+
+    def get_chapter_files(self, chapter_id: str, quality: str = "data") -> list[str]:
+        """
+        Looks up the paths of every page of a chapter whose manifest is stored
+
+        :param chapter_id: The id of the chapter
+        :param quality: The quality the chapter was stored in
+        :return: A list containing the paths of the chapter's pages in page order, or None if the chapter's
+        manifest or any of its pages aren't stored
+        """
+
+        path: str = self.get_manifest_path(chapter_id, quality)
+
+        try:
+            with open(path) as file:
+                keys: list[str] = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        paths: list[str] = []
+        for key in keys:
+            page_path: str = self.get_file(key) if key else None
+
+            if page_path is None:
+                return None
+
+            paths.append(page_path)
+
+        return paths
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the stored pages in bytes
+        """
+
+        with self._lock:
+            self._load_index()
+
+            return self._size
+
+    def _touch(self, path: str, modified: float, size: int) -> None:
+        """
+        Records the last use of a stored page in the index, if it was scanned
+
+        :param path: The path of the page
+        :param modified: The time the page was last used
+        :param size: The size of the page in bytes
+        """
+
+        with self._lock:
+            if self._index is not None:
+                self._size += size - self._index.get(path, (0, 0))[1]
+                self._index[path] = (modified, size)
+
+    def _load_index(self) -> None:
+        """
+        Scans the stored pages if they haven't been scanned yet, removing stale partial files, the lock must be
+        held
+        """
+
+        if self._index is not None:
+            return
+
+        self._index = {}
+        self._size = 0
+        stale: float = time.time() - self.stale_part_age
+
+        for root, _, files in os.walk(self.directory):
+            if os.path.basename(root) == "chapters":
+                continue
+
+            for name in files:
+                path: str = os.path.join(root, name)
+
+                try:
+                    stat: os.stat_result = os.stat(path)
+
+                    # Partial pages aren't stored yet, and the ones nothing wrote to in a while never will be
+                    if name.endswith(".part"):
+                        if stat.st_mtime < stale:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                self._index[path] = (stat.st_mtime, stat.st_size)
+                self._size += stat.st_size
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used pages until the store fits in its maximum size, the lock must be held
+        """
+
+        if self._size <= self.max_size:
+            return
+
+        for path, (_, size) in sorted(self._index.items(), key=lambda item: item[1]):
+            if self._size <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            del self._index[path]
+            self._size -= size
@@ -0,0 +1,340 @@
+import io
+import os
+from PIL import Image
+
+# Start of frame markers for baseline, extended sequential and progressive Huffman coded JPEGs, which PDF
+# readers can decode from a DCTDecode stream
+PASSTHROUGH_JPEG_MARKERS: set[int] = {0xC0, 0xC1, 0xC2}
+JPEG_COLOR_SPACES: dict[int, str] = {1: "DeviceGray", 3: "DeviceRGB"}
+
+
+def read_jpeg_header(image_data: bytes) -> tuple[int, int, int]:
+    """
+    Reads the dimensions and number of color components of a JPEG from its start of frame segment without
+    decoding the image
+
+    :param image_data: The binary data of the image
+    :return: A tuple of the width, height and number of components, or None if the data is not a JPEG that
+    can be embedded in a PDF file as is
+    """
+
+    if image_data[:2] != b"\xff\xd8":
+        return None
+
+    data: memoryview = memoryview(image_data)
+    position: int = 2
+
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+
+        marker: int = data[position + 1]
+
+        # Fill bytes and markers without a length
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            position += 2
+            continue
+
+        length: int = int.from_bytes(data[position + 2 : position + 4], "big")
+
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if marker not in PASSTHROUGH_JPEG_MARKERS or position + 10 > len(data):
+                return None
+
+            precision: int = data[position + 4]
+            height: int = int.from_bytes(data[position + 5 : position + 7], "big")
+            width: int = int.from_bytes(data[position + 7 : position + 9], "big")
+            components: int = data[position + 9]
+
+            if precision != 8 or width == 0 or height == 0:
+                return None
+
+            return width, height, components
+
+        # The image data starts without a start of frame segment
+        if marker in (0xD9, 0xDA):
+            return None
+
+        position += 2 + length
+
+    return None
+
+
+def encode_text(text: str) -> str:
+    """
+    :param text: Any text
+    :return: The text as a PDF hex string encoded in UTF-16, which can hold any character
+    """
+
+    return "<FEFF" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+class PDFWriter:
+    """
+    Writes a PDF file one page at a time. Each page is encoded and written to disk as soon as it is added, so
+    only the page currently being added is ever held in memory no matter how many pages the file has, and JPEG
+    pages are embedded without being decoded at all. Bookmarks added between pages make up the outline of the
+    file. The file is written next to its final path with a .part suffix and only moved into place once it is
+    complete.
+    """
+
+    def __init__(self, file_path: str, quality: int = None) -> None:
+        """
+        :param file_path: The path of the PDF file to write
+        :param quality: The JPEG quality pages are encoded with, defaults to Pillow's default quality
+        """
+
+        self.file_path: str = file_path
+        self.quality: int = quality
+        self.page_count: int = 0
+
+        self._file = None
+        self._offsets: dict[int, int] = {}
+        self._page_ids: list[int] = []
+        # The title of every outline entry and the index of the page it points at
+        self._bookmarks: list[tuple[str, int]] = []
+        # Object 1 is the catalog and object 2 the page tree, both are written last
+        self._next_id: int = 3
+
+    def __enter__(self) -> "PDFWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self) -> None:
+        """
+        Creates the partial file and writes the PDF header
+        """
+
+        self._file = open(self.file_path + ".part", "wb")
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_page_data(self, image_data: bytes) -> None:
+        """
+        Adds the image data as a new page. Grayscale and RGB JPEGs are embedded as they are, anything else is
+        decoded and re-encoded, freeing the decoded image once it is written
+
+        :param image_data: The binary data of the image
+        :return: None
+        """
+
+        header: tuple[int, int, int] = read_jpeg_header(image_data)
+
+        if header is not None and header[2] in JPEG_COLOR_SPACES:
+            width, height, components = header
+            self._write_image_page(
+                image_data, width, height, JPEG_COLOR_SPACES[components]
+            )
+            return
+
+        with Image.open(io.BytesIO(image_data)) as image:
+            self.add_page(image)
+
+    def add_page_file(self, file_path: str) -> None:
+        """
+        Adds the image stored in a file as a new page, reading the file only when the page is added
+
+        :param file_path: The path of the image file
+        :return: None
+        """
+
+        with open(file_path, "rb") as file:
+            self.add_page_data(file.read())
+
+    def add_page(self, image: Image.Image) -> None:
+        """
+        Encodes the image as JPEG and writes it as a new page sized to the image
+
+        :param image: The image to add
+        :return: None
+        """
+
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("L" if image.mode == "1" else "RGB")
+
+        buffer: io.BytesIO = io.BytesIO()
+        if self.quality is None:
+            image.save(buffer, "JPEG")
+        else:
+            image.save(buffer, "JPEG", quality=self.quality)
+
+        color_space: str = "DeviceGray" if image.mode == "L" else "DeviceRGB"
+        self._write_image_page(
+            buffer.getbuffer(), image.width, image.height, color_space
+        )
+
+    def add_bookmark(self, title: str) -> None:
+        """
+        Adds an entry to the outline of the file that points at the next page added
+
+        :param title: The title of the entry
+        :return: None
+        """
+
+        self._bookmarks.append((title, self.page_count))
+
+    def close(self) -> None:
+        """
+        Writes the page tree, outline, catalog and cross-reference table and moves the finished file into place
+        """
+
+        kids: str = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(
+            2, f"<< /Type /Pages /Kids [{kids}] /Count {self.page_count} >>".encode()
+        )
+
+        outline_id: int = self._write_outline()
+        if outline_id is None:
+            self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        else:
+            self._write_object(
+                1,
+                f"<< /Type /Catalog /Pages 2 0 R /Outlines {outline_id} 0 R "
+                f"/PageMode /UseOutlines >>".encode(),
+            )
+
+        xref_offset: int = self._file.tell()
+        object_count: int = self._next_id
+        lines: list[str] = [f"xref\n0 {object_count}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, object_count):
+            lines.append(f"{self._offsets[object_id]:010d} 00000 n \n")
+        lines.append(
+            f"trailer\n<< /Size {object_count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+        )
+        self._file.write("".join(lines).encode())
+        self._file.close()
+        self._file = None
+
+        os.replace(self.file_path + ".part", self.file_path)
+
+    def abort(self) -> None:
+        """
+        Closes and removes the partial file without producing a PDF file
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if os.path.exists(self.file_path + ".part"):
+            os.remove(self.file_path + ".part")
+
+    def _write_outline(self) -> int:
+        """
+        Writes the outline dictionary and an item for every bookmark that points at a page
+
+        :return: The object number of the outline dictionary, or None if there are no bookmarks
+        """
+
+        bookmarks: list[tuple[str, int]] = [
+            (title, page) for title, page in self._bookmarks if page < self.page_count
+        ]
+
+        if not bookmarks:
+            return None
+
+        outline_id: int = self._reserve_id()
+        item_ids: list[int] = [self._reserve_id() for _ in bookmarks]
+
+        for i, (title, page) in enumerate(bookmarks):
+            links: str = ""
+            if i > 0:
+                links += f" /Prev {item_ids[i - 1]} 0 R"
+            if i < len(bookmarks) - 1:
+                links += f" /Next {item_ids[i + 1]} 0 R"
+
+            self._write_object(
+                item_ids[i],
+                f"<< /Title {encode_text(title)} /Parent {outline_id} 0 R{links} "
+                f"/Dest [{self._page_ids[page]} 0 R /Fit] >>".encode(),
+            )
+
+        self._write_object(
+            outline_id,
+            f"<< /Type /Outlines /First {item_ids[0]} 0 R /Last {item_ids[-1]} 0 R "
+            f"/Count {len(item_ids)} >>".encode(),
+        )
+
+        return outline_id
+
+    def _write_image_page(
+        self, jpeg_data: bytes, width: int, height: int, color_space: str
+    ) -> None:
+        """
+        Writes the image XObject, content stream and page objects of a page whose image is JPEG encoded
+
+        :param jpeg_data: The JPEG data of the page
+        :param width: The width of the image in pixels, also used as the page width in points
+        :param height: The height of the image in pixels, also used as the page height in points
+        :param color_space: The PDF color space of the JPEG data
+        """
+
+        image_id: int = self._reserve_id()
+        content_id: int = self._reserve_id()
+        page_id: int = self._reserve_id()
+
+        self._write_stream(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /{color_space} /BitsPerComponent 8 /Filter /DCTDecode".encode(),
+            jpeg_data,
+        )
+        self._write_stream(
+            content_id, b"<<", f"q {width} 0 0 {height} 0 0 cm /image Do Q".encode()
+        )
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /XObject << /image {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>".encode(),
+        )
+
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    def _reserve_id(self) -> int:
+        """
+        :return: The next unused object number
+        """
+
+        object_id: int = self._next_id
+        self._next_id += 1
+
+        return object_id
+
+    def _write_object(self, object_id: int, body: bytes) -> None:
+        """
+        Writes an indirect object and records its offset for the cross-reference table
+
+        :param object_id: The object number
+        :param body: The serialized object
+        """
+
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _write_stream(self, object_id: int, dictionary: bytes, data: bytes) -> None:
+        """
+        Writes a stream object, adding the length of the data to its unterminated dictionary
+
+        :param object_id: The object number
+        :param dictionary: The stream dictionary without its closing >>
+        :param data: The stream data
+        """
+
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(
+            f"{object_id} 0 obj\n".encode()
+            + dictionary
+            + f" /Length {len(data)} >>\nstream\n".encode()
+        )
+        self._file.write(data)
+        self._file.write(b"\nendstream\nendobj\n")
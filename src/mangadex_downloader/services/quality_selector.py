@@ -0,0 +1,101 @@
+import os
+
+
+class QualitySelector:
+    """
+    Picks the image quality of chapters downloaded in auto mode. Every downloaded chapter feeds the throughput it
+    was downloaded at and the average page size of its quality into running averages, and a chapter is
+    downloaded in data-saver quality while the throughput is below the minimum bandwidth or the chapter's
+    estimated size in data quality is over the target size.
+    """
+
+    # The average page sizes in bytes assumed until a chapter of the quality has been measured
+    default_page_sizes: dict[str, float] = {
+        "data": 1024 * 1024,
+        "data-saver": 256 * 1024,
+    }
+
+    def __init__(
+        self, min_bandwidth: float = None, target_size: int = None, weight: float = 0.3
+    ) -> None:
+        """
+        :param min_bandwidth: The throughput in bytes per second below which chapters are downloaded in
+        data-saver quality, defaults to the MANGADEX_AUTO_QUALITY_MIN_BANDWIDTH environment variable or 512 KB/s.
+        0 means throughput is ignored.
+        :param target_size: The size in bytes above which chapters are downloaded in data-saver quality, defaults
+        to the MANGADEX_AUTO_QUALITY_TARGET_SIZE environment variable. 0 or None means size is ignored.
+        :param weight: How much each new measurement counts towards the running averages, between 0 and 1
+        """
+
+        self.min_bandwidth: float = (
+            min_bandwidth
+            if min_bandwidth is not None
+            else float(os.getenv("MANGADEX_AUTO_QUALITY_MIN_BANDWIDTH") or 512 * 1024)
+        )
+        self.target_size: int = (
+            target_size
+            if target_size is not None
+            else int(os.getenv("MANGADEX_AUTO_QUALITY_TARGET_SIZE") or 0)
+        )
+        self.weight: float = weight
+        self.bandwidth: float = None
+
+        self._page_sizes: dict[str, float] = {}
+
+    def record(self, quality: str, size: int, pages: int, duration: float) -> None:
+        """
+        Records the download of a chapter
+
+        :param quality: The quality the chapter was downloaded in
+        :param size: The number of bytes received
+        :param pages: The number of pages received
+        :param duration: The number of seconds the download took
+        """
+
+        if size <= 0 or pages <= 0 or duration <= 0:
+            return
+
+        self.bandwidth = self._average(self.bandwidth, size / duration)
+        self._page_sizes[quality] = self._average(
+            self._page_sizes.get(quality), size / pages
+        )
+
+    def estimate_size(self, quality: str, pages: int) -> float:
+        """
+        :param quality: The quality of a chapter
+        :param pages: The number of pages of the chapter
+        :return: The expected size of the chapter in bytes
+        """
+
+        page_size: float = self._page_sizes.get(quality)
+
+        if page_size is None:
+            page_size = self.default_page_sizes.get(quality, 0.0)
+
+        return page_size * pages
+
+    def choose(self, pages: int) -> str:
+        """
+        :param pages: The number of pages of a chapter
+        :return: The quality to download the chapter in, either "data" or "data-saver"
+        """
+
+        if self.target_size and self.estimate_size("data", pages) > self.target_size:
+            return "data-saver"
+
+        if self.bandwidth is not None and self.bandwidth < self.min_bandwidth:
+            return "data-saver"
+
+        return "data"
+
+    def _average(self, average: float, value: float) -> float:
+        """
+        :param average: The current running average, or None if nothing was measured yet
+        :param value: The new measurement
+        :return: The running average including the new measurement
+        """
+
+        if average is None:
+            return value
+
+        return average + self.weight * (value - average)
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import re
+import time
+
+
+class TokenBucket:
+    """
+    Lets requests through at a steady rate while allowing short bursts up to its capacity. Every acquire takes
+    a token, going into debt when the bucket is empty, so waiting requests are let through in the order they
+    arrived without needing a lock.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """
+        :param rate: The number of tokens added per second
+        :param capacity: The maximum number of tokens the bucket holds, defaults to one second worth of tokens
+        """
+
+        self.rate: float = rate
+        self.capacity: float = capacity or max(1.0, rate)
+
+        self._tokens: float = self.capacity
+        self._updated: float = time.monotonic()
+        self._paused_until: float = 0.0
+
+    def reserve(self) -> float:
+        """
+        Takes a token
+
+        :return: The number of seconds to wait before the token may be used
+        """
+
+        self._refill()
+        self._tokens -= 1
+
+        return max(0.0, -self._tokens / self.rate, self._paused_until - self._updated)
+
+    def refund(self) -> None:
+        """
+        Returns a token that was reserved but not used
+        """
+
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Lets no requests through for a number of seconds and empties the bucket
+
+        :param seconds: The number of seconds to pause for
+        """
+
+        self._refill()
+        self._paused_until = max(self._paused_until, self._updated + seconds)
+        # Leave exactly one token by the time the pause ends
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def _refill(self) -> None:
+        """
+        Adds the tokens earned since the last refill
+        """
+
+        now: float = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+
+class RateLimiter:
+    """
+    Keeps requests under MangaDex's rate limits with a TokenBucket for each class of endpoint. A url belongs to
+    every class whose pattern matches it, so at-home server requests count against both their own limit and
+    the global API limit, and urls that match no pattern are images. Once a request is rate limited anyway,
+    its classes are paused for as long as the server asked so the requests behind it don't fail as well.
+    """
+
+    # Pairs of endpoint classes and the url patterns that belong to them
+    default_patterns: list[tuple[str, str]] = [
+        ("at-home", r"/at-home/server/"),
+        ("global", r"^https?://api\.mangadex\.org/"),
+        ("reports", r"^https?://api\.mangadex\.network/"),
+    ]
+    fallback_class: str = "images"
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float]] = None,
+        patterns: list[tuple[str, str]] = None,
+    ) -> None:
+        """
+        :param limits: The rate in requests per second and burst size of each endpoint class, merged with the
+        defaults of 5 per second globally, 40 per minute for at-home servers and no limit for images, which are
+        read from the MANGADEX_GLOBAL_RATE_LIMIT, MANGADEX_AT_HOME_RATE_LIMIT (per minute) and
+        MANGADEX_IMAGE_RATE_LIMIT environment variables. A rate of 0 or None means no limit.
+        :param patterns: Pairs of endpoint classes and url patterns, checked before default_patterns
+        """
+
+        at_home_rate: float = float(os.getenv("MANGADEX_AT_HOME_RATE_LIMIT") or 40)
+        image_rate: float = float(os.getenv("MANGADEX_IMAGE_RATE_LIMIT") or 0)
+        self.limits: dict[str, tuple[float, float]] = {
+            "global": (float(os.getenv("MANGADEX_GLOBAL_RATE_LIMIT") or 5), None),
+            "at-home": (at_home_rate / 60, at_home_rate),
+            self.fallback_class: (image_rate, None),
+            **(limits or {}),
+        }
+        self.patterns: list[tuple[str, re.Pattern]] = [
+            (endpoint_class, re.compile(pattern))
+            for endpoint_class, pattern in (patterns or []) + self.default_patterns
+        ]
+
+        self._buckets: dict[str, TokenBucket] = {
+            endpoint_class: TokenBucket(rate, capacity)
+            for endpoint_class, (rate, capacity) in self.limits.items()
+            if rate
+        }
+        self._metrics: dict[str, dict[str, float]] = {}
+
+    def get_classes(self, url: str) -> list[str]:
+        """
+        :param url: The url of a request
+        :return: The endpoint classes the url belongs to
+        """
+
+        classes: list[str] = []
+
+        for endpoint_class, pattern in self.patterns:
+            if endpoint_class not in classes and pattern.search(url):
+                classes.append(endpoint_class)
+
+        return classes or [self.fallback_class]
+
+    async def acquire(self, url: str) -> float:
+        """
+        Waits until a request to the url is allowed by every limit it is under
+
+        :param url: The url of the request
+        :return: The number of seconds waited
+        """
+
+        classes: list[str] = self.get_classes(url)
+        buckets: list[TokenBucket] = [
+            self._buckets[endpoint_class]
+            for endpoint_class in classes
+            if endpoint_class in self._buckets
+        ]
+        delay: float = max([bucket.reserve() for bucket in buckets], default=0.0)
+
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                for bucket in buckets:
+                    bucket.refund()
+                raise
+
+        for endpoint_class in classes:
+            metrics: dict[str, float] = self._get_metrics(endpoint_class)
+            metrics["requests"] += 1
+            if delay > 0:
+                metrics["throttled"] += 1
+                metrics["waited"] += delay
+                metrics["max_wait"] = max(metrics["max_wait"], delay)
+
+        return delay
+
+    def pause(self, url: str, seconds: float) -> None:
+        """
+        Pauses every limited class of the url after a request to it was rate limited
+
+        :param url: The url of the rate limited request
+        :param seconds: The number of seconds the server asked to wait
+        """
+
+        for endpoint_class in self.get_classes(url):
+            self._get_metrics(endpoint_class)["rate_limited"] += 1
+
+            if endpoint_class in self._buckets:
+                self._buckets[endpoint_class].pause(seconds)
+
+    @property
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """
+        The number of requests, throttled requests and rate limited responses, and the total and longest time
+        spent waiting of each endpoint class that has seen a request
+        """
+
+        return {
+            endpoint_class: dict(metrics)
+            for endpoint_class, metrics in self._metrics.items()
+        }
+
+    def _get_metrics(self, endpoint_class: str) -> dict[str, float]:
+        """
+        :param endpoint_class: The endpoint class
+        :return: The metrics of the endpoint class, created if it has none yet
+        """
+
+        if endpoint_class not in self._metrics:
+            self._metrics[endpoint_class] = {
+                "requests": 0,
+                "throttled": 0,
+                "rate_limited": 0,
+                "waited": 0.0,
+                "max_wait": 0.0,
+            }
+
+        return self._metrics[endpoint_class]
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from .file_access_service import get_cache_directory
+
+
+class ResponseCache:
+    """
+    Stores JSON responses of the MangaDex API on disk, keyed by url and query parameters. Each endpoint has its
+    own time to live, after which a response is revalidated with its ETag or Last-Modified date instead of
+    being downloaded again, and the least recently used responses are evicted once the cache is over its size.
+    Reading a response only records its last use in memory, the last uses are written to disk in batches along
+    with the next stored response, so a cache hit doesn't wait for the disk.
+    """
+
+    # The number of last uses kept in memory before they are written to disk without waiting for a stored response
+    accessed_batch_size: int = 256
+
+    # The first pattern that matches a url decides how many seconds its responses stay fresh. At-home server
+    # responses point at short-lived nodes and are never cached.
+    default_ttls: list[tuple[str, float]] = [
+        (r"/at-home/server/", 0),
+        (r"/manga/[^/]+/feed", 10 * 60),
+        (r"/manga", 60 * 60),
+        (r".*", 5 * 60),
+    ]
+
+    def __init__(
+        self,
+        directory: str = None,
+        max_size: int = None,
+        ttls: list[tuple[str, float]] = None,
+    ) -> None:
+        """
+        :param directory: The directory to store the cache in, defaults to get_cache_directory("responses")
+        :param max_size: The maximum total size of the stored responses in bytes, defaults to the
+        MANGADEX_RESPONSE_CACHE_SIZE environment variable or 64 MB
+        :param ttls: Pairs of url patterns and times to live in seconds, checked before default_ttls
+        """
+
+        self.directory: str = directory or get_cache_directory("responses")
+        self.max_size: int = max_size or int(
+            os.getenv("MANGADEX_RESPONSE_CACHE_SIZE") or 64 * 1024 * 1024
+        )
+        self.ttls: list[tuple[re.Pattern, float]] = [
+            (re.compile(pattern), ttl)
+            for pattern, ttl in (ttls or []) + self.default_ttls
+        ]
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            os.path.join(self.directory, "responses.sqlite3")
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+        # The last use of every response read since the last uses were written to disk
+        self._accessed: dict[str, float] = {}
+
+    def get_ttl(self, url: str) -> float:
+        """
+        :param url: The url of the request
+        :return: The number of seconds responses of the url stay fresh, 0 if they aren't cached
+        """
+
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+
+        return 0
+
+    def get_key(self, url: str, params: dict) -> str:
+        """
+        :param url: The url of the request
+        :param params: The query parameters of the request
+        :return: The key the response of the request is stored under
+        """
+
+        request: str = json.dumps([url, params or {}], sort_keys=True, default=str)
+
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def get(self, url: str, params: dict) -> dict:
+        """
+        Looks up the stored response of a request and marks it as recently used
+
+        :param url: The url of the request
+        :param params: The query parameters of the request
+        :return: A dictionary containing the response body, its etag and last_modified validators and whether it
+        is still fresh, or None if no response is stored
+        """
+
+        key: str = self.get_key(url, params)
+        row: tuple = self._connection.execute(
+            "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self._accessed[key] = time.time()
+
+        if len(self._accessed) >= self.accessed_batch_size:
+            self._write_accessed()
+            self._connection.commit()
+
+        body, etag, last_modified, stored_at = row
+
+        return {
+            "body": json.loads(body),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - stored_at < self.get_ttl(url),
+        }
+
+    def put(
+        self,
+        url: str,
+        params: dict,
+        body: dict,
+        etag: str = None,
+        last_modified: str = None,
+    ) -> None:
+        """
+        Stores the response of a request, evicting the least recently used responses if the cache is full
+
+        :param url: The url of the request
+        :param params: The query parameters of the request
+        :param body: The JSON body of the response
+        :param etag: The ETag header of the response, if any
+        :param last_modified: The Last-Modified header of the response, if any
+        """
+
+        key: str = self.get_key(url, params)
+        serialized: str = json.dumps(body)
+        now: float = time.time()
+        self._accessed.pop(key, None)
+        self._write_accessed()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                serialized,
+                etag,
+                last_modified,
+                now,
+                now,
+                len(serialized),
+            ),
+        )
+        self._evict()
+        self._connection.commit()
+
+    def refresh(self, url: str, params: dict) -> None:
+        """
+        Marks the stored response of a request as fresh again after the server confirmed it hasn't changed
+
+        :param url: The url of the request
+        :param params: The query parameters of the request
+        """
+
+        key: str = self.get_key(url, params)
+        now: float = time.time()
+        self._accessed.pop(key, None)
+        self._connection.execute(
+            "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+            (now, now, key),
+        )
+        self._connection.commit()
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the stored responses in bytes
+        """
+
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Closes the database of the cache, writing the last uses that are still in memory
+        """
+
+        self._write_accessed()
+        self._connection.commit()
+        self._connection.close()
+
+    def _write_accessed(self) -> None:
+        """
+        Writes the last uses recorded in memory to the database, without committing them
+        """
+
+        if not self._accessed:
+            return
+
+        self._connection.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used responses until the cache fits in its maximum size
+        """
+
+        excess: int = self.size - self.max_size
+
+        if excess <= 0:
+            return
+
+        keys: list[str] = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at, stored_at"
+        ).fetchall():
+            if excess <= 0:
+                break
+            keys.append(key)
+            excess -= size
+
+        self._connection.executemany(
+            "DELETE FROM responses WHERE key = ?", [(key,) for key in keys]
+        )
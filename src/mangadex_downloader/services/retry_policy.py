@@ -0,0 +1,174 @@
+import asyncio
+import random
+import time
+import aiohttp
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+from . import metrics_service
+
+T = TypeVar("T")
+
+
+class ResponseStatusError(Exception):
+    """
+    Raised when a request is answered with a status code other than 200
+    """
+
+    def __init__(self, message: str, status: int, retry_after: float = None) -> None:
+        """
+        :param message: The error message
+        :param status: The status code of the response
+        :param retry_after: The number of seconds the server asked to wait before retrying, if any
+        """
+
+        super().__init__(message)
+        self.status: int = status
+        self.retry_after: float = retry_after
+
+
+def parse_retry_after(headers: dict) -> float:
+    """
+    Reads how long the server asked to wait before retrying from the Retry-After header, either as a number of
+    seconds or an HTTP date, or from MangaDex's X-RateLimit-Retry-After header, a unix timestamp
+
+    :param headers: The headers of the response
+    :return: The number of seconds to wait, or None if the response doesn't say
+    """
+
+    if not headers:
+        return None
+
+    retry_after: str = headers.get("Retry-After")
+
+    try:
+        if retry_after is not None:
+            if retry_after.strip().isdigit():
+                return float(retry_after)
+
+            return max(
+                0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()
+            )
+
+        rate_limit_retry_after: str = headers.get("X-RateLimit-Retry-After")
+
+        if rate_limit_retry_after is not None:
+            return max(0.0, float(rate_limit_retry_after) - time.time())
+    except (TypeError, ValueError):
+        return None
+
+    return None
+
+
+class RetryPolicy:
+    """
+    Retries failed requests that are likely to succeed when tried again. Each class of error has its own
+    number of retries, and the delay between attempts grows exponentially with random jitter so clients that
+    failed together don't retry together, unless the server said how long to wait.
+    """
+
+    default_max_retries: dict[str, int] = {
+        "rate_limited": 5,
+        "server_error": 3,
+        "timeout": 3,
+        "connection": 3,
+    }
+
+    def __init__(
+        self,
+        max_retries: dict[str, int] = None,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ) -> None:
+        """
+        :param max_retries: The number of retries for each class of error, merged with default_max_retries
+        :param base_delay: The upper bound of the delay before the first retry in seconds
+        :param max_delay: The upper bound of the delay before any retry in seconds, also caps Retry-After
+        """
+
+        self.max_retries: dict[str, int] = {
+            **self.default_max_retries,
+            **(max_retries or {}),
+        }
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.retries: dict[str, int] = {}
+
+    def classify(self, error: Exception) -> str:
+        """
+        Determines the class of an error for deciding whether and how often it is retried
+
+        :param error: The error raised by the request
+        :return: The class of the error, or None if the error shouldn't be retried
+        """
+
+        if isinstance(error, ResponseStatusError):
+            if error.status == 429:
+                return "rate_limited"
+            elif 500 <= error.status < 600:
+                return "server_error"
+            else:
+                return None
+        elif isinstance(error, asyncio.TimeoutError):
+            return "timeout"
+        elif isinstance(
+            error,
+            (
+                aiohttp.ClientConnectionError,
+                aiohttp.ClientPayloadError,
+                ConnectionError,
+            ),
+        ):
+            return "connection"
+        else:
+            return None
+
+    def get_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Calculates how long to wait before retrying after an error
+
+        :param error: The error raised by the request
+        :param attempt: The number of retries made so far
+        :return: The number of seconds to wait
+        """
+
+        retry_after: float = getattr(error, "retry_after", None)
+
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        on_retry: Callable[[str], None] = None,
+    ) -> T:
+        """
+        Makes the request, retrying it while it fails with an error that has retries left
+
+        :param request: A function that makes the request each time it is called
+        :param on_retry: Called with the class of the error before every retry
+        :return: The result of the first successful attempt
+        """
+
+        attempt: int = 0
+
+        while True:
+            try:
+                return await request()
+            except Exception as e:
+                error_class: str = self.classify(e)
+
+                if error_class is None or attempt >= self.max_retries.get(
+                    error_class, 0
+                ):
+                    raise
+
+                self.retries[error_class] = self.retries.get(error_class, 0) + 1
+                metrics_service.increment("retries_total", error=error_class)
+
+                if on_retry is not None:
+                    on_retry(error_class)
+
+                await asyncio.sleep(self.get_delay(e, attempt))
+                attempt += 1
@@ -1,26 +1,81 @@
 import aiohttp
+import os
 
 
 class SessionManager:
-    _session: aiohttp.ClientSession = None
+    """
+    Keeps one aiohttp.ClientSession per profile. API requests and image downloads go to different hosts with
+    different needs, so each profile has its own connection pool, keep-alive and timeouts, and resolved hosts
+    are cached for minutes instead of aiohttp's default of seconds so repeated requests skip DNS lookups and
+    TLS handshakes.
+    """
+
+    # The limit and limit_per_host of the connection pool, how long resolved hosts are cached and idle
+    # connections are kept open, and the total, connect and sock_read timeouts in seconds of each profile
+    profiles: dict[str, dict] = {
+        "api": {
+            "limit": int(os.getenv("MANGADEX_API_CONNECTIONS") or 16),
+            "limit_per_host": int(os.getenv("MANGADEX_API_CONNECTIONS_PER_HOST") or 8),
+            "ttl_dns_cache": int(os.getenv("MANGADEX_DNS_CACHE_TTL") or 300),
+            "keepalive_timeout": 60,
+            "total": 60,
+            "connect": 10,
+            "sock_read": 30,
+        },
+        "images": {
+            "limit": int(os.getenv("MANGADEX_IMAGE_CONNECTIONS") or 64),
+            "limit_per_host": int(
+                os.getenv("MANGADEX_IMAGE_CONNECTIONS_PER_HOST") or 16
+            ),
+            "ttl_dns_cache": int(os.getenv("MANGADEX_DNS_CACHE_TTL") or 300),
+            "keepalive_timeout": 30,
+            # Image requests set their own total timeout
+            "total": None,
+            "connect": 10,
+            "sock_read": 30,
+        },
+    }
+    _sessions: dict[str, aiohttp.ClientSession] = {}
 
     @staticmethod
-    def create_session() -> aiohttp.ClientSession:
+    def create_session(profile: str = "api") -> aiohttp.ClientSession:
         """
-        Creates a new aiohttp.ClientSession if one does not already exist
+        Creates a new aiohttp.ClientSession for the profile if one does not already exist
+
+        :param profile: The name of the profile, either "api" or "images"
+        :return: The session of the profile
         """
 
-        if SessionManager._session is None:
-            SessionManager._session = aiohttp.ClientSession()
+        if profile not in SessionManager.profiles:
+            raise ValueError(f"Unknown session profile: {profile}")
 
-        return SessionManager._session
+        if SessionManager._sessions.get(profile) is None:
+            settings: dict = SessionManager.profiles[profile]
+            connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+                limit=settings["limit"],
+                limit_per_host=settings["limit_per_host"],
+                ttl_dns_cache=settings["ttl_dns_cache"],
+                keepalive_timeout=settings["keepalive_timeout"],
+            )
+            timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+                total=settings["total"],
+                connect=settings["connect"],
+                sock_read=settings["sock_read"],
+            )
+            SessionManager._sessions[profile] = aiohttp.ClientSession(
+                connector=connector, timeout=timeout
+            )
+
+        return SessionManager._sessions[profile]
 
     @staticmethod
     async def close_session() -> None:
         """
-        Closes the aiohttp.ClientSession if one exists
+        Closes the aiohttp.ClientSession of every profile
         """
 
-        if SessionManager._session is not None:
-            await SessionManager._session.close()
-            SessionManager._session = None
+        for profile in list(SessionManager._sessions):
+            session: aiohttp.ClientSession = SessionManager._sessions.pop(profile)
+
+            if session is not None:
+                await session.close()
@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import time
+from .file_access_service import get_cache_directory
+
+
+class SyncState:
+    """
+    Remembers, for every synced series, which chapters have already been exported and when the most recently
+    updated chapter of its feed was updated, so a sync only asks the API for the chapters updated since and
+    only downloads the ones that haven't been exported yet.
+    """
+
+    def __init__(self, directory: str = None) -> None:
+        """
+        :param directory: The directory to store the state in, defaults to get_cache_directory("sync")
+        """
+
+        self.directory: str = directory or get_cache_directory("sync")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            os.path.join(self.directory, "sync.sqlite3")
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS series (
+                manga_id TEXT PRIMARY KEY,
+                languages TEXT NOT NULL,
+                updated_at TEXT,
+                synced_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS exported (
+                manga_id TEXT NOT NULL,
+                chapter_id TEXT NOT NULL,
+                PRIMARY KEY (manga_id, chapter_id)
+            );
+            """
+        )
+        self._connection.commit()
+
+    def get_series(self, manga_id: str) -> dict:
+        """
+        :param manga_id: The id of the manga
+        :return: A dictionary containing the languages the series is synced in, the latest updatedAt seen in its
+        feed and the ids of its exported chapters, or None if the series has never been synced
+        """
+
+        row: tuple = self._connection.execute(
+            "SELECT languages, updated_at FROM series WHERE manga_id = ?", (manga_id,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        languages, updated_at = row
+
+        return {
+            "manga_id": manga_id,
+            "languages": json.loads(languages),
+            "updated_at": updated_at,
+            "exported": {
+                chapter_id
+                for (chapter_id,) in self._connection.execute(
+                    "SELECT chapter_id FROM exported WHERE manga_id = ?", (manga_id,)
+                )
+            },
+        }
+
+    def list_series(self) -> list[str]:
+        """
+        :return: The ids of every synced series, in the order they were first synced
+        """
+
+        return [
+            manga_id
+            for (manga_id,) in self._connection.execute(
+                "SELECT manga_id FROM series ORDER BY rowid"
+            )
+        ]
+
+    def mark_exported(self, manga_id: str, chapter_ids: list[str]) -> None:
+        """
+        Records chapters of a series as exported
+
+        :param manga_id: The id of the manga
+        :param chapter_ids: The ids of the exported chapters
+        """
+
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO exported VALUES (?, ?)",
+            [(manga_id, chapter_id) for chapter_id in chapter_ids],
+        )
+        self._connection.commit()
+
+    def record_sync(
+        self, manga_id: str, languages: list[str], updated_at: str = None
+    ) -> None:
+        """
+        Records a sync of a series, moving its latest updatedAt forward if a later one is given
+
+        :param manga_id: The id of the manga
+        :param languages: The languages the series was synced in
+        :param updated_at: The latest updatedAt of the chapters the sync saw, if any
+        """
+
+        self._connection.execute(
+            """
+            INSERT INTO series VALUES (?, ?, ?, ?)
+            ON CONFLICT (manga_id) DO UPDATE SET
+                languages = excluded.languages,
+                updated_at = NULLIF(MAX(COALESCE(updated_at, ''), COALESCE(excluded.updated_at, '')), ''),
+                synced_at = excluded.synced_at
+            """,
+            (manga_id, json.dumps(languages), updated_at, time.time()),
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database of the state
+        """
+
+        self._connection.close()
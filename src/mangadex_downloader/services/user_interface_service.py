@@ -1,4 +1,16 @@
+import asyncio
 import curses
+import os
+import time
+from .chapter_progress import ChapterProgress
+from .download_pipeline import DownloadPipeline
+
+# The number of seconds between redraws of the download progress, however often it changes
+progress_refresh_interval: float = float(
+    os.getenv("MANGADEX_UI_REFRESH_INTERVAL") or 0.25
+)
+# The number of seconds between checks for keys pressed while downloading
+key_poll_interval: float = 0.02
 
 
 def prompt_user_input(stdscr: curses, message: str) -> str:
@@ -230,3 +242,206 @@ def prompt_list_multi_selection(
             return None
         else:
             continue
+
+
+def format_size(size: float) -> str:
+    """
+    :param size: A number of bytes
+    :return: The number formatted with the largest unit it is at least one of, like "1.5 MB"
+    """
+
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+        size /= 1024
+
+    return f"{size:.1f} GB"
+
+
+def format_duration(seconds: float) -> str:
+    """
+    :param seconds: A number of seconds
+    :return: The number formatted as minutes and seconds, like "2:05", or hours, minutes and seconds
+    """
+
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+def format_chapter_progress(progress: ChapterProgress) -> str:
+    """
+    :param progress: The ChapterProgress of a chapter
+    :return: A line describing the progress of the chapter: its state, pages, throughput, retries and ETA
+    """
+
+    pages: str = (
+        f"{progress.pages_done}/{progress.pages_total}"
+        if progress.pages_total is not None
+        else "-"
+    )
+    rate: float = progress.bytes_per_second
+    eta: float = progress.eta
+
+    return (
+        f'{progress.chapter["chapter_number"]:>7} {progress.state:<11} {pages:>9} '
+        f'{format_size(rate) + "/s" if rate else "-":>11} {progress.retries:>3} retries '
+        f'{"ETA " + format_duration(eta) if eta is not None else "":<11} '
+        f'{progress.chapter["title"] or ""}'
+    )
+
+
+def display_download_progress(
+    stdscr: curses,
+    title: str,
+    progress_list: list[ChapterProgress],
+    current_index: int,
+    elapsed: float,
+) -> None:
+    """
+    Displays the progress of every chapter being downloaded, with the chapter at the current index highlighted
+
+    :param stdscr: The curses object
+    :param title: The title of the manga being downloaded
+    :param progress_list: The ChapterProgress of every chapter
+    :param current_index: The index of the highlighted chapter
+    :param elapsed: The number of seconds the download has been running for
+    """
+
+    height, width = stdscr.getmaxyx()
+    page_size: int = max(1, height - 4)
+    page_start: int = (current_index // page_size) * page_size
+    page_end: int = min(page_start + page_size, len(progress_list))
+
+    finished: int = sum(
+        progress.state in ChapterProgress.states[3:] for progress in progress_list
+    )
+    pages_done: int = sum(progress.pages_done for progress in progress_list)
+    received: int = sum(progress.bytes for progress in progress_list)
+
+    def add_line(y: int, text: str, attributes: int = 0) -> None:
+        # Lines past the edge of the terminal are cut instead of raising
+        if y < height:
+            stdscr.addnstr(y, 0, text, max(0, width - 1), attributes)
+
+    stdscr.erase()
+
+    try:
+        # Display the header
+        add_line(
+            0,
+            f"Downloading {title}: {finished}/{len(progress_list)} chapters, {pages_done} pages, "
+            f"{format_size(received / elapsed if elapsed else 0)}/s",
+            curses.color_pair(1),
+        )
+
+        # Display the progress of each chapter
+        for i in range(page_start, page_end):
+            line: str = format_chapter_progress(progress_list[i])
+
+            if i == current_index:
+                add_line(i - page_start + 2, "> ", curses.color_pair(2))
+                stdscr.addnstr(line, max(0, width - 3), curses.A_REVERSE)
+            else:
+                add_line(
+                    i - page_start + 2,
+                    f"  {line}",
+                    (
+                        curses.color_pair(1)
+                        if progress_list[i].state in ("failed", "cancelled")
+                        else 0
+                    ),
+                )
+
+        # Display the footer
+        add_line(
+            page_end - page_start + 2,
+            f"{page_start + 1}-{page_end} of {len(progress_list)} chapters",
+            curses.color_pair(1),
+        )
+
+        # Display the keys last, since they are the first thing cut off by a narrow terminal
+        add_line(1, "Use ", curses.color_pair(1))
+        stdscr.addstr("↑/↓", curses.color_pair(4))
+        stdscr.addstr(" for navigation, ", curses.color_pair(1))
+        stdscr.addstr("→", curses.color_pair(4))
+        stdscr.addstr(" to download next, ", curses.color_pair(1))
+        stdscr.addstr("DEL", curses.color_pair(4))
+        stdscr.addstr(" to cancel, ", curses.color_pair(1))
+        stdscr.addstr("ESC", curses.color_pair(4))
+        stdscr.addstr(" to cancel all.", curses.color_pair(1))
+    except curses.error:
+        # The terminal is too small to fit everything
+        pass
+
+    stdscr.refresh()
+
+
+async def show_download_progress(
+    stdscr: curses,
+    pipeline: DownloadPipeline,
+    title: str,
+    refresh_interval: float = None,
+) -> None:
+    """
+    Displays the live progress of every chapter of a download pipeline until cancelled, as a task on the same
+    event loop as the downloads. Keys are read without blocking the loop, and the progress is redrawn at most
+    once per refresh interval however often it changes, or right away after a key press. The highlighted
+    chapter can be downloaded next or cancelled, and ESC cancels every chapter that didn't start converting.
+
+    :param stdscr: The curses object
+    :param pipeline: The DownloadPipeline to display and control, which should be running
+    :param title: The title of the manga being downloaded
+    :param refresh_interval: The number of seconds between redraws, defaults to progress_refresh_interval
+    """
+
+    refresh_interval = refresh_interval or progress_refresh_interval
+    current_index: int = 0
+    start: float = time.monotonic()
+    last_draw: float = None
+
+    stdscr.nodelay(True)
+
+    try:
+        while True:
+            pressed: bool = False
+            key: int = stdscr.getch()
+
+            while key != -1:
+                pressed = True
+
+                if key == curses.KEY_UP:
+                    current_index = max(current_index - 1, 0)
+                elif key == curses.KEY_DOWN:
+                    current_index = min(current_index + 1, len(pipeline.chapters) - 1)
+                elif key == curses.KEY_RIGHT:
+                    pipeline.prioritize(current_index)
+                elif key in [curses.KEY_DC, ord("\b"), curses.KEY_BACKSPACE, 127]:
+                    await pipeline.cancel(current_index)
+                elif key == 27:
+                    for i in range(len(pipeline.chapters)):
+                        await pipeline.cancel(i)
+
+                key = stdscr.getch()
+
+            now: float = time.monotonic()
+
+            if pressed or last_draw is None or now - last_draw >= refresh_interval:
+                display_download_progress(
+                    stdscr, title, pipeline.progress, current_index, now - start
+                )
+                last_draw = now
+
+            await asyncio.sleep(key_poll_interval)
+    finally:
+        # Leave the final progress on screen
+        display_download_progress(
+            stdscr,
+            title,
+            pipeline.progress,
+            current_index,
+            time.monotonic() - start,
+        )
+        stdscr.nodelay(False)
@@ -0,0 +1,96 @@
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import patch
+from src.mangadex_downloader.services.api_access_service import *
+from tests.mock_data import *
+
+
+class StubAtHomeNetwork:
+    """
+    A local stand-in for the at-home server endpoint, two MangaDex@Home nodes and the report endpoint. The first
+    node handed out fails every request and the second one serves every page.
+    """
+
+    def __init__(self) -> None:
+        self.server_requests: int = 0
+        self.page_requests: dict[str, list[str]] = {"dead": [], "healthy": []}
+        self.reports: list[dict] = []
+        self.app: web.Application = web.Application()
+        self.app.router.add_get("/at-home/server/{chapter_id}", self.at_home_server)
+        self.app.router.add_get("/{node}/data/{hash}/{file}", self.page)
+        self.app.router.add_post("/report", self.report)
+        self.server: TestServer = TestServer(self.app)
+
+    async def at_home_server(self, request: web.Request) -> web.Response:
+        node: str = "dead" if self.server_requests == 0 else "healthy"
+        self.server_requests += 1
+
+        return web.json_response(
+            {
+                **mock_download_resource_data,
+                "baseUrl": str(self.server.make_url(f"/{node}")),
+            }
+        )
+
+    async def page(self, request: web.Request) -> web.Response:
+        node: str = request.match_info["node"]
+        self.page_requests[node].append(request.match_info["file"])
+
+        if node == "dead":
+            return web.Response(status=503)
+
+        return web.Response(
+            body=request.match_info["file"].encode(), headers={"X-Cache": "HIT"}
+        )
+
+    async def report(self, request: web.Request) -> web.Response:
+        self.reports.append(await request.json())
+
+        return web.json_response({"result": "ok"})
+
+
+@pytest.fixture
+async def stub_network():
+    network: StubAtHomeNetwork = StubAtHomeNetwork()
+    await network.server.start_server()
+
+    with patch(
+        "src.mangadex_downloader.services.api_access_service.mangadex_resource_links_url",
+        str(network.server.make_url("/at-home/server")),
+    ), patch(
+        "src.mangadex_downloader.services.api_access_service.mangadex_report_url",
+        str(network.server.make_url("/report")),
+    ):
+        yield network
+
+    await network.server.close()
+
+
+class TestAtHomeFailover:
+    async def test_failed_node_is_replaced_and_pages_are_reported(
+        self, stub_network: StubAtHomeNetwork
+    ):
+        async with aiohttp.ClientSession() as session:
+            response: list[bytes] = await retrieve_chapter_image_data(
+                session, mock_chapter_id, FetchScheduler(4, 4, 4)
+            )
+
+        files: list[str] = mock_download_resource_data["chapter"]["data"]
+
+        assert response == [file.encode() for file in files]
+        assert stub_network.server_requests == 2
+        assert sorted(stub_network.page_requests["healthy"]) == files
+        assert len(stub_network.page_requests["dead"]) >= at_home_error_threshold
+
+        failures: list[dict] = [r for r in stub_network.reports if not r["success"]]
+        successes: list[dict] = [r for r in stub_network.reports if r["success"]]
+
+        assert (
+            at_home_error_threshold
+            <= len(failures)
+            <= len(stub_network.page_requests["dead"])
+        )
+        assert sorted(r["url"].split("/")[-1] for r in successes) == files
+        assert all(r["cached"] and r["bytes"] > 0 for r in successes)
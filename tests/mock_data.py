@@ -63,6 +63,7 @@ mock_chapter_data: dict = {
         {
             "id": "1",
             "attributes": {
+                "volume": "1",
                 "title": "Chapter 1",
                 "chapter": "1",
             },
@@ -71,6 +72,7 @@ mock_chapter_data: dict = {
         {
             "id": "6",
             "attributes": {
+                "volume": "1",
                 "title": "Chapter 1",
                 "chapter": "1",
             },
@@ -79,6 +81,7 @@ mock_chapter_data: dict = {
         {
             "id": "2",
             "attributes": {
+                "volume": "1",
                 "title": "Chapter 2",
                 "chapter": "2",
             },
@@ -87,6 +90,7 @@ mock_chapter_data: dict = {
         {
             "id": "3",
             "attributes": {
+                "volume": "2",
                 "chapter": "3",
             },
             "uploadDate": "2022-01-03T00:00:00.000Z",
@@ -111,21 +115,25 @@ mock_processed_chapter_data: list[dict] = [
         "title": "Chapter 4",
         "id": "4",
         "chapter_number": "0",
+        "volume": None,
     },
     {
         "title": "Chapter 1",
         "id": "1",
         "chapter_number": "1",
+        "volume": "1",
     },
     {
         "title": "Chapter 2",
         "id": "2",
         "chapter_number": "2",
+        "volume": "1",
     },
     {
         "title": None,
         "id": "3",
         "chapter_number": "3",
+        "volume": "2",
     },
 ]
 
@@ -139,6 +147,12 @@ mock_download_resource_data: dict = {
             "chapter3.jpg",
             "chapter4.jpg",
         ],
+        "dataSaver": [
+            "chapter1.jpg",
+            "chapter2.jpg",
+            "chapter3.jpg",
+            "chapter4.jpg",
+        ],
     },
 }
 mock_processed_download_resource_data: list[str] = [
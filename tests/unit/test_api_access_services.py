@@ -1,3 +1,6 @@
+import asyncio
+import threading
+import time
 import pytest
 import aiohttp
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -12,6 +15,7 @@ def create_mock_response(
     mock_response.status = status
     mock_response.json = AsyncMock(return_value=json_data)
     mock_response.read = AsyncMock(return_value=bytes_data)
+    mock_response.headers = {}
 
     return mock_response
 
@@ -82,6 +86,31 @@ class TestRetrieveMangas:
         assert mock_fetch.call_args[0][1].endswith(f"?title={mock_query}")
 
 
+class TestRetrieveManga:
+    dummy_session: aiohttp.ClientSession = create_mock_session(
+        create_mock_response(200, "dummy data")
+    )
+
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.fetch",
+        return_value={"data": mock_manga_data["data"][0]},
+    )
+    async def test_retrieve_manga_success_returns_json(self, mock_fetch: AsyncMock):
+        response: dict = await retrieve_manga(self.dummy_session, mock_manga_id)
+
+        assert response == {"data": mock_manga_data["data"][0]}
+        assert mock_fetch.call_args[0][1].endswith(f"/{mock_manga_id}")
+
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.fetch",
+        side_effect=Exception("Error fetching url"),
+    )
+    async def test_retrieve_manga_failure_returns_none(self, mock_fetch: AsyncMock):
+        response: dict = await retrieve_manga(self.dummy_session, mock_manga_id)
+
+        assert response is None
+
+
 class TestRetrieveChapters:
     dummy_session: aiohttp.ClientSession = create_mock_session(
         create_mock_response(200, "dummy data")
@@ -99,6 +128,20 @@ class TestRetrieveChapters:
         assert mock_fetch.call_args[0][0] == self.dummy_session
         assert mock_fetch.call_args[0][1].endswith(f"/{mock_manga_id}/feed")
 
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.fetch",
+        return_value=mock_chapter_data,
+    )
+    async def test_retrieve_chapters_requests_languages_and_updates_since(
+        self, mock_fetch: AsyncMock
+    ):
+        await retrieve_chapters(
+            self.dummy_session, mock_manga_id, ["fr"], "2024-01-01T00:00:00"
+        )
+
+        assert mock_fetch.call_args[0][2]["translatedLanguage[]"] == ["fr"]
+        assert mock_fetch.call_args[0][2]["updatedAtSince"] == "2024-01-01T00:00:00"
+
     @patch(
         "src.mangadex_downloader.services.api_access_service.fetch",
         side_effect=Exception("Error fetching url"),
@@ -111,6 +154,56 @@ class TestRetrieveChapters:
         assert mock_fetch.call_args[0][0] == self.dummy_session
         assert mock_fetch.call_args[0][1].endswith(f"/{mock_manga_id}/feed")
 
+    @patch("src.mangadex_downloader.services.api_access_service.fetch")
+    async def test_retrieve_chapters_retrieves_every_page_of_the_feed(
+        self, mock_fetch: AsyncMock
+    ):
+        feed: list[dict] = [{"id": str(i)} for i in range(1200)]
+        mock_fetch.side_effect = lambda session, url, params: {
+            "result": "ok",
+            "data": feed[params.get("offset", 0) :][: params["limit"]],
+            "limit": params["limit"],
+            "offset": params.get("offset", 0),
+            "total": len(feed),
+        }
+        response: dict = await retrieve_chapters(self.dummy_session, mock_manga_id)
+
+        assert response["data"] == feed
+        assert response["total"] == len(feed)
+        assert [
+            call.args[2].get("offset", 0) for call in mock_fetch.call_args_list
+        ] == [
+            0,
+            500,
+            1000,
+        ]
+
+    @patch("src.mangadex_downloader.services.api_access_service.fetch")
+    async def test_retrieve_chapters_stops_at_the_maximum_offset(
+        self, mock_fetch: AsyncMock
+    ):
+        mock_fetch.side_effect = lambda session, url, params: {
+            "data": [{"id": str(params.get("offset", 0))}],
+            "total": 25000,
+        }
+        response: dict = await retrieve_chapters(self.dummy_session, mock_manga_id)
+
+        assert mock_fetch.call_count == max_feed_offset // feed_page_size
+        assert len(response["data"]) == mock_fetch.call_count
+
+    @patch("src.mangadex_downloader.services.api_access_service.fetch")
+    async def test_retrieve_chapters_failure_of_a_later_page_returns_none(
+        self, mock_fetch: AsyncMock
+    ):
+        mock_fetch.side_effect = [
+            {"data": [], "total": 1200},
+            {"data": []},
+            Exception("Error fetching url"),
+        ]
+        response: dict = await retrieve_chapters(self.dummy_session, mock_manga_id)
+
+        assert response is None
+
 
 class TestRetrieveDownloadResources:
     dummy_session: aiohttp.ClientSession = create_mock_session(
@@ -174,3 +267,769 @@ class TestRetrieveImageData:
             response: bytes = await retrieve_image_data(mock_session, mock_url)
 
             assert response is None
+
+
+class TestRetrieveChapterImageData:
+    dummy_session: aiohttp.ClientSession = create_mock_session(
+        create_mock_response(200, "dummy data")
+    )
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_success_returns_image_data_list(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        mock_retrieve.side_effect = lambda session, url, *args, **kwargs: url.encode()
+        response: list[bytes] = await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id
+        )
+
+        assert response == [
+            url.encode() for url in mock_processed_download_resource_data
+        ]
+        mock_retrieve_download_resources.assert_called_once_with(
+            self.dummy_session, mock_chapter_id
+        )
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=None,
+    )
+    async def test_retrieve_chapter_image_data_failure_returns_none(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        response: list[bytes] = await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id
+        )
+
+        assert response is None
+        mock_retrieve.assert_not_called()
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources"
+    )
+    async def test_retrieve_chapter_image_data_requests_a_new_node_for_missing_pages(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        mock_retrieve_download_resources.side_effect = [
+            mock_download_resource_data,
+            {**mock_download_resource_data, "baseUrl": "https://otherCDN.com"},
+        ]
+
+        async def retrieve(
+            session: aiohttp.ClientSession, url: str, *args, **kwargs
+        ) -> bytes:
+            if url.endswith("chapter2.jpg") and url.startswith("https://mangaCDN.com"):
+                raise ResponseStatusError("Failed to retrieve image data", 404)
+            return url.encode()
+
+        mock_retrieve.side_effect = retrieve
+        response: list[bytes] = await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id
+        )
+
+        assert response[1] == b"https://otherCDN.com/data/hash/chapter2.jpg"
+        assert response[0] == mock_processed_download_resource_data[0].encode()
+        assert [call.args[1] for call in mock_retrieve.call_args_list][4:] == [
+            "https://otherCDN.com/data/hash/chapter2.jpg"
+        ]
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_retrieves_pages_with_the_image_session(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        image_session: aiohttp.ClientSession = MagicMock()
+        mock_retrieve.side_effect = lambda session, url, *args, **kwargs: url.encode()
+        await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id, image_session=image_session
+        )
+
+        mock_retrieve_download_resources.assert_called_once_with(
+            self.dummy_session, mock_chapter_id
+        )
+        assert all(
+            call.args[0] is image_session for call in mock_retrieve.call_args_list
+        )
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_reports_each_page_as_it_arrives(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        async def retrieve(
+            session: aiohttp.ClientSession, url: str, *args, **kwargs
+        ) -> bytes:
+            if url.endswith("chapter2.jpg"):
+                raise ResponseStatusError("Failed to retrieve image data", 404)
+            return url.encode()
+
+        mock_retrieve.side_effect = retrieve
+        on_page: MagicMock = MagicMock()
+        await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id, on_page=on_page
+        )
+
+        assert sorted(call.args[0] for call in on_page.call_args_list) == [
+            i for i in range(len(mock_processed_download_resource_data)) if i != 1
+        ]
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_records_the_pages_in_the_progress(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        async def retrieve(
+            session: aiohttp.ClientSession, url: str, *args, **kwargs
+        ) -> bytes:
+            if url.endswith("chapter2.jpg"):
+                raise ResponseStatusError("Failed to retrieve image data", 404)
+            return url.encode()
+
+        mock_retrieve.side_effect = retrieve
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+        await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id, progress=progress
+        )
+
+        assert progress.pages_total == len(mock_processed_download_resource_data)
+        assert progress.pages_done == progress.pages_total - 1
+        assert all(
+            call.kwargs["progress"] is progress for call in mock_retrieve.call_args_list
+        )
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_retrieves_data_saver_pages(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        mock_retrieve.side_effect = lambda session, url, *args, **kwargs: url.encode()
+        response: list[bytes] = await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id, quality="data-saver"
+        )
+
+        assert response == [
+            url.replace("/data/", "/data-saver/").encode()
+            for url in mock_processed_download_resource_data
+        ]
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_auto_quality_uses_the_selector(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        mock_retrieve.side_effect = lambda session, url, *args, **kwargs: url.encode()
+        selector: QualitySelector = QualitySelector(target_size=1)
+
+        with patch(
+            "src.mangadex_downloader.services.api_access_service.quality_selector",
+            selector,
+        ):
+            response: list[bytes] = await retrieve_chapter_image_data(
+                self.dummy_session, mock_chapter_id, quality="auto"
+            )
+
+        assert all(b"/data-saver/" in page for page in response)
+
+    async def test_retrieve_chapter_image_data_unknown_quality_raises_exception(self):
+        with pytest.raises(ValueError):
+            await retrieve_chapter_image_data(
+                self.dummy_session, mock_chapter_id, quality="dataSaver"
+            )
+
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_image_data",
+        side_effect=ResponseStatusError("Failed to retrieve image data", 500),
+    )
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_gives_up_after_max_refreshes(
+        self, mock_retrieve_download_resources: AsyncMock, mock_retrieve: AsyncMock
+    ):
+        response: list[bytes] = await retrieve_chapter_image_data(
+            self.dummy_session, mock_chapter_id
+        )
+
+        assert response is None
+        assert mock_retrieve_download_resources.call_count == max_at_home_refreshes + 1
+
+
+class TestAtHomeNode:
+    def create_node(self, latency_threshold: float = 1, error_threshold: int = 2):
+        mock_session: MagicMock = MagicMock()
+        mock_session.post.return_value.__aenter__.return_value = AsyncMock()
+        mock_session.post.return_value.__aexit__.return_value = False
+
+        return AtHomeNode(
+            mock_session,
+            "https://mangaCDN.com",
+            latency_threshold,
+            error_threshold,
+            "https://report.test/report",
+        )
+
+    async def test_record_reports_each_request(self):
+        node: AtHomeNode = self.create_node()
+        node.record(mock_processed_download_resource_data[0], True, 1000, 0.25, True)
+        await node.flush_reports()
+
+        node.session.post.assert_called_once_with(
+            "https://report.test/report",
+            json={
+                "url": mock_processed_download_resource_data[0],
+                "success": True,
+                "bytes": 1000,
+                "duration": 250,
+                "cached": True,
+            },
+        )
+        assert node.healthy
+
+    async def test_record_does_not_report_mangadex_servers(self):
+        node: AtHomeNode = self.create_node()
+        node.record(
+            "https://uploads.mangadex.org/data/hash/1.jpg", True, 10, 0.1, False
+        )
+        await node.flush_reports()
+
+        node.session.post.assert_not_called()
+
+    async def test_record_marks_node_unhealthy_after_failed_or_slow_requests(self):
+        node: AtHomeNode = self.create_node(latency_threshold=1, error_threshold=2)
+        node.record(mock_url, True, 10, 0.5, False)
+        node.record(mock_url, False, 0, 0.5, False)
+
+        assert node.healthy
+
+        node.record(mock_url, True, 10, 5, False)
+        await asyncio.wait_for(node.wait_unhealthy(), 1)
+        await node.flush_reports()
+
+        assert not node.healthy
+
+    async def test_record_ignores_report_failures(self):
+        node: AtHomeNode = self.create_node()
+        node.session.post.side_effect = Exception("No response from API")
+        node.record(mock_url, True, 10, 0.1, False)
+        await node.flush_reports()
+
+        assert node.healthy
+
+
+class TestFetchScheduler:
+    async def run_requests(
+        self, scheduler: FetchScheduler, requests: list[tuple[str, str]]
+    ) -> tuple[list[tuple[str, str]], int]:
+        started: list[tuple[str, str]] = []
+        peak: list[int] = [0]
+
+        async def make_request(url: str, chapter_id: str) -> None:
+            async with scheduler.request(url, chapter_id):
+                started.append((url, chapter_id))
+                peak[0] = max(peak[0], scheduler.active)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*[make_request(*request) for request in requests])
+
+        return started, peak[0]
+
+    async def test_request_limits_requests_in_flight_globally(self):
+        scheduler: FetchScheduler = FetchScheduler(2, 10, 10)
+        started, peak = await self.run_requests(
+            scheduler, [(url, str(i)) for i, url in enumerate(mock_url_list)]
+        )
+
+        assert len(started) == len(mock_url_list)
+        assert peak == 2
+        assert scheduler.active == 0
+        assert scheduler.waiting == 0
+
+    async def test_request_limits_requests_in_flight_per_host(self):
+        scheduler: FetchScheduler = FetchScheduler(10, 1, 10)
+        started, peak = await self.run_requests(
+            scheduler, [(url, str(i)) for i, url in enumerate(mock_url_list)]
+        )
+
+        assert len(started) == len(mock_url_list)
+        assert peak == 1
+
+    async def test_request_limits_requests_in_flight_per_chapter(self):
+        scheduler: FetchScheduler = FetchScheduler(10, 10, 3)
+        started, peak = await self.run_requests(
+            scheduler, [(url, mock_chapter_id) for url in mock_url_list]
+        )
+
+        assert len(started) == len(mock_url_list)
+        assert peak == 3
+
+    async def test_request_takes_turns_between_chapters(self):
+        scheduler: FetchScheduler = FetchScheduler(1, 10, 10)
+        requests: list[tuple[str, str]] = [(url, "large") for url in mock_url_list]
+        requests.append(("https://test.com/small.jpg", "small"))
+        started, peak = await self.run_requests(scheduler, requests)
+
+        assert started[:2] == [(mock_url_list[0], "large"), requests[-1]]
+
+    async def test_request_cancelled_while_waiting_frees_its_place(self):
+        scheduler: FetchScheduler = FetchScheduler(1, 10, 10)
+
+        async def make_request() -> None:
+            async with scheduler.request(mock_url, mock_chapter_id):
+                pass
+
+        async with scheduler.request(mock_url, mock_chapter_id):
+            waiting_task: asyncio.Task = asyncio.create_task(make_request())
+            await asyncio.sleep(0)
+            assert scheduler.waiting == 1
+
+            waiting_task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting_task
+
+        assert scheduler.active == 0
+        assert scheduler.waiting == 0
+
+
+class TestRetrieveImageDataWithScheduler:
+    async def test_retrieve_image_data_waits_for_the_scheduler(self):
+        mock_response: AsyncMock = create_mock_response(
+            200, mock_manga_data, mock_image_data
+        )
+        mock_session: aiohttp.ClientSession = create_mock_session(mock_response)
+        scheduler: FetchScheduler = FetchScheduler(1, 1, 1)
+
+        async with scheduler.request(mock_url, mock_chapter_id):
+            task: asyncio.Task = asyncio.create_task(
+                retrieve_image_data(mock_session, mock_url, scheduler, mock_chapter_id)
+            )
+            await asyncio.sleep(0)
+
+            assert not task.done()
+            assert mock_session.get.call_count == 0
+
+        assert await task == mock_image_data
+        assert scheduler.active == 0
+
+
+def create_mock_session_with_responses(
+    mock_responses: list[AsyncMock],
+) -> aiohttp.ClientSession:
+    mock_session = MagicMock()
+    mock_session.get.return_value.__aenter__.side_effect = mock_responses
+    mock_session.get.return_value.__aexit__.return_value = False
+
+    return mock_session
+
+
+class TestRetries:
+    retry_policy: RetryPolicy = RetryPolicy(base_delay=0)
+
+    async def test_fetch_retries_server_errors(self):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_response(503, {}),
+                create_mock_response(429, {}),
+                create_mock_response(200, mock_manga_data),
+            ]
+        )
+        response: dict = await fetch(
+            mock_session, mock_url, retry_policy=self.retry_policy
+        )
+
+        assert response == mock_manga_data
+        assert mock_session.get.call_count == 3
+
+    async def test_fetch_raises_status_error_for_client_errors(self):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(404, {})]
+        )
+
+        with pytest.raises(ResponseStatusError) as e:
+            await fetch(mock_session, mock_url, retry_policy=self.retry_policy)
+
+        assert e.value.status == 404
+        assert mock_session.get.call_count == 1
+
+    async def test_retrieve_image_data_retries_only_the_failed_page(self):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_response(200, {}, mock_image_data_list[0]),
+                create_mock_response(502, {}),
+                create_mock_response(200, {}, mock_image_data_list[1]),
+            ]
+        )
+        response: list[bytes] = [
+            await retrieve_image_data(mock_session, url, retry_policy=self.retry_policy)
+            for url in mock_url_list[:2]
+        ]
+
+        assert response == mock_image_data_list[:2]
+        assert [call.args[0] for call in mock_session.get.call_args_list] == [
+            mock_url_list[0],
+            mock_url_list[1],
+            mock_url_list[1],
+        ]
+
+    async def test_retrieve_image_data_records_bytes_and_retries_in_the_progress(
+        self,
+    ):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_response(502, {}),
+                create_mock_response(200, {}, mock_image_data_list[0]),
+            ]
+        )
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+        await retrieve_image_data(
+            mock_session, mock_url, retry_policy=self.retry_policy, progress=progress
+        )
+
+        assert progress.retries == 1
+        assert progress.bytes == len(mock_image_data_list[0])
+
+    async def test_retrieve_image_data_releases_scheduler_slot_between_retries(
+        self,
+    ):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(500, {}), create_mock_response(200, {})]
+        )
+        scheduler: FetchScheduler = FetchScheduler(1, 1, 1)
+        active_during_sleep: list[int] = []
+
+        async def sleep(delay: float) -> None:
+            active_during_sleep.append(scheduler.active)
+
+        with patch("asyncio.sleep", side_effect=sleep):
+            await retrieve_image_data(
+                mock_session, mock_url, scheduler, mock_chapter_id, self.retry_policy
+            )
+
+        assert active_during_sleep == [0]
+
+
+class TestFetchWithCache:
+    url: str = f"{mock_url}/manga"
+
+    async def test_fetch_stores_responses_and_serves_fresh_ones_from_cache(
+        self, tmp_path
+    ):
+        cache: ResponseCache = ResponseCache(str(tmp_path))
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(200, mock_manga_data)]
+        )
+
+        first: dict = await fetch(mock_session, self.url, {"limit": 100}, cache=cache)
+        second: dict = await fetch(mock_session, self.url, {"limit": 100}, cache=cache)
+
+        assert first == second == mock_manga_data
+        assert mock_session.get.call_count == 1
+
+    async def test_fetch_revalidates_stale_responses(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path), ttls=[(r".*", 10)])
+        cache.put(
+            self.url, {}, mock_manga_data, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT"
+        )
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(304, {})]
+        )
+
+        with patch("time.time", return_value=time.time() + 60):
+            response: dict = await fetch(mock_session, self.url, {}, cache=cache)
+
+        assert response == mock_manga_data
+        assert mock_session.get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        }
+        assert cache.get(self.url, {})["fresh"]
+
+    async def test_fetch_does_not_cache_at_home_server_responses(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path))
+        url: str = f"{mock_url}/at-home/server/{mock_chapter_id}"
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_response(200, mock_download_resource_data),
+                create_mock_response(200, mock_download_resource_data),
+            ]
+        )
+
+        await fetch(mock_session, url, cache=cache)
+        await fetch(mock_session, url, cache=cache)
+
+        assert mock_session.get.call_count == 2
+        assert cache.size == 0
+
+
+class TestRetrieveWithPageStore:
+    async def test_retrieve_image_data_reads_stored_pages_without_a_request(
+        self, tmp_path
+    ):
+        store: PageStore = PageStore(str(tmp_path))
+        store.put(mock_processed_download_resource_data[0], mock_image_data)
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses([])
+
+        response: bytes = await retrieve_image_data(
+            mock_session, mock_processed_download_resource_data[0], store=store
+        )
+
+        assert response == mock_image_data
+        mock_session.get.assert_not_called()
+
+    async def test_retrieve_image_data_stores_downloaded_pages(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(200, {}, mock_image_data)]
+        )
+
+        await retrieve_image_data(
+            mock_session, mock_processed_download_resource_data[0], store=store
+        )
+
+        assert store.get(mock_processed_download_resource_data[0]) == mock_image_data
+
+    @patch("src.mangadex_downloader.services.api_access_service.retrieve_image_data")
+    @patch(
+        "src.mangadex_downloader.services.api_access_service.retrieve_download_resources",
+        return_value=mock_download_resource_data,
+    )
+    async def test_retrieve_chapter_image_data_reads_stored_chapters(
+        self,
+        mock_retrieve_download_resources: AsyncMock,
+        mock_retrieve: AsyncMock,
+        tmp_path,
+    ):
+        mock_retrieve.side_effect = lambda session, url, *args, **kwargs: url.encode()
+        store: PageStore = PageStore(str(tmp_path))
+
+        with patch(
+            "src.mangadex_downloader.services.api_access_service.page_store", store
+        ):
+            for url in mock_processed_download_resource_data:
+                store.put(url, url.encode())
+
+            first: list[bytes] = await retrieve_chapter_image_data(
+                MagicMock(), mock_chapter_id
+            )
+            second: list[bytes] = await retrieve_chapter_image_data(
+                MagicMock(), mock_chapter_id
+            )
+
+        assert first == second
+        assert mock_retrieve_download_resources.call_count == 1
+
+
+def create_mock_stream_response(chunks: list[bytes], content_length: int) -> AsyncMock:
+    async def iter_chunked(size: int):
+        for chunk in chunks:
+            yield chunk
+
+    mock_response: AsyncMock = create_mock_response(200, {})
+    mock_response.content = MagicMock()
+    mock_response.content.iter_chunked = iter_chunked
+    mock_response.content_length = content_length
+
+    return mock_response
+
+
+class TestRetrieveImageFile:
+    retry_policy: RetryPolicy = RetryPolicy(base_delay=0)
+
+    async def test_retrieve_image_file_streams_the_image_into_the_store(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_stream_response([b"ab", b"cd"], 4)]
+        )
+
+        path: str = await retrieve_image_file(mock_session, url, store=store)
+
+        assert path == store.get_file(url)
+        assert store.get(url) == b"abcd"
+
+    async def test_retrieve_image_file_writes_the_image_off_the_event_loop(
+        self, tmp_path
+    ):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        chunks: list[bytes] = [bytes([i]) * 1000 for i in range(5)]
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_stream_response(chunks, 5000)]
+        )
+        open_part: Callable = store.open_part
+        threads: list[threading.Thread] = []
+
+        def open_recorded_part(part_url: str):
+            file = open_part(part_url)
+            write = file.writelines
+
+            def writelines(lines: list[bytes]) -> None:
+                threads.append(threading.current_thread())
+                write(lines)
+
+            file.writelines = writelines
+            threads.append(threading.current_thread())
+
+            return file
+
+        with patch.object(store, "open_part", open_recorded_part), patch(
+            "src.mangadex_downloader.services.api_access_service.image_flush_size",
+            2000,
+        ):
+            await retrieve_image_file(mock_session, url, store=store)
+
+        assert store.get(url) == b"".join(chunks)
+        # Opening the file, two flushes of two chunks and the last chunk
+        assert len(threads) == 4
+        assert threading.main_thread() not in threads
+
+    async def test_retrieve_image_file_retries_truncated_images(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_stream_response([b"ab"], 4),
+                create_mock_stream_response([b"ab", b"cd"], 4),
+            ]
+        )
+
+        await retrieve_image_file(
+            mock_session, url, retry_policy=self.retry_policy, store=store
+        )
+
+        assert mock_session.get.call_count == 2
+        assert store.get(url) == b"abcd"
+        assert list(tmp_path.rglob("*.part")) == []
+
+    async def test_retrieve_image_file_never_stores_truncated_images(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_stream_response([b"ab"], 4)]
+        )
+
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await retrieve_image_file(
+                mock_session,
+                url,
+                retry_policy=RetryPolicy({"connection": 0}),
+                store=store,
+            )
+
+        assert store.get_file(url) is None
+        assert list(tmp_path.rglob("*.part")) == []
+
+    async def test_retrieve_image_file_stores_compressed_images(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        mock_response: AsyncMock = create_mock_stream_response([b"ab", b"cd"], 3)
+        mock_response.headers = {"Content-Encoding": "gzip"}
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [mock_response]
+        )
+
+        await retrieve_image_file(mock_session, url, store=store)
+
+        assert store.get(url) == b"abcd"
+
+    async def test_retrieve_image_file_returns_stored_pages_without_a_request(
+        self, tmp_path
+    ):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+        store.put(url, mock_image_data)
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses([])
+
+        assert await retrieve_image_file(mock_session, url, store=store) == (
+            store.get_file(url)
+        )
+        mock_session.get.assert_not_called()
+
+    async def test_retrieve_chapter_image_data_streaming_requires_a_page_store(self):
+        with pytest.raises(ValueError):
+            await retrieve_chapter_image_data(MagicMock(), mock_chapter_id, stream=True)
+
+
+class TestRateLimiting:
+    retry_policy: RetryPolicy = RetryPolicy(base_delay=0)
+
+    async def test_fetch_waits_on_the_rate_limiter_before_every_attempt(self):
+        rate_limited_response: AsyncMock = create_mock_response(429, {})
+        rate_limited_response.headers = {"Retry-After": "0"}
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [rate_limited_response, create_mock_response(200, mock_manga_data)]
+        )
+        limiter: RateLimiter = RateLimiter()
+
+        response: dict = await fetch(
+            mock_session, mock_url, retry_policy=self.retry_policy, limiter=limiter
+        )
+
+        assert response == mock_manga_data
+        classes: list[str] = limiter.get_classes(mock_url)
+        assert limiter.metrics[classes[0]]["requests"] == 2
+        assert limiter.metrics[classes[0]]["rate_limited"] == 1
+
+    async def test_retrieve_image_data_uses_the_default_rate_limiter(self):
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [create_mock_response(200, {}, mock_image_data_list[0])]
+        )
+        limiter: RateLimiter = RateLimiter()
+
+        with patch(
+            "src.mangadex_downloader.services.api_access_service.rate_limiter", limiter
+        ):
+            await retrieve_image_data(mock_session, mock_url_list[0])
+
+        assert limiter.metrics["images"]["requests"] == 1
+
+
+class TestMetrics:
+    retry_policy: RetryPolicy = RetryPolicy(base_delay=0)
+
+    async def test_retrieve_image_data_records_stage_host_and_retry_metrics(self):
+        registry: metrics_service.MetricsRegistry = metrics_service.MetricsRegistry()
+        mock_session: aiohttp.ClientSession = create_mock_session_with_responses(
+            [
+                create_mock_response(503, {}),
+                create_mock_response(200, {}, mock_image_data),
+            ]
+        )
+
+        with patch.object(metrics_service, "metrics", registry):
+            await retrieve_image_data(
+                mock_session, mock_url, retry_policy=self.retry_policy
+            )
+
+        response: dict = registry.to_dict()
+        counters: dict = {
+            (counter["name"], tuple(counter["labels"].values())): counter["value"]
+            for counter in response["counters"]
+        }
+
+        assert response["stages"]["image"]["bytes"] == len(mock_image_data)
+        assert counters[("image_requests_total", ("test.com",))] == 2
+        assert counters[("image_request_errors_total", ("test.com",))] == 1
+        assert counters[("image_bytes_total", ("test.com",))] == len(mock_image_data)
+        assert counters[("retries_total", ("server_error",))] == 1
@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import patch
+from src.mangadex_downloader.services.chapter_progress import *
+from tests.mock_data import *
+
+
+class TestChapterProgress:
+    def test_chapter_progress_knows_nothing_before_it_starts(self):
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+
+        assert progress.state == "pending"
+        assert progress.elapsed is None
+        assert progress.bytes_per_second is None
+        assert progress.eta is None
+
+    @patch("time.monotonic")
+    def test_chapter_progress_estimates_throughput_and_eta(self, mock_monotonic):
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+        mock_monotonic.return_value = 100.0
+        progress.start()
+        progress.set_pages(10)
+        for _ in range(4):
+            progress.record_page()
+            progress.record_bytes(1000)
+        progress.record_retry("timeout")
+        mock_monotonic.return_value = 102.0
+
+        assert progress.state == "downloading"
+        assert progress.bytes_per_second == 2000
+        assert progress.eta == 3
+        assert progress.retries == 1
+
+    @patch("time.monotonic")
+    def test_finish_stops_the_clock(self, mock_monotonic):
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+        mock_monotonic.return_value = 100.0
+        progress.start()
+        progress.set_pages(2, 2)
+        mock_monotonic.return_value = 104.0
+        progress.finish("done")
+        mock_monotonic.return_value = 200.0
+
+        assert progress.elapsed == 4
+        assert progress.eta is None
+
+    def test_finish_with_unknown_state_raises_exception(self):
+        progress: ChapterProgress = ChapterProgress(mock_processed_chapter_data[0])
+
+        with pytest.raises(ValueError):
+            progress.finish("downloading")
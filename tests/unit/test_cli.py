@@ -0,0 +1,314 @@
+import io
+import json
+import aiohttp
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.mangadex_downloader.cli import *
+from tests.mock_data import *
+
+
+def read_events(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestCreateParser:
+    def test_create_parser_parses_download_options(self):
+        args: argparse.Namespace = create_parser().parse_args(
+            ["download", "1", "2", "-c", "1-2", "-l", "en,fr", "-o", "/output"]
+        )
+
+        assert args.handler == download
+        assert args.manga_ids == ["1", "2"]
+        assert args.chapters == [(1, 2)]
+        assert args.languages == ["en", "fr"]
+        assert args.output == "/output"
+
+    def test_create_parser_parses_daemon_options(self):
+        args: argparse.Namespace = create_parser().parse_args(
+            ["daemon", "-q", "queue.jsonl", "-p", "8080", "-s", "3"]
+        )
+
+        assert args.handler == daemon
+        assert args.queue_file == "queue.jsonl"
+        assert args.port == 8080
+        assert args.host == "127.0.0.1"
+        assert args.series_workers == 3
+
+
+@patch("src.mangadex_downloader.cli.output", new_callable=io.StringIO)
+class TestCommands:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    @patch("src.mangadex_downloader.cli.retrieve_mangas", return_value=mock_manga_data)
+    async def test_search_writes_a_line_for_each_manga(
+        self, mock_retrieve: AsyncMock, mock_output: io.StringIO
+    ):
+        args: argparse.Namespace = create_parser().parse_args(["search", mock_query])
+        response: int = await search(self.dummy_session, args)
+
+        assert response == 0
+        assert read_events(mock_output) == [
+            {"event": "manga", **manga} for manga in process_manga_data(mock_manga_data)
+        ]
+
+    @patch("src.mangadex_downloader.cli.retrieve_chapters", return_value=None)
+    async def test_chapters_failure_writes_an_error(
+        self, mock_retrieve: AsyncMock, mock_output: io.StringIO
+    ):
+        args: argparse.Namespace = create_parser().parse_args(
+            ["chapters", mock_manga_id]
+        )
+        response: int = await chapters(self.dummy_session, args)
+
+        assert response == 1
+        assert read_events(mock_output)[0]["event"] == "error"
+
+    @patch("src.mangadex_downloader.cli.JobJournal")
+    @patch("src.mangadex_downloader.cli.DownloadPipeline")
+    @patch(
+        "src.mangadex_downloader.cli.retrieve_chapters", return_value=mock_chapter_data
+    )
+    @patch(
+        "src.mangadex_downloader.cli.retrieve_manga",
+        return_value={"data": mock_manga_data["data"][2]},
+    )
+    async def test_download_writes_progress_of_the_selected_chapters(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        mock_journal: MagicMock,
+        mock_output: io.StringIO,
+        tmp_path,
+    ):
+        async def run() -> list[bool]:
+            on_chapter_complete = mock_pipeline.call_args.kwargs["on_chapter_complete"]
+            for chapter in mock_pipeline.call_args.args[2]:
+                on_chapter_complete(chapter, True)
+            return [True] * len(mock_pipeline.call_args.args[2])
+
+        mock_pipeline.return_value.run.side_effect = run
+        args: argparse.Namespace = create_parser().parse_args(
+            ["download", mock_manga_id, "-c", "1-2", "-o", str(tmp_path)]
+        )
+        response: int = await download(self.dummy_session, args)
+
+        events: list[dict] = read_events(mock_output)
+        assert response == 0
+        assert events[0] == {
+            "event": "start",
+            "manga_id": mock_manga_id,
+            "title": "Naruto",
+            "chapters": 2,
+        }
+        assert [event["chapter_number"] for event in events[1:3]] == ["1", "2"]
+        assert events[-1] == {
+            "event": "finish",
+            "manga_id": mock_manga_id,
+            "downloaded": 2,
+            "failed": 0,
+        }
+        mock_journal.return_value.finish_job.assert_called_once()
+
+    @patch("src.mangadex_downloader.cli.SyncState")
+    @patch("src.mangadex_downloader.cli.JobJournal")
+    @patch("src.mangadex_downloader.cli.DownloadPipeline")
+    @patch("src.mangadex_downloader.cli.retrieve_chapters")
+    @patch(
+        "src.mangadex_downloader.cli.retrieve_manga",
+        return_value={"data": mock_manga_data["data"][2]},
+    )
+    async def test_sync_downloads_only_new_chapters(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        mock_journal: MagicMock,
+        mock_state: MagicMock,
+        mock_output: io.StringIO,
+        tmp_path,
+    ):
+        mock_retrieve_chapters.return_value = {
+            "data": [
+                {
+                    "id": chapter_id,
+                    "attributes": {
+                        "chapter": chapter_id,
+                        "updatedAt": f"2024-01-0{chapter_id}T00:00:00+00:00",
+                    },
+                }
+                for chapter_id in ["1", "2", "3"]
+            ]
+        }
+        mock_state.return_value.list_series.return_value = [mock_manga_id]
+        mock_state.return_value.get_series.return_value = {
+            "manga_id": mock_manga_id,
+            "languages": ["fr"],
+            "updated_at": "2024-01-01T00:00:00",
+            "exported": {"1"},
+        }
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True, True])
+        args: argparse.Namespace = create_parser().parse_args(
+            ["sync", "-o", str(tmp_path)]
+        )
+        response: int = await sync(self.dummy_session, args)
+
+        assert response == 0
+        mock_retrieve_chapters.assert_called_once_with(
+            self.dummy_session, mock_manga_id, ["fr"], "2024-01-01T00:00:00"
+        )
+        assert [chapter["id"] for chapter in mock_pipeline.call_args.args[2]] == [
+            "2",
+            "3",
+        ]
+        mock_state.return_value.mark_exported.assert_called_once_with(
+            mock_manga_id, ["2", "3"]
+        )
+        mock_state.return_value.record_sync.assert_called_once_with(
+            mock_manga_id, ["fr"], "2024-01-03T00:00:00"
+        )
+
+    @patch("src.mangadex_downloader.cli.SyncState")
+    @patch("src.mangadex_downloader.cli.JobJournal")
+    @patch("src.mangadex_downloader.cli.DownloadPipeline")
+    @patch("src.mangadex_downloader.cli.retrieve_chapters")
+    @patch(
+        "src.mangadex_downloader.cli.retrieve_manga",
+        return_value={"data": mock_manga_data["data"][2]},
+    )
+    async def test_sync_doesnt_move_the_latest_update_forward_past_unselected_chapters(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        mock_journal: MagicMock,
+        mock_state: MagicMock,
+        mock_output: io.StringIO,
+        tmp_path,
+    ):
+        mock_retrieve_chapters.return_value = {
+            "data": [
+                {
+                    "id": chapter_id,
+                    "attributes": {
+                        "chapter": chapter_id,
+                        "updatedAt": f"2024-01-0{chapter_id}T00:00:00+00:00",
+                    },
+                }
+                for chapter_id in ["1", "2", "3"]
+            ]
+        }
+        mock_state.return_value.list_series.return_value = [mock_manga_id]
+        mock_state.return_value.get_series.return_value = {
+            "manga_id": mock_manga_id,
+            "languages": ["fr"],
+            "updated_at": "2024-01-01T00:00:00",
+            "exported": {"1"},
+        }
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True])
+        args: argparse.Namespace = create_parser().parse_args(
+            ["sync", "-c", "2", "-o", str(tmp_path)]
+        )
+        response: int = await sync(self.dummy_session, args)
+
+        assert response == 0
+        assert [chapter["id"] for chapter in mock_pipeline.call_args.args[2]] == ["2"]
+        mock_state.return_value.record_sync.assert_called_once_with(
+            mock_manga_id, ["fr"], None
+        )
+
+    @patch("src.mangadex_downloader.cli.DownloadPipeline")
+    @patch("src.mangadex_downloader.cli.JobJournal")
+    async def test_resume_continues_the_last_cli_job_with_its_options(
+        self,
+        mock_journal: MagicMock,
+        mock_pipeline: MagicMock,
+        mock_output: io.StringIO,
+        tmp_path,
+    ):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto",
+            mock_processed_chapter_data,
+            str(tmp_path),
+            "cbz",
+            "volume",
+            "data-saver",
+            device_profiles["kobo"],
+            "cli",
+            mock_manga_id,
+        )
+        # A newer job of the interactive script isn't the CLI's to resume
+        journal.create_job("Bleach", mock_processed_chapter_data[:1], str(tmp_path))
+        mock_journal.return_value = journal
+        mock_pipeline.return_value.run = AsyncMock(
+            return_value=[True] * len(mock_processed_chapter_data)
+        )
+        args: argparse.Namespace = create_parser().parse_args(["resume"])
+        response: int = await resume(self.dummy_session, args)
+
+        assert response == 0
+        assert mock_pipeline.call_args.args[1:] == (
+            "Naruto",
+            mock_processed_chapter_data,
+            4,
+            str(tmp_path),
+        )
+        assert mock_pipeline.call_args.kwargs["job_id"] == job_id
+        assert mock_pipeline.call_args.kwargs["output_format"] == "cbz"
+        assert mock_pipeline.call_args.kwargs["group"] == "volume"
+        assert mock_pipeline.call_args.kwargs["quality"] == "data-saver"
+        assert mock_pipeline.call_args.kwargs["profile"] == device_profiles["kobo"]
+        assert read_events(mock_output)[0]["manga_id"] == mock_manga_id
+        assert JobJournal(str(tmp_path)).get_unfinished_job("cli") is None
+
+    @patch("src.mangadex_downloader.cli.JobJournal")
+    async def test_resume_without_an_unfinished_job_writes_an_error(
+        self, mock_journal: MagicMock, mock_output: io.StringIO, tmp_path
+    ):
+        mock_journal.return_value = JobJournal(str(tmp_path))
+        args: argparse.Namespace = create_parser().parse_args(["resume"])
+
+        assert await resume(self.dummy_session, args) == 1
+        assert read_events(mock_output)[0]["event"] == "error"
+
+
+# run sets the services' globals, patching them restores them once each test is done
+@patch("src.mangadex_downloader.services.metrics_service.metrics", None)
+@patch("src.mangadex_downloader.services.api_access_service.rate_limiter", None)
+@patch("src.mangadex_downloader.cli.SessionManager")
+@patch("src.mangadex_downloader.cli.output", new_callable=io.StringIO)
+class TestRun:
+    @patch("src.mangadex_downloader.cli.retrieve_mangas", return_value=mock_manga_data)
+    async def test_run_doesnt_report_metrics_of_commands_that_dont_download(
+        self,
+        mock_retrieve: AsyncMock,
+        mock_output: io.StringIO,
+        mock_session_manager: MagicMock,
+    ):
+        mock_session_manager.close_session = AsyncMock()
+        args: argparse.Namespace = create_parser().parse_args(
+            ["--no-cache", "search", mock_query]
+        )
+        response: int = await run(args)
+
+        assert response == 0
+        assert {event["event"] for event in read_events(mock_output)} == {"manga"}
+
+    @patch("src.mangadex_downloader.cli.download", return_value=0)
+    async def test_run_reports_metrics_of_downloads(
+        self,
+        mock_download: AsyncMock,
+        mock_output: io.StringIO,
+        mock_session_manager: MagicMock,
+    ):
+        mock_session_manager.close_session = AsyncMock()
+        args: argparse.Namespace = create_parser().parse_args(
+            ["--no-cache", "download", mock_manga_id]
+        )
+        response: int = await run(args)
+
+        assert response == 0
+        assert [event["event"] for event in read_events(mock_output)] == [
+            "rate_limits",
+            "metrics",
+        ]
@@ -1,3 +1,4 @@
+import pytest
 from src.mangadex_downloader.services.data_processing_service import *
 from tests.mock_data import *
 
@@ -73,6 +74,7 @@ class TestProcessChapterData:
                 "title": None,
                 "id": "4",
                 "chapter_number": "4",
+                "volume": None,
             }
         ]
 
@@ -106,7 +108,9 @@ class TestProcessChapterData:
             }
         )
 
-        assert response == [{"title": "Chapter 5", "id": "5", "chapter_number": "0"}]
+        assert response == [
+            {"title": "Chapter 5", "id": "5", "chapter_number": "0", "volume": None}
+        ]
 
 
 class TestProcessDownloadResourceData:
@@ -116,3 +120,71 @@ class TestProcessDownloadResourceData:
         )
 
         assert response == mock_processed_download_resource_data
+
+    def test_process_download_resource_data_returns_data_saver_urls(self):
+        response: list[str] = process_download_resource_data(
+            mock_download_resource_data, "data-saver"
+        )
+
+        assert response == [
+            url.replace("/data/", "/data-saver/")
+            for url in mock_processed_download_resource_data
+        ]
+
+    def test_process_download_resource_data_unknown_quality_raises_exception(self):
+        with pytest.raises(ValueError):
+            process_download_resource_data(mock_download_resource_data, "auto")
+
+
+class TestGetLatestUpdate:
+    def test_get_latest_update_returns_the_latest_update_in_utc(self):
+        chapter_data: dict = {
+            "data": [
+                {"id": "1", "attributes": {"updatedAt": "2024-01-02T00:00:00+00:00"}},
+                {"id": "2", "attributes": {"updatedAt": "2024-01-02T03:00:00+02:00"}},
+                {"id": "3", "attributes": {"updatedAt": "2024-01-01T12:00:00+00:00"}},
+            ]
+        }
+
+        response: str = get_latest_update(chapter_data)
+
+        assert response == "2024-01-02T01:00:00"
+
+    def test_get_latest_update_without_updates_returns_none(self):
+        response: str = get_latest_update(mock_chapter_data)
+
+        assert response is None
+
+
+class TestParseChapterRanges:
+    def test_parse_chapter_ranges_parses_numbers_and_ranges(self):
+        response: list[tuple[float, float]] = parse_chapter_ranges("1-10, 12,15.5")
+
+        assert response == [(1, 10), (12, 12), (15.5, 15.5)]
+
+    def test_parse_chapter_ranges_parses_open_ranges(self):
+        response: list[tuple[float, float]] = parse_chapter_ranges("-3,20-")
+
+        assert response == [(float("-inf"), 3), (20, float("inf"))]
+
+    def test_parse_chapter_ranges_with_invalid_range_raises_exception(self):
+        with pytest.raises(ValueError):
+            parse_chapter_ranges("1-ten")
+
+
+class TestSelectChapters:
+    def test_select_chapters_selects_chapters_in_any_range(self):
+        response: list[dict] = select_chapters(
+            mock_processed_chapter_data, [(0, 1), (3, 3)]
+        )
+
+        assert response == [
+            mock_processed_chapter_data[0],
+            mock_processed_chapter_data[1],
+            mock_processed_chapter_data[3],
+        ]
+
+    def test_select_chapters_without_ranges_selects_every_chapter(self):
+        response: list[dict] = select_chapters(mock_processed_chapter_data, [])
+
+        assert response == mock_processed_chapter_data
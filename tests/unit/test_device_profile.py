@@ -0,0 +1,80 @@
+import io
+import pytest
+from unittest.mock import patch
+from PIL import Image, JpegImagePlugin
+from src.mangadex_downloader.services.device_profile import *
+from src.mangadex_downloader.services.pdf_writer import read_jpeg_header
+
+
+def create_image_data(
+    mode: str = "RGB", size: tuple[int, int] = (100, 100), format: str = "JPEG"
+) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    Image.new(mode, size).save(buffer, format)
+
+    return buffer.getvalue()
+
+
+class TestDeviceProfile:
+    def test_get_size_scales_pages_down_to_fit_keeping_the_aspect_ratio(self):
+        profile: DeviceProfile = DeviceProfile("test", 500, 1000)
+
+        assert profile.get_size(1000, 1000) == (500, 500)
+        assert profile.get_size(400, 2000) == (200, 1000)
+        assert profile.get_size(400, 800) == (400, 800)
+        assert DeviceProfile("test").get_size(4000, 4000) == (4000, 4000)
+
+    def test_transform_scales_down_and_converts_to_grayscale(self):
+        profile: DeviceProfile = DeviceProfile("test", 300, 400, grayscale=True)
+
+        response: bytes = profile.transform(create_image_data("RGB", (1200, 1600)))
+
+        assert read_jpeg_header(response) == (300, 400, 1)
+
+    def test_transform_decodes_jpegs_in_draft_mode(self):
+        profile: DeviceProfile = DeviceProfile("test", 300, 400)
+
+        with patch.object(
+            JpegImagePlugin.JpegImageFile,
+            "draft",
+            autospec=True,
+            side_effect=JpegImagePlugin.JpegImageFile.draft,
+        ) as mock_draft:
+            response: bytes = profile.transform(create_image_data("RGB", (1200, 1600)))
+
+        assert mock_draft.call_args.args[1:] == ("RGB", (300, 400))
+        assert read_jpeg_header(response) == (300, 400, 3)
+
+    def test_transform_returns_pages_that_already_fit_unchanged(self):
+        image_data: bytes = create_image_data("RGB", (300, 400))
+
+        assert DeviceProfile("test", 300, 400).transform(image_data) is image_data
+
+    def test_transform_encodes_other_formats_as_jpeg(self):
+        profile: DeviceProfile = DeviceProfile("test", 300, 400)
+
+        response: bytes = profile.transform(create_image_data("P", (100, 100), "PNG"))
+
+        assert read_jpeg_header(response) == (100, 100, 3)
+
+
+class TestParse:
+    def test_parse_returns_named_profiles(self):
+        assert DeviceProfile.parse("kobo") is device_profiles["kobo"]
+
+    def test_parse_reads_custom_profiles(self):
+        profile: DeviceProfile = DeviceProfile.parse(
+            "1264x1680,grayscale,quality=70,nodraft"
+        )
+
+        assert (profile.max_width, profile.max_height) == (1264, 1680)
+        assert profile.grayscale
+        assert profile.quality == 70
+        assert not profile.draft
+
+    @pytest.mark.parametrize(
+        "text", ["unknown", "1264x", "quality=high", "quality=0", "800x600,"]
+    )
+    def test_parse_invalid_profile_raises_exception(self, text: str):
+        with pytest.raises(ValueError):
+            DeviceProfile.parse(text)
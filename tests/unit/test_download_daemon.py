@@ -0,0 +1,300 @@
+import asyncio
+import json
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.mangadex_downloader.services import metrics_service
+from src.mangadex_downloader.services.device_profile import device_profiles
+from src.mangadex_downloader.services.download_daemon import *
+from tests.mock_data import *
+
+
+async def wait_for_status(daemon: DownloadDaemon, job_id: int, status: str) -> None:
+    while job_id not in daemon.jobs or daemon.jobs[job_id]["status"] != status:
+        await asyncio.sleep(0.01)
+
+
+class TestSubmit:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    async def test_submit_queues_the_job_with_defaults(self):
+        daemon: DownloadDaemon = DownloadDaemon(self.dummy_session, "/output")
+        response: dict = daemon.submit({"manga_id": mock_manga_id})
+
+        assert response == {
+            "id": 1,
+            "manga_id": mock_manga_id,
+            "chapters": "",
+            "languages": ["en"],
+            "quality": None,
+            "profile": None,
+            "format": "pdf",
+            "group": "chapter",
+            "output": "/output",
+            "status": "queued",
+            "downloaded": 0,
+            "failed": 0,
+        }
+        assert daemon.jobs == {1: response}
+
+    async def test_submit_resolves_the_device_profile_of_the_job(self):
+        daemon: DownloadDaemon = DownloadDaemon(
+            self.dummy_session, profile=device_profiles["kobo"]
+        )
+        default_job: dict = daemon.submit({"manga_id": mock_manga_id})
+        custom_job: dict = daemon.submit(
+            {"manga_id": mock_manga_id, "profile": "800x600,grayscale"}
+        )
+
+        assert default_job["profile"] == "kobo"
+        assert custom_job["profile"] == "800x600,grayscale"
+        assert daemon._profiles[custom_job["id"]].max_width == 800
+
+    @pytest.mark.parametrize(
+        "request_data",
+        [
+            {},
+            {"manga_id": 1},
+            {"manga_id": mock_manga_id, "languages": "en"},
+            {"manga_id": mock_manga_id, "chapters": "1-ten"},
+            {"manga_id": mock_manga_id, "quality": "low"},
+            {"manga_id": mock_manga_id, "profile": "unknown"},
+            {"manga_id": mock_manga_id, "format": "docx"},
+            {"manga_id": mock_manga_id, "group": "arc"},
+        ],
+    )
+    async def test_submit_invalid_job_raises_exception(self, request_data: dict):
+        daemon: DownloadDaemon = DownloadDaemon(self.dummy_session)
+
+        with pytest.raises(ValueError):
+            daemon.submit(request_data)
+
+        assert daemon.jobs == {}
+
+
+@patch("src.mangadex_downloader.services.download_daemon.DownloadPipeline")
+@patch(
+    "src.mangadex_downloader.services.download_daemon.retrieve_chapters",
+    return_value=mock_chapter_data,
+)
+@patch(
+    "src.mangadex_downloader.services.download_daemon.retrieve_manga",
+    return_value={"data": mock_manga_data["data"][2]},
+)
+class TestRun:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    async def test_run_downloads_the_selected_chapters_of_queued_jobs(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+    ):
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True, False])
+        events: list[tuple[str, dict]] = []
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(1)
+        daemon: DownloadDaemon = DownloadDaemon(
+            self.dummy_session,
+            "/output",
+            executor=executor,
+            on_event=lambda event, fields: events.append((event, fields)),
+        )
+        run_task: asyncio.Task = asyncio.create_task(daemon.run())
+        job: dict = daemon.submit(
+            {"manga_id": mock_manga_id, "chapters": "1-2", "languages": ["fr"]}
+        )
+
+        await asyncio.wait_for(wait_for_status(daemon, job["id"], "failed"), 1)
+        daemon.stop()
+        await run_task
+
+        mock_retrieve_chapters.assert_called_once_with(
+            self.dummy_session, mock_manga_id, ["fr"]
+        )
+        assert mock_pipeline.call_args.args[1] == "Naruto"
+        assert mock_pipeline.call_args.args[2] == mock_processed_chapter_data[1:3]
+        assert mock_pipeline.call_args.kwargs["executor"] is executor
+        assert mock_pipeline.call_args.kwargs["scheduler"] is daemon.scheduler
+        assert [fields["status"] for event, fields in events] == [
+            "queued",
+            "running",
+            "failed",
+        ]
+
+    async def test_run_splits_the_executor_between_the_series_workers(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+    ):
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True])
+        daemon: DownloadDaemon = DownloadDaemon(
+            self.dummy_session,
+            "/output",
+            series_workers=2,
+            executor=ThreadPoolExecutor(8),
+            executor_workers=8,
+        )
+        run_task: asyncio.Task = asyncio.create_task(daemon.run())
+        job: dict = daemon.submit({"manga_id": mock_manga_id})
+
+        await asyncio.wait_for(wait_for_status(daemon, job["id"], "done"), 1)
+        daemon.stop()
+        await run_task
+
+        assert mock_pipeline.call_args.kwargs["conversion_workers"] == 4
+
+    async def test_watch_file_submits_appended_jobs(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        tmp_path,
+    ):
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True])
+        queue_file = tmp_path / "queue.jsonl"
+        queue_file.write_text(json.dumps({"manga_id": "1"}) + "\nnot json\n")
+        daemon: DownloadDaemon = DownloadDaemon(
+            self.dummy_session, executor=ThreadPoolExecutor(1)
+        )
+        run_task: asyncio.Task = asyncio.create_task(daemon.run())
+        watch_task: asyncio.Task = asyncio.create_task(
+            daemon.watch_file(str(queue_file), 0.01, str(tmp_path / "state.json"))
+        )
+
+        await asyncio.wait_for(wait_for_status(daemon, 1, "done"), 1)
+        with open(queue_file, "a") as file:
+            # The second job is only submitted once its line is complete
+            file.write(json.dumps({"manga_id": "2"}))
+            file.flush()
+            await asyncio.sleep(0.05)
+            assert list(daemon.jobs) == [1]
+            file.write("\n")
+        await asyncio.wait_for(wait_for_status(daemon, 2, "done"), 1)
+        daemon.stop()
+        await asyncio.gather(run_task, watch_task)
+
+        assert [job["manga_id"] for job in daemon.jobs.values()] == ["1", "2"]
+
+    async def test_watch_file_only_submits_unfinished_jobs_after_a_restart(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        tmp_path,
+    ):
+        stopped: asyncio.Event = asyncio.Event()
+
+        async def retrieve_manga(session: aiohttp.ClientSession, manga_id: str):
+            # The second job is still running when the first daemon stops
+            if manga_id == "2" and not stopped.is_set():
+                await asyncio.Event().wait()
+            return {"data": mock_manga_data["data"][2]}
+
+        mock_retrieve_manga.side_effect = retrieve_manga
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True])
+        queue_file = tmp_path / "queue.jsonl"
+        queue_file.write_text(
+            "".join(json.dumps({"manga_id": manga_id}) + "\n\n" for manga_id in "123")
+        )
+
+        async def watch(daemon: DownloadDaemon, job_ids: list[int]) -> None:
+            run_task: asyncio.Task = asyncio.create_task(daemon.run())
+            watch_task: asyncio.Task = asyncio.create_task(
+                daemon.watch_file(str(queue_file), 0.01, str(tmp_path / "state.json"))
+            )
+            for job_id in job_ids:
+                await asyncio.wait_for(wait_for_status(daemon, job_id, "done"), 1)
+            daemon.stop()
+            await asyncio.gather(run_task, watch_task)
+
+        first: DownloadDaemon = DownloadDaemon(
+            self.dummy_session, series_workers=2, executor=ThreadPoolExecutor(1)
+        )
+        await watch(first, [1, 3])
+        stopped.set()
+        second: DownloadDaemon = DownloadDaemon(
+            self.dummy_session, executor=ThreadPoolExecutor(1)
+        )
+        await watch(second, [1])
+
+        assert [job["status"] for job in first.jobs.values()] == [
+            "done",
+            "running",
+            "done",
+        ]
+        assert [job["manga_id"] for job in second.jobs.values()] == ["2"]
+
+    async def test_watch_file_reports_lines_that_arent_utf_8(
+        self,
+        mock_retrieve_manga: AsyncMock,
+        mock_retrieve_chapters: AsyncMock,
+        mock_pipeline: MagicMock,
+        tmp_path,
+    ):
+        mock_pipeline.return_value.run = AsyncMock(return_value=[True])
+        queue_file = tmp_path / "queue.jsonl"
+        queue_file.write_bytes(
+            b"\xff\xfe\n" + json.dumps({"manga_id": "1"}).encode() + b"\n"
+        )
+        events: list[tuple[str, dict]] = []
+        daemon: DownloadDaemon = DownloadDaemon(
+            self.dummy_session,
+            executor=ThreadPoolExecutor(1),
+            on_event=lambda event, fields: events.append((event, fields)),
+        )
+        run_task: asyncio.Task = asyncio.create_task(daemon.run())
+        watch_task: asyncio.Task = asyncio.create_task(
+            daemon.watch_file(str(queue_file), 0.01, str(tmp_path / "state.json"))
+        )
+
+        await asyncio.wait_for(wait_for_status(daemon, 1, "done"), 1)
+        daemon.stop()
+        await asyncio.gather(run_task, watch_task)
+
+        assert [fields["line"] for event, fields in events if event == "error"] == [
+            "\ufffd\ufffd"
+        ]
+
+
+class TestCreateApp:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    async def test_jobs_are_submitted_and_inspected_over_http(self):
+        daemon: DownloadDaemon = DownloadDaemon(self.dummy_session, "/output")
+
+        async with TestClient(TestServer(daemon.create_app())) as client:
+            post_response = await client.post("/jobs", json={"manga_id": "1"})
+            invalid_response = await client.post("/jobs", data="not json")
+            job_response = await client.get("/jobs/1")
+            missing_response = await client.get("/jobs/2")
+            jobs_response = await client.get("/jobs")
+
+            assert post_response.status == 202
+            assert (await post_response.json())["id"] == 1
+            assert invalid_response.status == 400
+            assert (await job_response.json())["manga_id"] == "1"
+            assert missing_response.status == 404
+            assert len(await jobs_response.json()) == 1
+
+    async def test_metrics_are_served_in_prometheus_and_json_formats(self):
+        daemon: DownloadDaemon = DownloadDaemon(self.dummy_session, "/output")
+        registry: metrics_service.MetricsRegistry = metrics_service.MetricsRegistry()
+        registry.record_stage("image", 0.2, 1000)
+
+        with patch.object(metrics_service, "metrics", registry):
+            async with TestClient(TestServer(daemon.create_app())) as client:
+                text_response = await client.get("/metrics")
+                json_response = await client.get("/metrics?format=json")
+
+                assert text_response.status == 200
+                assert (
+                    'mangadex_stage_bytes_total{stage="image"} 1000'
+                    in await text_response.text()
+                )
+                assert (await json_response.json())["stages"]["image"]["bytes"] == 1000
+
+        async with TestClient(TestServer(daemon.create_app())) as client:
+            assert (await client.get("/metrics")).status == 404
@@ -0,0 +1,829 @@
+import asyncio
+import io
+import os
+import aiohttp
+import pytest
+import threading
+import zipfile
+from PIL import Image, PdfParser
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.mangadex_downloader.services.download_pipeline import *
+from src.mangadex_downloader.services.job_journal import JobJournal
+from tests.mock_data import *
+
+
+def create_page(text: str) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    Image.new("RGB", (10 + int(text), 10)).save(buffer, "PNG")
+
+    return buffer.getvalue()
+
+
+class TestGetOutputName:
+    def test_get_output_name_returns_title_and_chapter_number(self):
+        response: str = get_output_name("Naruto", mock_processed_chapter_data[1])
+
+        assert response == "Naruto [1]"
+
+
+class TestGetGroupOutputNames:
+    def test_get_group_output_names_names_a_file_per_chapter(self):
+        response: list[str] = get_group_output_names(
+            "Naruto", mock_processed_chapter_data, "chapter"
+        )
+
+        assert response == [
+            get_output_name("Naruto", chapter)
+            for chapter in mock_processed_chapter_data
+        ]
+
+    def test_get_group_output_names_names_a_file_per_volume(self):
+        response: list[str] = get_group_output_names(
+            "Naruto", mock_processed_chapter_data, "volume"
+        )
+
+        assert response == [
+            "Naruto [No Volume]",
+            "Naruto [Vol. 1]",
+            "Naruto [Vol. 1]",
+            "Naruto [Vol. 2]",
+        ]
+
+    def test_get_group_output_names_names_a_file_after_the_chapters_of_the_series(
+        self,
+    ):
+        response: list[str] = get_group_output_names(
+            "Naruto", mock_processed_chapter_data, "series"
+        )
+
+        assert response == ["Naruto [0-3]"] * len(mock_processed_chapter_data)
+
+    def test_get_group_output_names_with_unknown_group_raises_exception(self):
+        with pytest.raises(ValueError):
+            get_group_output_names("Naruto", mock_processed_chapter_data, "arc")
+
+
+class TestGetOutputFiles:
+    def test_get_output_files_adds_the_directory_and_extension(self):
+        response: list[str] = get_output_files(
+            "Naruto", mock_processed_chapter_data[1:3], "/output", "cbz", "volume"
+        )
+
+        assert response == [os.path.join("/output", "Naruto [Vol. 1].cbz")] * 2
+
+
+class TestGetChapterTitle:
+    def test_get_chapter_title_includes_the_title_of_the_chapter(self):
+        assert get_chapter_title(mock_processed_chapter_data[1]) == (
+            "Chapter 1 - Chapter 1"
+        )
+        assert get_chapter_title(mock_processed_chapter_data[3]) == "Chapter 3"
+
+
+class TestCreateExecutor:
+    def test_create_executor_creates_a_process_pool(self):
+        executor: Executor = create_executor("process", 2)
+
+        assert isinstance(executor, ProcessPoolExecutor)
+        executor.shutdown()
+
+    def test_create_executor_creates_a_thread_pool(self):
+        executor: Executor = create_executor("thread", 2)
+
+        assert isinstance(executor, ThreadPoolExecutor)
+        executor.shutdown()
+
+    def test_create_executor_with_unknown_kind_raises_exception(self):
+        with pytest.raises(ValueError):
+            create_executor("fiber", 2)
+
+
+class TestDownloadPipeline:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_copies_pages_without_the_executor_for_formats_that_dont_encode(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        executor: MagicMock = MagicMock()
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[:2],
+            output_path=str(tmp_path),
+            executor=executor,
+            output_format="cbz",
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True, True]
+        executor.submit.assert_not_called()
+        assert pipeline.get_output_file(0).endswith(".cbz")
+        assert os.path.isfile(pipeline.get_output_file(0))
+
+    def test_unknown_output_format_raises_exception(self):
+        with pytest.raises(ValueError):
+            DownloadPipeline(self.dummy_session, "Naruto", [], output_format="docx")
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_generates_a_pdf_for_each_chapter(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            2,
+            "/output",
+            executor=ThreadPoolExecutor(2),
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True] * len(mock_processed_chapter_data)
+        assert mock_retrieve.call_count == len(mock_processed_chapter_data)
+        for chapter in mock_processed_chapter_data:
+            mock_generate_output.assert_any_call(
+                mock_image_data_list,
+                get_output_name("Naruto", chapter),
+                "/output",
+                "pdf",
+                None,
+            )
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_reports_failed_chapters_without_generating_a_pdf(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        mock_retrieve.side_effect = [
+            None,
+            mock_image_data_list,
+            [None, *mock_image_data_list],
+            Exception("Error fetching url"),
+        ]
+        on_chapter_complete: MagicMock = MagicMock()
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            1,
+            executor=ThreadPoolExecutor(1),
+            on_chapter_complete=on_chapter_complete,
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [False, True, False, False]
+        assert mock_generate_output.call_count == 1
+        on_chapter_complete.assert_any_call(mock_processed_chapter_data[0], False)
+        on_chapter_complete.assert_any_call(mock_processed_chapter_data[1], True)
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.generate_output",
+        side_effect=Exception("Error generating PDF"),
+    )
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_reports_chapters_that_fail_to_convert(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[:2],
+            executor=ThreadPoolExecutor(2),
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [False, False]
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_converts_chapters_before_slower_chapters_finish_downloading(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        slow_chapter_released: asyncio.Event = asyncio.Event()
+        completed: list[str] = []
+
+        async def retrieve(
+            session: aiohttp.ClientSession,
+            chapter_id: str,
+            scheduler: FetchScheduler,
+            on_page: Callable[[int], None] = None,
+            **kwargs,
+        ):
+            if chapter_id == mock_processed_chapter_data[0]["id"]:
+                await slow_chapter_released.wait()
+            return mock_image_data_list
+
+        def on_chapter_complete(chapter: dict, success: bool) -> None:
+            completed.append(chapter["id"])
+            if len(completed) == len(mock_processed_chapter_data) - 1:
+                slow_chapter_released.set()
+
+        mock_retrieve.side_effect = retrieve
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            2,
+            executor=ThreadPoolExecutor(1),
+            on_chapter_complete=on_chapter_complete,
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True] * len(mock_processed_chapter_data)
+        assert completed[-1] == mock_processed_chapter_data[0]["id"]
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_converts_chapters_in_a_process_pool(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        buffer: io.BytesIO = io.BytesIO()
+        Image.new("RGB", (100, 100)).save(buffer, "PNG")
+        mock_retrieve.return_value = [buffer.getvalue()] * 3
+
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[:2],
+            output_path=str(tmp_path),
+            executor=create_executor("process", 2),
+            conversion_workers=2,
+        )
+        response: list[bool] = await pipeline.run()
+        pipeline.executor.shutdown()
+
+        assert response == [True, True]
+        for chapter in mock_processed_chapter_data[:2]:
+            file_path: str = str(tmp_path / f"{get_output_name('Naruto', chapter)}.pdf")
+            assert len(PdfParser.PdfParser(file_path).pages) == 3
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_records_progress_in_the_journal(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock, tmp_path
+    ):
+        async def retrieve(
+            session: aiohttp.ClientSession,
+            chapter_id: str,
+            scheduler: FetchScheduler,
+            **kwargs,
+        ):
+            if chapter_id == mock_processed_chapter_data[0]["id"]:
+                return None
+            return mock_image_data_list
+
+        mock_retrieve.side_effect = retrieve
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto", mock_processed_chapter_data, str(tmp_path)
+        )
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            executor=ThreadPoolExecutor(1),
+            journal=journal,
+            job_id=job_id,
+        )
+        await pipeline.run()
+
+        states: dict[str, str] = journal.get_chapter_states(job_id)
+        assert states[mock_processed_chapter_data[0]["id"]] == "failed"
+        assert states[mock_processed_chapter_data[1]["id"]] == "done"
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_resumes_a_job_in_its_journaled_format_and_group(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        journal.create_job(
+            "Naruto", mock_processed_chapter_data, str(tmp_path), "cbz", "volume"
+        )
+        job: dict = journal.get_unfinished_job()
+        # Every file but the second volume's was written before the job was interrupted
+        for chapter in mock_processed_chapter_data[:3]:
+            journal.set_chapter_state(job["id"], chapter["id"], "done")
+        for name in ("Naruto [No Volume].cbz", "Naruto [Vol. 1].cbz"):
+            open(tmp_path / name, "wb").close()
+
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            job["manga_title"],
+            job["chapters"],
+            output_path=job["output_path"],
+            executor=ThreadPoolExecutor(1),
+            journal=journal,
+            job_id=job["id"],
+            output_format=job["output_format"],
+            group=job["group"],
+            quality=job["quality"],
+            profile=job["profile"],
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True] * len(mock_processed_chapter_data)
+        assert [call.args[1] for call in mock_retrieve.call_args_list] == [
+            mock_processed_chapter_data[3]["id"]
+        ]
+        assert sorted(os.listdir(tmp_path)) == [
+            "Naruto [No Volume].cbz",
+            "Naruto [Vol. 1].cbz",
+            "Naruto [Vol. 2].cbz",
+            "jobs.sqlite3",
+        ]
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_skips_chapters_the_journal_finished(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock, tmp_path
+    ):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto", mock_processed_chapter_data, str(tmp_path)
+        )
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            output_path=str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            journal=journal,
+            job_id=job_id,
+        )
+        for index in range(2):
+            journal.set_chapter_state(
+                job_id, mock_processed_chapter_data[index]["id"], "done"
+            )
+        # Only the first chapter's PDF survived, so the second is downloaded again
+        open(pipeline.get_output_file(0), "wb").close()
+
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True] * len(mock_processed_chapter_data)
+        assert [call.args[1] for call in mock_retrieve.call_args_list] == [
+            chapter["id"] for chapter in mock_processed_chapter_data[1:]
+        ]
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_writes_a_file_per_volume_in_chapter_order(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        released: asyncio.Event = asyncio.Event()
+
+        async def retrieve(session, chapter_id: str, scheduler, **kwargs):
+            # The first chapter of volume 1 finishes last
+            if chapter_id == mock_processed_chapter_data[1]["id"]:
+                await released.wait()
+            return [create_page(chapter_id)]
+
+        def on_chapter_complete(chapter: dict, success: bool) -> None:
+            if chapter["id"] == mock_processed_chapter_data[3]["id"]:
+                released.set()
+
+        mock_retrieve.side_effect = retrieve
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            4,
+            str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            on_chapter_complete=on_chapter_complete,
+            output_format="cbz",
+            group="volume",
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True] * len(mock_processed_chapter_data)
+        assert sorted(os.listdir(tmp_path)) == [
+            "Naruto [No Volume].cbz",
+            "Naruto [Vol. 1].cbz",
+            "Naruto [Vol. 2].cbz",
+        ]
+        with zipfile.ZipFile(tmp_path / "Naruto [Vol. 1].cbz") as archive:
+            assert [name for name in archive.namelist() if name.endswith(".png")] == [
+                "0001 Chapter 1 - Chapter 1/001.png",
+                "0002 Chapter 2 - Chapter 2/001.png",
+            ]
+            assert archive.read("0001 Chapter 1 - Chapter 1/001.png") == create_page(
+                "1"
+            )
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_keeps_the_chapters_a_volume_held_when_it_is_written_again(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        async def retrieve(session, chapter_id: str, scheduler, **kwargs):
+            return [create_page(chapter_id)]
+
+        mock_retrieve.side_effect = retrieve
+        journal: JobJournal = JobJournal(str(tmp_path / "jobs"))
+        output_path: str = str(tmp_path / "output")
+        os.makedirs(output_path)
+        completed: list[str] = []
+
+        async def download(chapters: list[dict]) -> list[bool]:
+            return await DownloadPipeline(
+                self.dummy_session,
+                "Naruto",
+                chapters,
+                output_path=output_path,
+                executor=ThreadPoolExecutor(1),
+                on_chapter_complete=lambda chapter, success: completed.append(
+                    chapter["id"]
+                ),
+                journal=journal,
+                job_id=journal.create_job("Naruto", chapters, output_path),
+                output_format="cbz",
+                group="volume",
+            ).run()
+
+        # The third chapter is only released once the first two were downloaded into its volume
+        assert await download(mock_processed_chapter_data[1:3]) == [True, True]
+        assert await download([{**mock_processed_chapter_data[3], "volume": "1"}]) == [
+            True
+        ]
+
+        assert completed == ["1", "2", "3"]
+        with zipfile.ZipFile(tmp_path / "output" / "Naruto [Vol. 1].cbz") as archive:
+            assert [name for name in archive.namelist() if name.endswith(".png")] == [
+                "0001 Chapter 1 - Chapter 1/001.png",
+                "0002 Chapter 2 - Chapter 2/001.png",
+                "0003 Chapter 3/001.png",
+            ]
+            assert archive.read("0001 Chapter 1 - Chapter 1/001.png") == create_page(
+                "1"
+            )
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_leaves_a_volume_as_it_was_if_a_chapter_it_held_fails(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        journal: JobJournal = JobJournal(str(tmp_path / "jobs"))
+        output_path: str = str(tmp_path / "output")
+        os.makedirs(output_path)
+
+        async def download(chapters: list[dict]) -> list[bool]:
+            return await DownloadPipeline(
+                self.dummy_session,
+                "Naruto",
+                chapters,
+                output_path=output_path,
+                executor=ThreadPoolExecutor(1),
+                journal=journal,
+                job_id=journal.create_job("Naruto", chapters, output_path),
+                output_format="cbz",
+                group="volume",
+            ).run()
+
+        mock_retrieve.side_effect = [[create_page("1")]]
+        assert await download(mock_processed_chapter_data[1:2]) == [True]
+        file_path: str = os.path.join(output_path, "Naruto [Vol. 1].cbz")
+        with open(file_path, "rb") as file:
+            written: bytes = file.read()
+
+        # The first chapter can't be downloaded again
+        mock_retrieve.side_effect = [None, [create_page("2")]]
+        assert await download(mock_processed_chapter_data[2:3]) == [False]
+
+        with open(file_path, "rb") as file:
+            assert file.read() == written
+        assert os.listdir(output_path) == ["Naruto [Vol. 1].cbz"]
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_writes_the_series_to_one_pdf_bookmarked_by_chapter(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        mock_retrieve.side_effect = [
+            [create_page("4")] * 2,
+            None,
+            [create_page("2")],
+            [create_page("3")],
+        ]
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            1,
+            str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            group="series",
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert response == [True, False, True, True]
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(
+            str(tmp_path / "Naruto [0-3].pdf")
+        )
+        outline: PdfParser.PdfDict = parser.read_indirect(parser.root[b"Outlines"])
+        last: PdfParser.PdfDict = parser.read_indirect(outline[b"Last"])
+        assert len(parser.pages) == 4
+        assert outline[b"Count"] == 3
+        assert PdfParser.decode_text(last[b"Title"]) == "Chapter 3"
+        assert last[b"Dest"][0] == parser.pages[3]
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_bounds_the_chapters_waiting_for_a_slow_chapter(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        chapters: list[dict] = [
+            {"id": str(i), "chapter_number": str(i), "title": None, "volume": None}
+            for i in range(10)
+        ]
+        started: list[str] = []
+        released: asyncio.Event = asyncio.Event()
+
+        async def retrieve(session, chapter_id: str, scheduler, **kwargs):
+            started.append(chapter_id)
+            if chapter_id == "0":
+                await released.wait()
+            return [create_page(chapter_id)]
+
+        async def release() -> None:
+            await asyncio.sleep(0.1)
+            released.set()
+
+        mock_retrieve.side_effect = retrieve
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            chapters,
+            2,
+            str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            conversion_workers=1,
+            output_format="folder",
+            group="series",
+        )
+        release_task: asyncio.Task = asyncio.create_task(release())
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await release_task
+        started_before_release: int = len(started)
+        response: list[bool] = await run_task
+
+        # Two download workers and one conversion worker make a window of three chapters
+        assert started_before_release == 3
+        assert response == [True] * len(chapters)
+        assert len(os.listdir(tmp_path / "Naruto [0-9]")) == len(chapters)
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_fails_every_chapter_of_a_file_that_cant_be_written(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        on_chapter_complete: MagicMock = MagicMock()
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[1:3],
+            1,
+            str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            on_chapter_complete=on_chapter_complete,
+            group="volume",
+        )
+        response: list[bool] = await pipeline.run()
+
+        # The mock pages aren't images, so the PDF file can't be written
+        assert response == [False, False]
+        assert os.listdir(tmp_path) == []
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        return_value=mock_image_data_list,
+    )
+    async def test_run_holds_no_more_chapters_than_the_downloads_and_conversions(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        released: threading.Event = threading.Event()
+        mock_generate_output.side_effect = lambda *args: released.wait()
+        chapters: list[dict] = [
+            {"id": str(i), "chapter_number": str(i), "title": None, "volume": None}
+            for i in range(12)
+        ]
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            chapters,
+            1,
+            executor=ThreadPoolExecutor(4),
+            conversion_workers=4,
+        )
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await asyncio.sleep(0.2)
+        started: int = mock_retrieve.call_count
+        released.set()
+        response: list[bool] = await run_task
+
+        # Four chapters converting, one waiting to be converted and one downloaded waiting for a place
+        assert started == 6
+        assert response == [True] * len(chapters)
+
+    @patch(
+        "src.mangadex_downloader.services.output_writer.CBZOutputWriter.close",
+        side_effect=OSError("Disk full"),
+    )
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_run_reports_every_chapter_once_when_its_file_cant_be_closed(
+        self, mock_retrieve: AsyncMock, mock_close: MagicMock, tmp_path
+    ):
+        mock_retrieve.side_effect = lambda session, chapter_id, *args, **kwargs: [
+            create_page("1")
+        ]
+        on_chapter_complete: MagicMock = MagicMock()
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[1:3],
+            1,
+            str(tmp_path),
+            executor=ThreadPoolExecutor(1),
+            on_chapter_complete=on_chapter_complete,
+            output_format="cbz",
+            group="volume",
+        )
+        response: list[bool] = await pipeline.run()
+
+        assert mock_close.call_count == 1
+        assert response == [False, False]
+        assert [call.args[0]["id"] for call in on_chapter_complete.call_args_list] == [
+            chapter["id"] for chapter in mock_processed_chapter_data[1:3]
+        ]
+        assert [progress.state for progress in pipeline.progress] == ["failed"] * 2
+        assert os.listdir(tmp_path) == []
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data",
+        side_effect=[mock_image_data_list, None],
+    )
+    async def test_run_tracks_the_progress_of_every_chapter(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data[:2],
+            1,
+            executor=ThreadPoolExecutor(1),
+        )
+
+        assert [progress.state for progress in pipeline.progress] == ["pending"] * 2
+
+        await pipeline.run()
+
+        assert [progress.state for progress in pipeline.progress] == ["done", "failed"]
+        assert all(
+            call.kwargs["progress"] is progress
+            for call, progress in zip(mock_retrieve.call_args_list, pipeline.progress)
+        )
+
+
+class TestDownloadPipelineControl:
+    dummy_session: aiohttp.ClientSession = MagicMock()
+
+    def create_pipeline(self, mock_retrieve: AsyncMock, **kwargs) -> DownloadPipeline:
+        """
+        Creates a pipeline downloading one chapter at a time, whose first chapter downloads until released
+        """
+
+        self.started: asyncio.Event = asyncio.Event()
+        self.released: asyncio.Event = asyncio.Event()
+
+        async def retrieve(session, chapter_id: str, scheduler, **kwargs):
+            if chapter_id == mock_processed_chapter_data[0]["id"]:
+                self.started.set()
+                await self.released.wait()
+            return mock_image_data_list
+
+        mock_retrieve.side_effect = retrieve
+
+        return DownloadPipeline(
+            self.dummy_session,
+            "Naruto",
+            mock_processed_chapter_data,
+            1,
+            executor=ThreadPoolExecutor(1),
+            **kwargs,
+        )
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_cancel_stops_a_downloading_chapter(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = self.create_pipeline(mock_retrieve)
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await self.started.wait()
+
+        assert await pipeline.cancel(0)
+        assert not await pipeline.cancel(0)
+        assert await run_task == [False, True, True, True]
+        assert pipeline.progress[0].state == "cancelled"
+        assert mock_generate_output.call_count == 3
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_cancel_skips_a_pending_chapter(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = self.create_pipeline(mock_retrieve)
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await self.started.wait()
+
+        assert await pipeline.cancel(2)
+        assert pipeline.progress[2].state == "cancelled"
+
+        self.released.set()
+
+        assert await run_task == [True, True, False, True]
+        assert mock_retrieve.call_count == 3
+
+    @patch("src.mangadex_downloader.services.download_pipeline.generate_output")
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_prioritize_downloads_a_pending_chapter_next(
+        self, mock_retrieve: AsyncMock, mock_generate_output: MagicMock
+    ):
+        pipeline: DownloadPipeline = self.create_pipeline(mock_retrieve)
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await self.started.wait()
+
+        assert pipeline.prioritize(3)
+        assert not pipeline.prioritize(0)
+
+        self.released.set()
+        await run_task
+
+        assert [call.args[1] for call in mock_retrieve.call_args_list] == [
+            mock_processed_chapter_data[i]["id"] for i in [0, 3, 1, 2]
+        ]
+
+    @patch(
+        "src.mangadex_downloader.services.download_pipeline.retrieve_chapter_image_data"
+    )
+    async def test_cancel_leaves_a_pending_chapter_out_of_its_file(
+        self, mock_retrieve: AsyncMock, tmp_path
+    ):
+        pipeline: DownloadPipeline = self.create_pipeline(
+            mock_retrieve,
+            output_path=str(tmp_path),
+            output_format="folder",
+            group="volume",
+        )
+        run_task: asyncio.Task = asyncio.create_task(pipeline.run())
+        await self.started.wait()
+
+        assert await pipeline.cancel(2)
+
+        self.released.set()
+
+        assert await run_task == [True, True, False, True]
+        assert os.listdir(tmp_path / "Naruto [Vol. 1]") == [
+            "0001 Chapter 1 - Chapter 1"
+        ]
@@ -1,7 +1,9 @@
+import io
 import os
 import pytest
+import zipfile
 from unittest.mock import patch, MagicMock
-from PIL import Image
+from PIL import Image, PdfParser
 from mangadex_downloader.services.file_access_service import *
 from tests.mock_data import *
 
@@ -164,3 +166,158 @@ class TestConvertImagesToPDF:
                 Image.new("RGB", (100, 100)) for i in range(len(mock_image_paths) - 1)
             ][1:],
         )
+
+
+def create_image_data(
+    format: str = "JPEG", size: tuple[int, int] = (100, 100)
+) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buffer, format)
+
+    return buffer.getvalue()
+
+
+class TestConvertImageDataToPDF:
+    image_data_list: list[bytes] = [
+        create_image_data("JPEG", (100, 100)),
+        create_image_data("PNG", (200, 100)),
+        create_image_data("JPEG", (300, 100)),
+    ]
+
+    def test_convert_image_data_to_pdf_writes_images_in_page_order(self, tmp_path):
+        convert_image_data_to_pdf(self.image_data_list, str(tmp_path), "output")
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(str(tmp_path / "output.pdf"))
+
+        assert [
+            parser.read_indirect(page)[b"MediaBox"][2:] for page in parser.pages
+        ] == [[100, 100], [200, 100], [300, 100]]
+
+    def test_convert_image_data_to_pdf_skips_missing_images(self, tmp_path):
+        image_data_list: list[bytes] = [create_image_data(), None, create_image_data()]
+        convert_image_data_to_pdf(image_data_list, str(tmp_path), "output")
+
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(str(tmp_path / "output.pdf"))
+
+        assert len(parser.pages) == 2
+
+    def test_convert_image_data_to_pdf_reads_image_paths(self, tmp_path):
+        image_path: str = str(tmp_path / "page.jpg")
+        with open(image_path, "wb") as file:
+            file.write(create_image_data("JPEG", (200, 100)))
+
+        convert_image_data_to_pdf(
+            [self.image_data_list[0], image_path], str(tmp_path), "output"
+        )
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(str(tmp_path / "output.pdf"))
+
+        assert [
+            parser.read_indirect(page)[b"MediaBox"][2:] for page in parser.pages
+        ] == [[100, 100], [200, 100]]
+
+    def test_convert_image_data_to_pdf_transforms_pages_with_the_profile(
+        self, tmp_path
+    ):
+        profile: DeviceProfile = DeviceProfile("test", 50, 50, grayscale=True)
+        convert_image_data_to_pdf(
+            self.image_data_list, str(tmp_path), "output", profile
+        )
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(str(tmp_path / "output.pdf"))
+
+        assert [
+            parser.read_indirect(page)[b"MediaBox"][2:] for page in parser.pages
+        ] == [[50, 50], [50, 25], [50, 17]]
+
+    def test_convert_image_data_to_pdf_without_images_raises_exception(self, tmp_path):
+        with pytest.raises(ValueError):
+            convert_image_data_to_pdf([None, None], str(tmp_path), "output")
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestConvertImageData:
+    @pytest.mark.parametrize("output_format", ["cbz", "epub", "folder", "pdf"])
+    def test_convert_image_data_without_images_raises_exception(
+        self, output_format: str, tmp_path
+    ):
+        with pytest.raises(ValueError):
+            convert_image_data([None], str(tmp_path), "output", output_format)
+
+        assert os.listdir(tmp_path) == []
+
+    def test_convert_image_data_stores_the_pages_without_bookmarks(self, tmp_path):
+        image_data: bytes = create_image_data("PNG")
+        convert_image_data([image_data, None], str(tmp_path), "output", "cbz")
+
+        with zipfile.ZipFile(tmp_path / "output.cbz") as archive:
+            assert archive.namelist() == ["001.png"]
+            assert archive.read("001.png") == image_data
+
+
+class TestTransformPages:
+    def test_transform_pages_transforms_data_and_paths_and_keeps_missing_pages(
+        self, tmp_path
+    ):
+        image_path: str = str(tmp_path / "page")
+        with open(image_path, "wb") as file:
+            file.write(create_image_data("PNG", (200, 100)))
+
+        response: list[bytes] = transform_pages(
+            [create_image_data("JPEG", (100, 200)), None, image_path],
+            DeviceProfile("test", 50, 50),
+        )
+
+        assert response[1] is None
+        assert [Image.open(io.BytesIO(response[i])).size for i in (0, 2)] == [
+            (25, 50),
+            (50, 25),
+        ]
+
+
+class TestGenerateOutput:
+    @pytest.mark.parametrize("output_format", ["cbz", "epub", "folder", "pdf"])
+    def test_generate_output_writes_the_output_format(
+        self, output_format: str, tmp_path
+    ):
+        generate_output([create_image_data()], "output", str(tmp_path), output_format)
+
+        assert os.listdir(tmp_path) == [
+            "output" + output_backends[output_format].extension
+        ]
+
+    def test_generate_output_with_unknown_format_raises_exception(self, tmp_path):
+        with pytest.raises(ValueError):
+            generate_output([create_image_data()], "output", str(tmp_path), "docx")
+
+
+class TestGeneratePDF:
+    @patch("mangadex_downloader.services.file_access_service.convert_image_data_to_pdf")
+    @patch("mangadex_downloader.services.file_access_service.save_image")
+    def test_generate_PDF_does_not_write_images_to_disk(
+        self, mock_save_image: MagicMock, mock_convert: MagicMock
+    ):
+        generate_PDF(mock_image_data_list, "output", mock_directory)
+
+        mock_save_image.assert_not_called()
+        mock_convert.assert_called_once_with(
+            mock_image_data_list, mock_directory, "output", None
+        )
+
+    @patch("os.getcwd", return_value=mock_directory)
+    @patch("mangadex_downloader.services.file_access_service.convert_image_data_to_pdf")
+    def test_generate_PDF_defaults_to_the_current_working_directory(
+        self, mock_convert: MagicMock, mock_getcwd: MagicMock
+    ):
+        generate_PDF(mock_image_data_list, "output")
+
+        mock_convert.assert_called_once_with(
+            mock_image_data_list, mock_directory, "output", None
+        )
+
+
+class TestGetCacheDirectory:
+    def test_get_cache_directory_creates_directory_under_cache_root(self, tmp_path):
+        with patch.dict(os.environ, {"MANGADEX_CACHE_DIR": str(tmp_path)}):
+            response: str = get_cache_directory("responses")
+
+        assert response == os.path.join(str(tmp_path), "responses")
+        assert os.path.isdir(response)
@@ -0,0 +1,135 @@
+import pytest
+from src.mangadex_downloader.services.device_profile import device_profiles
+from src.mangadex_downloader.services.job_journal import *
+from tests.mock_data import *
+
+
+class TestJobJournal:
+    def test_create_job_records_every_chapter_as_pending(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto", mock_processed_chapter_data, "/output"
+        )
+
+        assert journal.get_chapter_states(job_id) == {
+            chapter["id"]: "pending" for chapter in mock_processed_chapter_data
+        }
+
+    def test_get_unfinished_job_returns_the_latest_unfinished_job(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto",
+            mock_processed_chapter_data,
+            "/output",
+            "cbz",
+            "volume",
+            "data-saver",
+            device_profiles["kobo"],
+        )
+        finished_job_id: int = journal.create_job(
+            "Bleach", mock_processed_chapter_data[:1], "/output"
+        )
+        journal.finish_job(finished_job_id)
+
+        response: dict = journal.get_unfinished_job()
+
+        assert response == {
+            "id": job_id,
+            "manga_id": None,
+            "manga_title": "Naruto",
+            "output_path": "/output",
+            "chapters": mock_processed_chapter_data,
+            "output_format": "cbz",
+            "group": "volume",
+            "quality": "data-saver",
+            "profile": device_profiles["kobo"],
+        }
+
+    def test_get_unfinished_job_only_returns_jobs_of_the_given_origin(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        cli_job_id: int = journal.create_job(
+            "Naruto",
+            mock_processed_chapter_data,
+            "/output",
+            origin="cli",
+            manga_id=mock_manga_id,
+        )
+        journal.create_job(
+            "Bleach", mock_processed_chapter_data, "/output", origin="daemon"
+        )
+
+        assert journal.get_unfinished_job() is None
+        assert journal.get_unfinished_job("cli")["id"] == cli_job_id
+        assert journal.get_unfinished_job("cli")["manga_id"] == mock_manga_id
+
+        with pytest.raises(ValueError):
+            journal.create_job("Naruto", mock_processed_chapter_data, "/", origin="web")
+
+    def test_get_unfinished_job_returns_none_once_every_job_finished(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        journal.finish_job(
+            journal.create_job("Naruto", mock_processed_chapter_data, "/output")
+        )
+
+        assert journal.get_unfinished_job() is None
+
+    def test_progress_persists_across_instances(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto", mock_processed_chapter_data, "/output"
+        )
+        journal.set_chapter_state(job_id, mock_processed_chapter_data[0]["id"], "done")
+        journal.close()
+
+        reopened_journal: JobJournal = JobJournal(str(tmp_path))
+
+        assert (
+            reopened_journal.get_chapter_states(job_id)[
+                mock_processed_chapter_data[0]["id"]
+            ]
+            == "done"
+        )
+
+    def test_record_output_file_replaces_the_chapters_a_file_held(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        journal.record_output_file(
+            "/output/Naruto.cbz", mock_processed_chapter_data[:2]
+        )
+        journal.record_output_file(
+            "/output/Naruto.cbz", mock_processed_chapter_data[:3]
+        )
+
+        assert (
+            journal.get_output_file_chapters("/output/Naruto.cbz")
+            == mock_processed_chapter_data[:3]
+        )
+        assert journal.get_output_file_chapters("/output/Bleach.cbz") is None
+
+    def test_journals_without_job_options_are_migrated(self, tmp_path):
+        connection: sqlite3.Connection = sqlite3.connect(tmp_path / "jobs.sqlite3")
+        connection.execute(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, manga_title TEXT NOT NULL, "
+            "output_path TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL)"
+        )
+        connection.execute(
+            "INSERT INTO jobs (manga_title, output_path, created_at) VALUES ('Naruto', '/output', 0)"
+        )
+        connection.commit()
+        connection.close()
+
+        response: dict = JobJournal(str(tmp_path)).get_unfinished_job()
+
+        assert response["manga_title"] == "Naruto"
+        assert response["output_format"] is None
+        assert response["profile"] is None
+
+    def test_set_chapter_state_with_unknown_state_raises_exception(self, tmp_path):
+        journal: JobJournal = JobJournal(str(tmp_path))
+        job_id: int = journal.create_job(
+            "Naruto", mock_processed_chapter_data, "/output"
+        )
+
+        with pytest.raises(ValueError):
+            journal.set_chapter_state(
+                job_id, mock_processed_chapter_data[0]["id"], "lost"
+            )
@@ -0,0 +1,132 @@
+import json
+import pytest
+from unittest.mock import patch
+from src.mangadex_downloader.services import metrics_service
+from src.mangadex_downloader.services.metrics_service import *
+
+
+class TestHistogram:
+    def test_observe_counts_values_into_buckets(self):
+        histogram: Histogram = Histogram((1.0, 2.0))
+
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == 6.0
+
+    def test_quantile_interpolates_within_buckets(self):
+        histogram: Histogram = Histogram((1.0, 2.0))
+
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+
+        assert histogram.quantile(0.25) == 1.0
+        assert histogram.quantile(0.5) == pytest.approx(4 / 3)
+        assert Histogram().quantile(0.5) is None
+
+    def test_quantile_of_values_above_every_bucket_returns_the_last_bound(self):
+        histogram: Histogram = Histogram((1.0, 2.0))
+        histogram.observe(10.0)
+
+        assert histogram.quantile(0.99) == 2.0
+
+
+class TestMetricsRegistry:
+    def test_to_dict_summarizes_every_stage(self):
+        registry: MetricsRegistry = MetricsRegistry()
+        registry.record_stage("image", 0.5, 1000)
+        registry.record_stage("image", 1.5, 3000)
+        registry.record_stage("image", 1.0, error=True)
+
+        stage: dict = registry.to_dict()["stages"]["image"]
+
+        assert stage["count"] == 3
+        assert stage["errors"] == 1
+        assert stage["bytes"] == 4000
+        assert stage["bytes_per_second"] == pytest.approx(4000 / 3.0)
+        assert stage["p50"] is not None
+
+    def test_to_json_includes_counters_and_gauges_with_labels(self):
+        registry: MetricsRegistry = MetricsRegistry()
+        registry.increment("retries_total", error="timeout")
+        registry.increment("retries_total", error="timeout")
+        registry.set_gauge("scheduler_waiting_requests", 3)
+
+        response: dict = json.loads(registry.to_json())
+
+        assert response["counters"] == [
+            {"name": "retries_total", "labels": {"error": "timeout"}, "value": 2}
+        ]
+        assert response["gauges"] == [
+            {"name": "scheduler_waiting_requests", "labels": {}, "value": 3}
+        ]
+
+    def test_to_prometheus_exports_cumulative_histograms(self):
+        registry: MetricsRegistry = MetricsRegistry((1.0, 2.0))
+        registry.observe("image_request_duration_seconds", 0.5, host="a.net")
+        registry.observe("image_request_duration_seconds", 1.5, host="a.net")
+        registry.increment("image_bytes_total", 10, host='b"net')
+
+        lines: list[str] = registry.to_prometheus().splitlines()
+
+        assert "# TYPE mangadex_image_bytes_total counter" in lines
+        assert 'mangadex_image_bytes_total{host="b\\"net"} 10' in lines
+        assert "# TYPE mangadex_image_request_duration_seconds histogram" in lines
+        assert [line for line in lines if "_bucket" in line] == [
+            'mangadex_image_request_duration_seconds_bucket{host="a.net",le="1.0"} 1',
+            'mangadex_image_request_duration_seconds_bucket{host="a.net",le="2.0"} 2',
+            'mangadex_image_request_duration_seconds_bucket{host="a.net",le="+Inf"} 2',
+        ]
+        assert 'mangadex_image_request_duration_seconds_count{host="a.net"} 2' in lines
+
+
+class TestInstrument:
+    def test_instrument_records_calls_of_functions(self):
+        registry: MetricsRegistry = MetricsRegistry()
+
+        @instrument("save", lambda result, data: len(data))
+        def save(data: bytes) -> None:
+            pass
+
+        with patch.object(metrics_service, "metrics", registry):
+            save(b"12345")
+
+        stage: dict = registry.to_dict()["stages"]["save"]
+
+        assert stage["count"] == 1
+        assert stage["bytes"] == 5
+
+    async def test_instrument_records_failed_calls_of_coroutine_functions(self):
+        registry: MetricsRegistry = MetricsRegistry()
+
+        @instrument("fetch")
+        async def fetch() -> None:
+            raise ValueError("Failed")
+
+        with patch.object(metrics_service, "metrics", registry):
+            with pytest.raises(ValueError):
+                await fetch()
+
+        assert registry.to_dict()["stages"]["fetch"]["errors"] == 1
+
+    def test_instrument_does_nothing_while_metrics_are_disabled(self):
+        @instrument("save", lambda result: 1 / 0)
+        def save() -> str:
+            return "saved"
+
+        with patch.object(metrics_service, "metrics", None):
+            assert save() == "saved"
+
+
+class TestSaveMetrics:
+    def test_save_metrics_picks_the_format_from_the_extension(self, tmp_path):
+        registry: MetricsRegistry = MetricsRegistry()
+        registry.increment("retries_total")
+
+        save_metrics(registry, str(tmp_path / "metrics.prom"))
+        save_metrics(registry, str(tmp_path / "metrics.json"))
+
+        assert (tmp_path / "metrics.prom").read_text().startswith("# TYPE")
+        assert json.loads((tmp_path / "metrics.json").read_text())["counters"]
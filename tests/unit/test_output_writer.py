@@ -0,0 +1,207 @@
+import io
+import os
+import zipfile
+import pytest
+from PIL import Image, PdfParser
+from src.mangadex_downloader.services.device_profile import DeviceProfile
+from src.mangadex_downloader.services.output_writer import *
+
+
+def create_image_data(
+    format: str = "JPEG", size: tuple[int, int] = (100, 100)
+) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buffer, format)
+
+    return buffer.getvalue()
+
+
+class TestGetImageExtension:
+    @pytest.mark.parametrize(
+        "format, extension", [("JPEG", ".jpg"), ("PNG", ".png"), ("GIF", ".gif")]
+    )
+    def test_get_image_extension_detects_the_format(self, format: str, extension: str):
+        assert get_image_extension(create_image_data(format)) == extension
+
+    def test_get_image_extension_defaults_to_jpg(self):
+        assert get_image_extension(b"unknown") == ".jpg"
+
+
+class TestGetPages:
+    def test_get_pages_names_pages_and_skips_missing_ones(self, tmp_path):
+        image_path: str = str(tmp_path / "page")
+        with open(image_path, "wb") as file:
+            file.write(create_image_data("PNG"))
+
+        response: list[tuple[str, bytes]] = list(
+            get_pages([create_image_data(), None, image_path])
+        )
+
+        assert [file_name for file_name, _ in response] == ["001.jpg", "002.png"]
+        assert response[1][1] == image_path
+
+
+class TestOutputWriter:
+    def test_output_writer_missing_a_method_cant_be_created(self, tmp_path):
+        class IncompleteOutputWriter(StagedOutputWriter):
+            def open(self) -> None:
+                pass
+
+        with pytest.raises(TypeError):
+            IncompleteOutputWriter(str(tmp_path / "Naruto [1].cbz"))
+
+
+class TestPDFOutputWriter:
+    def test_add_chapter_bookmarks_every_titled_chapter(self, tmp_path):
+        file_path: str = str(tmp_path / "Naruto [Vol. 1].pdf")
+
+        with PDFOutputWriter(file_path) as writer:
+            writer.add_chapter([create_image_data(), create_image_data()], "Chapter 1")
+            writer.add_chapter([None, create_image_data("PNG")], "Chapter 2")
+
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(file_path)
+        outline: PdfParser.PdfDict = parser.read_indirect(parser.root[b"Outlines"])
+        last: PdfParser.PdfDict = parser.read_indirect(outline[b"Last"])
+
+        assert len(parser.pages) == 3
+        assert outline[b"Count"] == 2
+        assert PdfParser.decode_text(last[b"Title"]) == "Chapter 2"
+        assert last[b"Dest"][0] == parser.pages[2]
+
+    def test_close_without_pages_raises_exception(self, tmp_path):
+        with pytest.raises(ValueError):
+            with PDFOutputWriter(str(tmp_path / "output.pdf")) as writer:
+                writer.add_chapter([None], "Chapter 1")
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestCBZOutputWriter:
+    image_data_list: list[bytes] = [
+        create_image_data("JPEG", (100, 100)),
+        None,
+        create_image_data("PNG", (200, 100)),
+    ]
+
+    def test_add_chapter_stores_the_original_pages(self, tmp_path):
+        image_path: str = str(tmp_path / "page")
+        with open(image_path, "wb") as file:
+            file.write(self.image_data_list[0])
+
+        with CBZOutputWriter(str(tmp_path / "output.cbz")) as writer:
+            writer.add_chapter([*self.image_data_list, image_path])
+
+        with zipfile.ZipFile(tmp_path / "output.cbz") as archive:
+            assert archive.namelist() == ["001.jpg", "002.png", "003.jpg"]
+            assert all(
+                info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()
+            )
+            assert archive.read("001.jpg") == self.image_data_list[0]
+            assert archive.read("002.png") == self.image_data_list[2]
+            assert archive.read("003.jpg") == self.image_data_list[0]
+        assert not os.path.exists(tmp_path / "output.cbz.part")
+
+    def test_add_chapter_stores_titled_chapters_in_directories_with_bookmarks(
+        self, tmp_path
+    ):
+        with CBZOutputWriter(str(tmp_path / "output.cbz")) as writer:
+            writer.add_chapter(self.image_data_list, "Chapter 1")
+            writer.add_chapter(self.image_data_list[:1], "Chapter 2/3")
+
+        with zipfile.ZipFile(tmp_path / "output.cbz") as archive:
+            assert archive.namelist() == [
+                "0001 Chapter 1/001.jpg",
+                "0001 Chapter 1/002.png",
+                "0002 Chapter 2-3/001.jpg",
+                "ComicInfo.xml",
+            ]
+            comic_info: str = archive.read("ComicInfo.xml").decode()
+            assert '<Page Image="0" Bookmark="Chapter 1"/>' in comic_info
+            assert '<Page Image="2" Bookmark="Chapter 2/3"/>' in comic_info
+
+    def test_add_chapter_transforms_pages_with_the_profile(self, tmp_path):
+        profile: DeviceProfile = DeviceProfile("test", 50, 50)
+
+        with CBZOutputWriter(str(tmp_path / "output.cbz"), profile=profile) as writer:
+            writer.add_chapter(self.image_data_list)
+
+        with zipfile.ZipFile(tmp_path / "output.cbz") as archive:
+            assert archive.namelist() == ["001.jpg", "002.jpg"]
+            with Image.open(io.BytesIO(archive.read("002.jpg"))) as image:
+                assert image.size == (50, 25)
+
+    def test_writer_removes_the_partial_file_on_error(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            with CBZOutputWriter(str(tmp_path / "output.cbz")) as writer:
+                writer.add_chapter([str(tmp_path / "missing")])
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestEPUBOutputWriter:
+    def test_add_chapter_stores_a_page_for_each_image(self, tmp_path):
+        image_data_list: list[bytes] = [
+            create_image_data("JPEG", (100, 150)),
+            create_image_data("PNG", (200, 100)),
+        ]
+
+        with EPUBOutputWriter(str(tmp_path / "Naruto [1].epub")) as writer:
+            writer.add_chapter(image_data_list)
+
+        with zipfile.ZipFile(tmp_path / "Naruto [1].epub") as archive:
+            assert archive.namelist()[0] == "mimetype"
+            assert archive.read("mimetype") == b"application/epub+zip"
+            assert archive.read("OEBPS/images/0002.png") == image_data_list[1]
+            assert b"width=100, height=150" in archive.read("OEBPS/pages/0001.xhtml")
+
+            package: str = archive.read("OEBPS/content.opf").decode()
+            assert "<dc:title>Naruto [1]</dc:title>" in package
+            assert package.index('idref="page-0001"') < package.index(
+                'idref="page-0002"'
+            )
+            assert b">Naruto [1]</a>" in archive.read("OEBPS/nav.xhtml")
+
+    def test_add_chapter_adds_titled_chapters_to_the_table_of_contents(self, tmp_path):
+        with EPUBOutputWriter(str(tmp_path / "output.epub"), "Naruto") as writer:
+            writer.add_chapter([create_image_data()] * 2, "Chapter 1")
+            writer.add_chapter([create_image_data()], "Chapter 2 & 3")
+
+        with zipfile.ZipFile(tmp_path / "output.epub") as archive:
+            navigation: str = archive.read("OEBPS/nav.xhtml").decode()
+
+        assert '<a href="pages/0001.xhtml">Chapter 1</a>' in navigation
+        assert '<a href="pages/0003.xhtml">Chapter 2 &amp; 3</a>' in navigation
+
+
+class TestFolderOutputWriter:
+    def test_add_chapter_saves_the_original_pages(self, tmp_path):
+        image_data: bytes = create_image_data("PNG")
+        image_path: str = str(tmp_path / "page")
+        with open(image_path, "wb") as file:
+            file.write(image_data)
+
+        with FolderOutputWriter(str(tmp_path / "output")) as writer:
+            writer.add_chapter([image_data, image_path])
+
+        assert sorted(os.listdir(tmp_path / "output")) == ["001.png", "002.png"]
+        assert (tmp_path / "output" / "002.png").read_bytes() == image_data
+
+    def test_add_chapter_saves_titled_chapters_to_subdirectories(self, tmp_path):
+        with FolderOutputWriter(str(tmp_path / "output")) as writer:
+            writer.add_chapter([create_image_data()], "Chapter 1")
+            writer.add_chapter([create_image_data()], "Chapter 2")
+
+        assert sorted(os.listdir(tmp_path / "output")) == [
+            "0001 Chapter 1",
+            "0002 Chapter 2",
+        ]
+
+    def test_close_replaces_an_existing_folder(self, tmp_path):
+        os.makedirs(tmp_path / "output")
+        (tmp_path / "output" / "stale.jpg").write_bytes(b"stale")
+
+        with FolderOutputWriter(str(tmp_path / "output")) as writer:
+            writer.add_chapter([create_image_data()])
+
+        assert os.listdir(tmp_path / "output") == ["001.jpg"]
+        assert not os.path.exists(tmp_path / "output.part")
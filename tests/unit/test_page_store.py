@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from src.mangadex_downloader.services.page_store import *
+from tests.mock_data import *
+
+
+class TestPageStoreGetKey:
+    def test_get_key_returns_quality_hash_and_filename(self):
+        assert (
+            PageStore.get_key(mock_processed_download_resource_data[0])
+            == "data/hash/chapter1.jpg"
+        )
+
+    def test_get_key_ignores_the_node_serving_the_page(self):
+        assert PageStore.get_key(
+            "https://a.node.net:443/token/data/hash/1.jpg"
+        ) == PageStore.get_key("https://b.node.net/data/hash/1.jpg")
+
+    def test_get_key_returns_none_for_urls_that_are_not_pages(self):
+        assert PageStore.get_key("https://mangaCDN.com/1.jpg") is None
+        assert PageStore.get_key("https://mangaCDN.com/data/../1.jpg") is None
+
+
+class TestPageStore:
+    def test_get_returns_none_for_pages_that_are_not_stored(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+
+        assert store.get(mock_processed_download_resource_data[0]) is None
+
+    def test_put_stores_pages_that_can_be_read_back(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        store.put(mock_processed_download_resource_data[0], mock_image_data)
+
+        assert store.get(mock_processed_download_resource_data[0]) == mock_image_data
+        assert PageStore(str(tmp_path)).size == len(mock_image_data)
+
+    def test_put_evicts_least_recently_used_pages(self, tmp_path):
+        urls: list[str] = mock_processed_download_resource_data
+        store: PageStore = PageStore(str(tmp_path), len(mock_image_data) * 2)
+
+        with patch("os.path.getmtime", side_effect=[1, 2, 3, 4]):
+            store.put(urls[0], mock_image_data)
+            store.put(urls[1], mock_image_data)
+            store.get(urls[0])
+            store.put(urls[2], mock_image_data)
+
+        assert store.get(urls[1]) is None
+        assert store.get(urls[0]) == mock_image_data
+        assert store.get(urls[2]) == mock_image_data
+        assert store.size == len(mock_image_data) * 2
+
+    def test_get_chapter_returns_pages_in_order(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        urls: list[str] = mock_processed_download_resource_data[:3]
+
+        for url, image_data in zip(urls, mock_image_data_list):
+            store.put(url, image_data)
+        store.put_chapter(mock_chapter_id, urls)
+
+        assert store.get_chapter(mock_chapter_id) == mock_image_data_list
+
+    def test_get_chapter_returns_none_if_a_page_was_evicted(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        urls: list[str] = mock_processed_download_resource_data[:2]
+        store.put(urls[0], mock_image_data)
+        store.put_chapter(mock_chapter_id, urls)
+
+        assert store.get_chapter(mock_chapter_id) is None
+        assert store.get_chapter("unknown") is None
+
+    def test_commit_part_stores_the_partial_file(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+
+        with store.open_part(url) as file:
+            file.write(mock_image_data)
+
+        assert store.get(url) is None
+        assert store.size == 0
+        assert len(list(tmp_path.rglob("*.part"))) == 1
+
+        path: str = store.commit_part(url, file.name)
+
+        assert store.get_file(url) == path
+        assert store.get(url) == mock_image_data
+        assert list(tmp_path.rglob("*.part")) == []
+
+    def test_discard_part_removes_the_partial_file(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+
+        with store.open_part(url) as file:
+            file.write(mock_image_data)
+        store.discard_part(file.name)
+
+        assert list(tmp_path.rglob("*.part")) == []
+        assert store.get_file(url) is None
+
+    def test_concurrent_writers_of_a_page_have_their_own_partial_files(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        url: str = mock_processed_download_resource_data[0]
+
+        with store.open_part(url) as first, store.open_part(url) as second:
+            first.write(b"first")
+            second.write(mock_image_data)
+
+        assert first.name != second.name
+
+        store.discard_part(first.name)
+        store.commit_part(url, second.name)
+
+        assert store.get(url) == mock_image_data
+        assert list(tmp_path.rglob("*.part")) == []
+
+    def test_concurrent_puts_keep_the_size_of_the_store(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        urls: list[str] = [
+            f"https://example.org/data/{mock_chapter_id}/{i}.jpg" for i in range(64)
+        ]
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda url: store.put(url, mock_image_data), urls * 2))
+
+        assert store.size == len(urls) * len(mock_image_data)
+        assert PageStore(str(tmp_path)).size == store.size
+
+    def test_partial_files_are_not_counted_as_stored(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+
+        with store.open_part(mock_processed_download_resource_data[0]) as file:
+            file.write(mock_image_data)
+
+        assert PageStore(str(tmp_path)).size == 0
+
+    def test_stale_partial_files_are_removed_once_the_store_is_scanned(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+
+        with store.open_part(mock_processed_download_resource_data[0]) as stale:
+            stale.write(mock_image_data)
+        with store.open_part(mock_processed_download_resource_data[0]) as fresh:
+            fresh.write(mock_image_data)
+        os.utime(stale.name, (0, 0))
+
+        assert store.size == 0
+        assert [str(path) for path in tmp_path.rglob("*.part")] == [fresh.name]
+
+    def test_get_chapter_files_returns_paths_in_order(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        urls: list[str] = mock_processed_download_resource_data[:3]
+
+        for url, image_data in zip(urls, mock_image_data_list):
+            store.put(url, image_data)
+        store.put_chapter(mock_chapter_id, urls)
+
+        assert store.get_chapter_files(mock_chapter_id) == [
+            store.get_path(store.get_key(url)) for url in urls
+        ]
+
+    def test_get_chapter_only_returns_chapters_stored_in_the_quality(self, tmp_path):
+        store: PageStore = PageStore(str(tmp_path))
+        urls: list[str] = [
+            url.replace("/data/", "/data-saver/")
+            for url in mock_processed_download_resource_data[:3]
+        ]
+
+        for url, image_data in zip(urls, mock_image_data_list):
+            store.put(url, image_data)
+        store.put_chapter(mock_chapter_id, urls)
+
+        assert store.get_chapter(mock_chapter_id) is None
+        assert store.get_chapter(mock_chapter_id, "data-saver") == mock_image_data_list
@@ -0,0 +1,168 @@
+import io
+import os
+import pytest
+from PIL import Image, PdfParser
+from src.mangadex_downloader.services.pdf_writer import *
+
+
+def create_image_data(
+    mode: str = "RGB", size: tuple[int, int] = (100, 100), format: str = "JPEG"
+) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    Image.new(mode, size).save(buffer, format)
+
+    return buffer.getvalue()
+
+
+def read_pages(file_path: str) -> list[PdfParser.PdfDict]:
+    parser: PdfParser.PdfParser = PdfParser.PdfParser(file_path)
+
+    return [parser.read_indirect(page) for page in parser.pages]
+
+
+class TestPDFWriter:
+    def test_add_page_writes_a_page_sized_to_each_image(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page(Image.new("RGB", (100, 200)))
+            writer.add_page(Image.new("RGBA", (300, 100)))
+            writer.add_page(Image.new("1", (50, 50)))
+
+        assert writer.page_count == 3
+        assert [page[b"MediaBox"] for page in read_pages(file_path)] == [
+            [0, 0, 100, 200],
+            [0, 0, 300, 100],
+            [0, 0, 50, 50],
+        ]
+
+    def test_add_page_data_decodes_jpeg_and_png_data(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page_data(create_image_data("RGB", (100, 100), "JPEG"))
+            writer.add_page_data(create_image_data("P", (100, 100), "PNG"))
+            writer.add_page_data(create_image_data("L", (100, 100), "PNG"))
+
+        assert len(read_pages(file_path)) == 3
+
+    def test_add_page_file_reads_the_image_from_disk(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+        image_path: str = str(tmp_path / "page.png")
+        Image.new("RGB", (120, 80)).save(image_path)
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page_file(image_path)
+
+        assert [page[b"MediaBox"] for page in read_pages(file_path)] == [
+            [0, 0, 120, 80]
+        ]
+
+    def test_add_bookmark_adds_outline_entries_pointing_at_the_next_page(
+        self, tmp_path
+    ):
+        file_path: str = str(tmp_path / "output.pdf")
+
+        with PDFWriter(file_path) as writer:
+            writer.add_bookmark("Chapter 1")
+            writer.add_page(Image.new("RGB", (100, 100)))
+            writer.add_page(Image.new("RGB", (100, 100)))
+            writer.add_bookmark("Chapter 2 - Ã la carte")
+            writer.add_page(Image.new("RGB", (100, 100)))
+            # A bookmark after the last page has nothing to point at
+            writer.add_bookmark("Chapter 3")
+
+        parser: PdfParser.PdfParser = PdfParser.PdfParser(file_path)
+        outline: PdfParser.PdfDict = parser.read_indirect(parser.root[b"Outlines"])
+        first: PdfParser.PdfDict = parser.read_indirect(outline[b"First"])
+        last: PdfParser.PdfDict = parser.read_indirect(outline[b"Last"])
+
+        assert outline[b"Count"] == 2
+        assert PdfParser.decode_text(first[b"Title"]) == "Chapter 1"
+        assert first[b"Dest"][0] == parser.pages[0]
+        assert PdfParser.decode_text(last[b"Title"]) == "Chapter 2 - Ã la carte"
+        assert last[b"Dest"][0] == parser.pages[2]
+        assert parser.read_indirect(first[b"Next"]) == last
+
+    def test_writer_without_bookmarks_has_no_outline(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page(Image.new("RGB", (100, 100)))
+
+        assert b"Outlines" not in PdfParser.PdfParser(file_path).root
+
+    def test_writer_only_creates_the_file_once_it_is_closed(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+        writer: PDFWriter = PDFWriter(file_path)
+        writer.open()
+        writer.add_page(Image.new("RGB", (100, 100)))
+
+        assert os.listdir(tmp_path) == ["output.pdf.part"]
+
+        writer.close()
+
+        assert os.listdir(tmp_path) == ["output.pdf"]
+
+    def test_writer_removes_the_partial_file_on_error(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+
+        with pytest.raises(Exception):
+            with PDFWriter(file_path) as writer:
+                writer.add_page(Image.new("RGB", (100, 100)))
+                writer.add_page_data(b"not an image")
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestReadJpegHeader:
+    def test_read_jpeg_header_returns_dimensions_and_components(self):
+        assert read_jpeg_header(create_image_data("RGB", (120, 80))) == (120, 80, 3)
+        assert read_jpeg_header(create_image_data("L", (120, 80))) == (120, 80, 1)
+        assert read_jpeg_header(create_image_data("CMYK", (120, 80))) == (120, 80, 4)
+
+    def test_read_jpeg_header_reads_progressive_jpegs(self):
+        buffer: io.BytesIO = io.BytesIO()
+        Image.new("RGB", (120, 80)).save(buffer, "JPEG", progressive=True)
+
+        assert read_jpeg_header(buffer.getvalue()) == (120, 80, 3)
+
+    def test_read_jpeg_header_returns_none_for_other_formats(self):
+        assert read_jpeg_header(create_image_data("RGB", (120, 80), "PNG")) is None
+        assert read_jpeg_header(create_image_data("RGB", (120, 80), "GIF")) is None
+        assert read_jpeg_header(b"\xff\xd8") is None
+        assert read_jpeg_header(b"") is None
+
+
+class TestPDFWriterJpegPassthrough:
+    def test_add_page_data_embeds_jpeg_data_without_reencoding(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+        rgb_data: bytes = create_image_data("RGB", (120, 80))
+        gray_data: bytes = create_image_data("L", (80, 120))
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page_data(rgb_data)
+            writer.add_page_data(gray_data)
+
+        with open(file_path, "rb") as file:
+            content: bytes = file.read()
+
+        assert rgb_data in content
+        assert gray_data in content
+        assert b"/DeviceGray" in content
+        assert [page[b"MediaBox"] for page in read_pages(file_path)] == [
+            [0, 0, 120, 80],
+            [0, 0, 80, 120],
+        ]
+
+    def test_add_page_data_reencodes_cmyk_jpegs(self, tmp_path):
+        file_path: str = str(tmp_path / "output.pdf")
+        cmyk_data: bytes = create_image_data("CMYK", (120, 80))
+
+        with PDFWriter(file_path) as writer:
+            writer.add_page_data(cmyk_data)
+
+        with open(file_path, "rb") as file:
+            assert cmyk_data not in file.read()
+
+        assert len(read_pages(file_path)) == 1
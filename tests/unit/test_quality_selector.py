@@ -0,0 +1,42 @@
+import pytest
+from src.mangadex_downloader.services.quality_selector import *
+
+
+class TestQualitySelector:
+    def test_choose_returns_data_before_anything_was_measured(self):
+        selector: QualitySelector = QualitySelector(min_bandwidth=1000, target_size=0)
+
+        assert selector.choose(20) == "data"
+
+    def test_choose_returns_data_saver_while_bandwidth_is_low(self):
+        selector: QualitySelector = QualitySelector(min_bandwidth=1000, target_size=0)
+        selector.record("data", 500, 1, 1.0)
+
+        assert selector.bandwidth == 500
+        assert selector.choose(20) == "data-saver"
+
+        selector.record("data-saver", 10000, 1, 1.0)
+
+        assert selector.bandwidth == pytest.approx(500 + 0.3 * 9500)
+        assert selector.choose(20) == "data"
+
+    def test_choose_returns_data_saver_for_chapters_over_the_target_size(self):
+        selector: QualitySelector = QualitySelector(min_bandwidth=0, target_size=5000)
+        selector.record("data", 2000, 2, 1.0)
+
+        assert selector.estimate_size("data", 5) == 5000
+        assert selector.choose(5) == "data"
+        assert selector.choose(6) == "data-saver"
+
+    def test_estimate_size_uses_the_default_page_size_until_measured(self):
+        selector: QualitySelector = QualitySelector()
+
+        assert selector.estimate_size("data-saver", 4) == (
+            QualitySelector.default_page_sizes["data-saver"] * 4
+        )
+
+    def test_record_ignores_empty_downloads(self):
+        selector: QualitySelector = QualitySelector()
+        selector.record("data", 0, 0, 1.0)
+
+        assert selector.bandwidth is None
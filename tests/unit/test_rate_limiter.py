@@ -0,0 +1,91 @@
+import asyncio
+import time
+import pytest
+from src.mangadex_downloader.services.rate_limiter import *
+from tests.mock_data import *
+
+
+class TestTokenBucket:
+    def test_reserve_allows_bursts_up_to_the_capacity(self):
+        bucket: TokenBucket = TokenBucket(10, 3)
+
+        response: list[float] = [bucket.reserve() for _ in range(5)]
+
+        assert response[:3] == [0, 0, 0]
+        assert response[3] == pytest.approx(0.1, abs=0.01)
+        assert response[4] == pytest.approx(0.2, abs=0.01)
+
+    def test_refund_returns_a_reserved_token(self):
+        bucket: TokenBucket = TokenBucket(10, 1)
+        bucket.reserve()
+        bucket.refund()
+
+        assert bucket.reserve() == 0
+
+    def test_pause_delays_every_reservation(self):
+        bucket: TokenBucket = TokenBucket(10, 3)
+        bucket.pause(5)
+
+        assert bucket.reserve() == pytest.approx(5, abs=0.01)
+
+
+class TestRateLimiter:
+    def test_get_classes_returns_every_matching_class(self):
+        limiter: RateLimiter = RateLimiter()
+
+        assert limiter.get_classes(
+            f"https://api.mangadex.org/at-home/server/{mock_chapter_id}"
+        ) == ["at-home", "global"]
+        assert limiter.get_classes(
+            f"https://api.mangadex.org/manga/{mock_manga_id}"
+        ) == ["global"]
+        assert limiter.get_classes(mock_url_list[0]) == ["images"]
+
+    async def test_acquire_waits_for_every_limit_of_the_url(self):
+        limiter: RateLimiter = RateLimiter({"global": (100, 2), "at-home": (20, 1)})
+        url: str = f"https://api.mangadex.org/at-home/server/{mock_chapter_id}"
+
+        start: float = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire(url)
+        elapsed: float = time.monotonic() - start
+
+        # The at-home limit holds a token for 0.05 seconds, slower than the global limit
+        assert elapsed >= 0.09
+        assert limiter.metrics["at-home"]["requests"] == 3
+        assert limiter.metrics["at-home"]["throttled"] == 2
+        assert limiter.metrics["global"]["requests"] == 3
+
+    async def test_acquire_does_not_limit_images_by_default(self):
+        limiter: RateLimiter = RateLimiter()
+
+        response: list[float] = await asyncio.gather(
+            *[limiter.acquire(url) for url in mock_url_list * 20]
+        )
+
+        assert max(response) == 0
+        assert limiter.metrics["images"]["requests"] == len(mock_url_list) * 20
+
+    async def test_pause_delays_requests_of_the_rate_limited_class(self):
+        limiter: RateLimiter = RateLimiter()
+        url: str = f"https://api.mangadex.org/manga/{mock_manga_id}"
+        limiter.pause(url, 0.05)
+
+        response: float = await limiter.acquire(url)
+
+        assert response == pytest.approx(0.05, abs=0.01)
+        assert limiter.metrics["global"]["rate_limited"] == 1
+        assert await limiter.acquire(mock_url_list[0]) == 0
+
+    async def test_cancelled_acquire_refunds_its_token(self):
+        limiter: RateLimiter = RateLimiter({"global": (1, 1)})
+        url: str = f"https://api.mangadex.org/manga/{mock_manga_id}"
+        await limiter.acquire(url)
+
+        waiting: asyncio.Task = asyncio.create_task(limiter.acquire(url))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert limiter._buckets["global"].reserve() == pytest.approx(1, abs=0.05)
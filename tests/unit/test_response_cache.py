@@ -0,0 +1,86 @@
+import time
+from unittest.mock import patch
+from src.mangadex_downloader.services.response_cache import *
+from tests.mock_data import *
+
+
+class TestResponseCache:
+    def test_get_returns_none_for_unknown_requests(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path))
+
+        assert cache.get(mock_url, {"limit": 100}) is None
+
+    def test_put_stores_responses_by_url_and_params(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path))
+        cache.put(f"{mock_url}/manga", {"limit": 100}, mock_manga_data, '"etag"')
+
+        response: dict = cache.get(f"{mock_url}/manga", {"limit": 100})
+
+        assert response == {
+            "body": mock_manga_data,
+            "etag": '"etag"',
+            "last_modified": None,
+            "fresh": True,
+        }
+        assert cache.get(f"{mock_url}/manga", {"limit": 10}) is None
+
+    def test_responses_persist_across_instances(self, tmp_path):
+        ResponseCache(str(tmp_path)).put(f"{mock_url}/manga", {}, mock_manga_data)
+
+        assert ResponseCache(str(tmp_path)).get(f"{mock_url}/manga", {}) is not None
+
+    def test_get_ttl_uses_the_first_matching_endpoint(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path), ttls=[(r"/feed", 1)])
+
+        assert cache.get_ttl(f"{mock_url}/at-home/server/{mock_chapter_id}") == 0
+        assert cache.get_ttl(f"{mock_url}/manga/{mock_manga_id}/feed") == 1
+        assert cache.get_ttl(f"{mock_url}/manga?title={mock_query}") == 60 * 60
+
+    def test_get_reports_stale_responses_until_refreshed(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path), ttls=[(r".*", 10)])
+        cache.put(mock_url, {}, mock_manga_data)
+
+        with patch("time.time", return_value=time.time() + 60):
+            assert cache.get(mock_url, {})["fresh"] is False
+            cache.refresh(mock_url, {})
+            assert cache.get(mock_url, {})["fresh"] is True
+
+    def test_put_evicts_least_recently_used_responses(self, tmp_path):
+        body: dict = {"data": "x" * 100}
+        cache: ResponseCache = ResponseCache(str(tmp_path), max_size=250)
+
+        with patch("time.time", side_effect=[1, 2, 3, 4, 5, 6]):
+            cache.put(f"{mock_url}/1", {}, body)
+            cache.put(f"{mock_url}/2", {}, body)
+            cache.get(f"{mock_url}/1", {})
+            cache.put(f"{mock_url}/3", {}, body)
+
+        assert cache.get(f"{mock_url}/2", {}) is None
+        assert cache.get(f"{mock_url}/1", {}) is not None
+        assert cache.get(f"{mock_url}/3", {}) is not None
+        assert cache.size <= 250
+
+    def test_get_writes_the_last_use_in_batches(self, tmp_path):
+        cache: ResponseCache = ResponseCache(str(tmp_path))
+
+        def get_accessed_at() -> float:
+            connection: sqlite3.Connection = sqlite3.connect(
+                tmp_path / "responses.sqlite3"
+            )
+            accessed_at: float = connection.execute(
+                "SELECT accessed_at FROM responses"
+            ).fetchone()[0]
+            connection.close()
+
+            return accessed_at
+
+        with patch("time.time", return_value=1):
+            cache.put(mock_url, {}, mock_manga_data)
+        with patch("time.time", return_value=2):
+            cache.get(mock_url, {})
+
+        assert get_accessed_at() == 1
+
+        cache.close()
+
+        assert get_accessed_at() == 2
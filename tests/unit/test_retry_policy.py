@@ -0,0 +1,123 @@
+import asyncio
+import time
+import aiohttp
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from email.utils import formatdate
+from src.mangadex_downloader.services.retry_policy import *
+
+
+class TestParseRetryAfter:
+    def test_parse_retry_after_reads_seconds(self):
+        assert parse_retry_after({"Retry-After": "3"}) == 3.0
+
+    def test_parse_retry_after_reads_http_dates(self):
+        retry_after: float = parse_retry_after(
+            {"Retry-After": formatdate(time.time() + 60, usegmt=True)}
+        )
+
+        assert 55 <= retry_after <= 60
+
+    def test_parse_retry_after_reads_mangadex_rate_limit_header(self):
+        retry_after: float = parse_retry_after(
+            {"X-RateLimit-Retry-After": str(int(time.time()) + 10)}
+        )
+
+        assert 8 <= retry_after <= 10
+
+    def test_parse_retry_after_returns_none_without_a_valid_header(self):
+        assert parse_retry_after({}) is None
+        assert parse_retry_after(None) is None
+        assert parse_retry_after({"Retry-After": "soon"}) is None
+
+
+class TestRetryPolicyClassify:
+    policy: RetryPolicy = RetryPolicy()
+
+    def test_classify_returns_class_of_retryable_errors(self):
+        assert self.policy.classify(ResponseStatusError("", 429)) == "rate_limited"
+        assert self.policy.classify(ResponseStatusError("", 503)) == "server_error"
+        assert self.policy.classify(asyncio.TimeoutError()) == "timeout"
+        assert self.policy.classify(aiohttp.ServerTimeoutError()) == "timeout"
+        assert self.policy.classify(ConnectionResetError()) == "connection"
+        assert self.policy.classify(aiohttp.ServerDisconnectedError()) == "connection"
+
+    def test_classify_returns_none_for_other_errors(self):
+        assert self.policy.classify(ResponseStatusError("", 404)) is None
+        assert self.policy.classify(Exception("Error fetching url")) is None
+
+
+class TestRetryPolicyGetDelay:
+    def test_get_delay_grows_exponentially_with_jitter(self):
+        policy: RetryPolicy = RetryPolicy(base_delay=1, max_delay=5)
+
+        with patch("random.uniform", side_effect=lambda low, high: high) as mock:
+            delays: list[float] = [
+                policy.get_delay(asyncio.TimeoutError(), i) for i in range(5)
+            ]
+
+        assert delays == [1, 2, 4, 5, 5]
+        assert all(call.args[0] == 0 for call in mock.call_args_list)
+
+    def test_get_delay_respects_retry_after(self):
+        policy: RetryPolicy = RetryPolicy(max_delay=5)
+
+        assert policy.get_delay(ResponseStatusError("", 429, 2), 3) == 2
+        assert policy.get_delay(ResponseStatusError("", 429, 60), 0) == 5
+
+
+class TestRetryPolicyCall:
+    async def test_call_retries_until_the_request_succeeds(self):
+        policy: RetryPolicy = RetryPolicy(base_delay=0)
+        request: AsyncMock = AsyncMock(
+            side_effect=[
+                ResponseStatusError("", 503),
+                asyncio.TimeoutError(),
+                "response",
+            ]
+        )
+
+        assert await policy.call(request) == "response"
+        assert request.call_count == 3
+        assert policy.retries == {"server_error": 1, "timeout": 1}
+
+    async def test_call_reports_every_retry(self):
+        policy: RetryPolicy = RetryPolicy(base_delay=0)
+        request: AsyncMock = AsyncMock(
+            side_effect=[ResponseStatusError("", 429), ConnectionResetError(), "ok"]
+        )
+        on_retry: MagicMock = MagicMock()
+
+        assert await policy.call(request, on_retry) == "ok"
+        assert [call.args[0] for call in on_retry.call_args_list] == [
+            "rate_limited",
+            "connection",
+        ]
+
+    async def test_call_raises_errors_that_are_not_retryable(self):
+        policy: RetryPolicy = RetryPolicy(base_delay=0)
+        request: AsyncMock = AsyncMock(side_effect=ResponseStatusError("", 404))
+
+        with pytest.raises(ResponseStatusError):
+            await policy.call(request)
+
+        assert request.call_count == 1
+
+    async def test_call_gives_up_after_the_retries_of_the_error_class(self):
+        policy: RetryPolicy = RetryPolicy({"server_error": 2}, base_delay=0)
+        request: AsyncMock = AsyncMock(side_effect=ResponseStatusError("", 500))
+
+        with pytest.raises(ResponseStatusError):
+            await policy.call(request)
+
+        assert request.call_count == 3
+
+    @patch("asyncio.sleep")
+    async def test_call_waits_for_retry_after(self, mock_sleep: AsyncMock):
+        policy: RetryPolicy = RetryPolicy()
+        request: AsyncMock = AsyncMock(
+            side_effect=[ResponseStatusError("", 429, 7), "response"]
+        )
+
+        assert await policy.call(request) == "response"
+        mock_sleep.assert_called_once_with(7)
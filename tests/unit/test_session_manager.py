@@ -0,0 +1,45 @@
+import aiohttp
+import pytest
+from src.mangadex_downloader.services.session_manager import *
+
+
+class TestSessionManager:
+    async def test_create_session_returns_one_session_per_profile(self):
+        try:
+            api_session: aiohttp.ClientSession = SessionManager.create_session()
+            image_session: aiohttp.ClientSession = SessionManager.create_session(
+                "images"
+            )
+
+            assert SessionManager.create_session("api") is api_session
+            assert SessionManager.create_session("images") is image_session
+            assert api_session is not image_session
+        finally:
+            await SessionManager.close_session()
+
+    async def test_create_session_applies_the_profile(self):
+        try:
+            session: aiohttp.ClientSession = SessionManager.create_session("images")
+            settings: dict = SessionManager.profiles["images"]
+
+            assert session.connector.limit == settings["limit"]
+            assert session.connector.limit_per_host == settings["limit_per_host"]
+            assert session.timeout.connect == settings["connect"]
+            assert session.timeout.sock_read == settings["sock_read"]
+            assert session.timeout.total is None
+        finally:
+            await SessionManager.close_session()
+
+    async def test_create_session_with_unknown_profile_raises_exception(self):
+        with pytest.raises(ValueError):
+            SessionManager.create_session("video")
+
+    async def test_close_session_closes_every_profile(self):
+        api_session: aiohttp.ClientSession = SessionManager.create_session()
+        image_session: aiohttp.ClientSession = SessionManager.create_session("images")
+
+        await SessionManager.close_session()
+
+        assert api_session.closed and image_session.closed
+        assert SessionManager.create_session() is not api_session
+        await SessionManager.close_session()
@@ -0,0 +1,45 @@
+from src.mangadex_downloader.services.sync_state import *
+from tests.mock_data import *
+
+
+class TestSyncState:
+    def test_get_series_returns_none_for_unsynced_series(self, tmp_path):
+        state: SyncState = SyncState(str(tmp_path))
+
+        assert state.get_series(mock_manga_id) is None
+
+    def test_state_persists_across_instances(self, tmp_path):
+        state: SyncState = SyncState(str(tmp_path))
+        state.mark_exported(mock_manga_id, ["1", "2"])
+        state.record_sync(mock_manga_id, ["en"], "2024-01-01T00:00:00")
+        state.close()
+
+        response: dict = SyncState(str(tmp_path)).get_series(mock_manga_id)
+
+        assert response == {
+            "manga_id": mock_manga_id,
+            "languages": ["en"],
+            "updated_at": "2024-01-01T00:00:00",
+            "exported": {"1", "2"},
+        }
+
+    def test_record_sync_only_moves_the_latest_update_forward(self, tmp_path):
+        state: SyncState = SyncState(str(tmp_path))
+        state.record_sync(mock_manga_id, ["en"])
+        assert state.get_series(mock_manga_id)["updated_at"] is None
+
+        state.record_sync(mock_manga_id, ["en"], "2024-01-02T00:00:00")
+        state.record_sync(mock_manga_id, ["en"], "2024-01-01T00:00:00")
+        state.record_sync(mock_manga_id, ["fr"])
+
+        response: dict = state.get_series(mock_manga_id)
+        assert response["updated_at"] == "2024-01-02T00:00:00"
+        assert response["languages"] == ["fr"]
+
+    def test_list_series_returns_series_in_the_order_they_were_synced(self, tmp_path):
+        state: SyncState = SyncState(str(tmp_path))
+        state.record_sync("2", ["en"])
+        state.record_sync("1", ["en"])
+        state.record_sync("2", ["en"])
+
+        assert state.list_series() == ["2", "1"]